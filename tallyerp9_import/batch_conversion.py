@@ -0,0 +1,210 @@
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import frappe
+from frappe.utils import cint
+
+from tallyerp9_import.db_source import save_watermark, watermark_sink
+from tallyerp9_import.jobs import CONVERTERS, DONE_EVENT, JOB_TIMEOUT, PROGRESS_EVENT
+from tallyerp9_import.profiling import conversion_stats, last_profile
+
+# Conversions running side by side, each worker a process of its own
+MAX_WORKERS = 4
+
+SETTINGS = "Tally ERP9 Import Settings"
+
+
+@frappe.whitelist()
+def convert_files(files, deterministic_ids=False, batching=None, compression=None):
+    """Convert many attached CSVs in one call and return the manifest of what came of them.
+
+    ``files`` lists the CSVs as [select type, file url] pairs, converted one after another
+    in the request itself: a request doesn't spawn worker processes, a background job of
+    ``enqueue_batch_conversion`` converts them side by side. A file that fails doesn't stop
+    the others, its entry in the manifest has the error instead of the output. See
+    ``convert_batch`` for the manifest.
+
+        frappe.call("tallyerp9_import.batch_conversion.convert_files", {
+            files: [["Customer", "/private/files/customers.csv"], ["Sales Order", "/private/files/so.csv"]]
+        })
+    """
+    return convert_batch(
+        parse_files(files),
+        max_workers=1,
+        deterministic_ids=deterministic_ids,
+        batching=batching,
+        compression=compression,
+    )
+
+
+@frappe.whitelist()
+def enqueue_batch_conversion(files, deterministic_ids=False, max_workers=MAX_WORKERS, batching=None, compression=None):
+    """``convert_files`` as a background job, the files converted side by side by up to
+    ``max_workers`` worker processes that each set up once for all the files they get;
+    returns its job id straight away.
+
+    Progress and the manifest are sent as the realtime events of ``enqueue_conversion``.
+    """
+    files = parse_files(files)
+    job_id = frappe.generate_hash(length=12)
+    frappe.enqueue(
+        "tallyerp9_import.batch_conversion.run_batch_conversion",
+        queue="long",
+        timeout=JOB_TIMEOUT,
+        files=files,
+        deterministic_ids=deterministic_ids,
+        max_workers=max_workers,
+        batching=batching,
+        compression=compression,
+        conversion_id=job_id,
+        user=frappe.session.user,
+    )
+    return {'job_id': job_id}
+
+
+def run_batch_conversion(files, conversion_id, user, max_workers=MAX_WORKERS, **kwargs):
+    try:
+        manifest = convert_batch(files, max_workers, job_id=conversion_id, **kwargs)
+    except Exception as e:
+        frappe.publish_realtime(DONE_EVENT, {'job_id': conversion_id, 'error': str(e)}, user=user)
+        raise
+
+    frappe.publish_realtime(
+        DONE_EVENT, {'job_id': conversion_id, 'select_type': "Batch", **manifest}, user=user, after_commit=True
+    )
+    return manifest
+
+
+def parse_files(files):
+    """The [select type, file url] pairs of ``files``, throwing on a type without a converter."""
+    files = [tuple(pair) for pair in frappe.parse_json(files or [])]
+    if not files:
+        frappe.throw("Please give the CSV files to convert.")
+    for select_type, _ in files:
+        if select_type not in CONVERTERS:
+            frappe.throw(f"XML conversion is not supported for {select_type}")
+    return files
+
+
+def convert_batch(files, max_workers=MAX_WORKERS, job_id=None, **kwargs):
+    """Convert the CSVs of ``files``, [select type, file url] pairs, with the same ``kwargs``.
+
+    The manifest has an entry per file, in the order of ``files``: its ``select_type``
+    and ``csv_file``, the ``status``, "Converted" or "Failed", and then the output
+    (``file_url``, ``file_name``, ``file_path`` and ``files`` as a converter returns them)
+    with the figures of its Tally Conversion Log, or the ``error``. Then the ``converted``
+    and ``failed`` counts and the ``seconds`` the batch took.
+    """
+    start = time.perf_counter()
+    entries = [{'select_type': select_type, 'csv_file': csv_file} for select_type, csv_file in files]
+
+    # One query for every file instead of one per file, only those that exist go to the workers
+    existing = set(frappe.get_all("File", filters={'file_url': ("in", [url for _, url in files])}, pluck="file_url"))
+    tasks = []
+    for index, (select_type, csv_file) in enumerate(files):
+        if csv_file in existing:
+            tasks.append((index, select_type, {'csv_file': csv_file, **kwargs}))
+        else:
+            entries[index].update(status="Failed", error=f"File {csv_file} not found")
+
+    done = len(files) - len(tasks)
+    for index, outcome in iter_conversions(tasks, max_workers):
+        # Each file stands on its own, whatever the others come to
+        for watermark in outcome.pop('watermarks', ()):
+            save_watermark(*watermark)
+        entries[index].update(outcome)
+        done += 1
+        if job_id:
+            frappe.publish_realtime(
+                PROGRESS_EVENT,
+                {'job_id': job_id, 'done': done, 'total': len(files), 'label': f"{done} of {len(files)} files converted"},
+                user=frappe.session.user,
+            )
+
+    failed = sum(entry['status'] == "Failed" for entry in entries)
+    return {
+        'files': entries,
+        'converted': len(entries) - failed,
+        'failed': failed,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def iter_conversions(tasks, max_workers=MAX_WORKERS):
+    """Run the conversions of ``tasks``, (key, select type, converter kwargs) each, and yield
+    (key, outcome) as each one finishes; see ``convert`` for the outcome.
+
+    With more than one task and worker they run in a pool of processes, spawned rather than
+    forked, that connect to the site and import the converters once each. What those
+    convert is committed as it finishes, but for the watermarks of delta exports: they come
+    back in the outcome under ``watermarks``, the arguments of ``save_watermark`` each, for
+    the caller to save once it knows the conversion counts. Closing the generator early
+    cancels the conversions that haven't started.
+    """
+    workers = min(cint(max_workers) or MAX_WORKERS, len(tasks))
+    if workers <= 1:
+        for key, select_type, kwargs in tasks:
+            yield key, convert_in_savepoint(select_type, kwargs)
+        return
+
+    pool = ProcessPoolExecutor(
+        workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(frappe.local.site, frappe.local.sites_path, frappe.session.user),
+    )
+    try:
+        pending = {pool.submit(_convert_in_worker, select_type, kwargs): key for key, select_type, kwargs in tasks}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def convert(select_type, kwargs):
+    """Run the converter of ``select_type`` and return the outcome: its ``status``, with the
+    converter's result and the figures of its conversion log, or the ``error`` it failed with."""
+    last_profile.set(None)
+    try:
+        result = frappe.get_attr(CONVERTERS[select_type])(SETTINGS, SETTINGS, **kwargs)
+    except Exception as e:
+        return {'status': "Failed", 'error': str(e)}
+
+    profile = last_profile.get()
+    return {'status': "Converted", **result, **(conversion_stats(profile, result) if profile else {})}
+
+
+def convert_in_savepoint(select_type, kwargs):
+    # In the request or job itself, a failed file mustn't take what the others did with it
+    frappe.db.savepoint("batch_conversion")
+    outcome = convert(select_type, kwargs)
+    if outcome['status'] == "Failed":
+        frappe.db.rollback(save_point="batch_conversion")
+    return outcome
+
+
+def _init_worker(site, sites_path, user):
+    # Once per worker process: a connection to the site of its own, and the converters
+    # with pandas and the rest imported ahead of the first file
+    frappe.init(site=site, sites_path=sites_path)
+    frappe.connect()
+    frappe.set_user(user)
+    for path in CONVERTERS.values():
+        frappe.get_attr(path)
+
+
+def _convert_in_worker(select_type, kwargs):
+    watermarks = []
+    token = watermark_sink.set(watermarks.append)
+    try:
+        outcome = convert(select_type, kwargs)
+    finally:
+        watermark_sink.reset(token)
+    if outcome['status'] == "Failed":
+        frappe.db.rollback()
+        return outcome
+    frappe.db.commit()
+    return {**outcome, 'watermarks': watermarks}
@@ -0,0 +1,87 @@
+import os
+import zipfile
+
+import frappe
+from frappe.utils import cint
+
+from tallyerp9_import.output_cache import cache_output
+from tallyerp9_import.profiling import stage
+from tallyerp9_import.xml_writer import COMPRESSIONS
+
+
+def parse_batching(batching=None):
+    """The limits to cut a conversion's XML into batches by, from the ``batching`` sent
+    by Tally ERP9 Import Settings: ``max_messages`` per file, ``max_size_mb`` per file
+    and whether to ``zip`` the files. A limit of 0 is no limit.
+    """
+    batching = frappe.parse_json(batching or {})
+    return {
+        'max_messages': cint(batching.get('max_messages')),
+        'max_size_mb': cint(batching.get('max_size_mb')),
+        'zip': bool(cint(batching.get('zip'))),
+    }
+
+
+def parse_compression(compression=None):
+    """The ``TallyXMLWriter`` compression for the "Compression" option of Tally ERP9 Import
+    Settings: None, "gzip" or "zip"."""
+    compression = (compression or "").strip().lower()
+    if compression in ("", "none"):
+        return None
+    if compression not in COMPRESSIONS:
+        frappe.throw(f"Unknown compression {compression}, it is one of None, {', '.join(COMPRESSIONS)}")
+    return compression
+
+
+def writer_limits(batching):
+    """The ``TallyXMLWriter`` arguments for the limits of ``parse_batching``."""
+    return {
+        'max_messages': batching['max_messages'],
+        'max_bytes': batching['max_size_mb'] * 1024 * 1024,
+    }
+
+
+@stage("attach")
+def save_batches(file_paths, batching, cache_key, converter):
+    """Attach the XML files of a conversion that came out in several batches.
+
+    With ``zip`` in ``batching`` they go into a single zip, named like the first
+    file without its batch number, which is cached like a single XML. Otherwise each
+    batch is a File of its own and the result lists them all under ``files``; the
+    other keys are those of the first batch, for callers that expect a single file.
+    """
+    if batching['zip']:
+        stem = file_paths[0].rsplit("_", 1)[0]
+        zip_path = f"{stem}.zip"
+        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as archive:
+            for file_path in file_paths:
+                archive.write(file_path, os.path.basename(file_path))
+        for file_path in file_paths:
+            os.remove(file_path)
+
+        file_doc = _attach(zip_path)
+        cache_output(cache_key, converter, file_doc, zip_path)
+        return _result(file_doc, zip_path)
+
+    # A cache entry keeps a single file, batches in separate files aren't cached
+    results = [_result(_attach(file_path), file_path) for file_path in file_paths]
+    return {**results[0], 'files': results}
+
+
+def _attach(file_path):
+    file_name = os.path.basename(file_path)
+    return frappe.get_doc({
+        'doctype': 'File',
+        'file_name': file_name,
+        'file_url': f'/files/{file_name}',
+        'is_private': 0,
+        'folder': 'Home/Attachments'
+    }).insert(ignore_permissions=True)
+
+
+def _result(file_doc, file_path):
+    return {
+        'file_url': file_doc.file_url,
+        'file_name': file_doc.file_name,
+        'file_path': file_path
+    }
@@ -0,0 +1,6 @@
+"""Throughput and memory benchmarks of the converters on synthetic ERPNext CSVs.
+
+    bench --site dev.localhost execute tallyerp9_import.benchmarks.run
+"""
+
+from tallyerp9_import.benchmarks.suite import compare, run
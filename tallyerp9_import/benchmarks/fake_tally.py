@@ -0,0 +1,93 @@
+"""A stand-in for Tally's HTTP server, to push conversions to without a Tally.
+
+Answers every import the way Tally ERP9 does, counting each record with ACTION
+"Alter" as altered and the rest as created, after ``delay`` seconds per request.
+Run it in a process of its own, from the bench directory, so it doesn't compete with
+the conversion:
+
+    ./env/bin/python -m tallyerp9_import.benchmarks.fake_tally --port 9000 --delay 0.5
+"""
+
+import argparse
+import threading
+import time
+import xml.etree.ElementTree as ET
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RESPONSE = (
+    "<RESPONSE>\n <CREATED>{created}</CREATED>\n <ALTERED>{altered}</ALTERED>\n <DELETED>0</DELETED>\n"
+    " <LASTVCHID>0</LASTVCHID>\n <LASTMID>0</LASTMID>\n <COMBINED>0</COMBINED>\n <IGNORED>0</IGNORED>\n"
+    " <ERRORS>{errors}</ERRORS>\n <CANCELLED>0</CANCELLED>\n</RESPONSE>\n"
+)
+
+
+class FakeTally(ThreadingHTTPServer):
+    """Counts what it was sent in ``requests``, ``created`` and ``altered``, and the most
+    requests it was answering at once in ``max_in_flight``."""
+
+    def __init__(self, port=9000, delay=0.0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.created = 0
+        self.altered = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keep-alive, as Tally
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        with self.server.lock:
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(self.server.max_in_flight, self.server.in_flight)
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        created = altered = errors = 0
+        try:
+            for message in ET.fromstring(body).iter("TALLYMESSAGE"):
+                for record in message:
+                    if record.get("ACTION") == "Alter":
+                        altered += 1
+                    else:
+                        created += 1
+        except ET.ParseError:
+            errors = 1
+        time.sleep(self.server.delay)
+
+        with self.server.lock:
+            self.server.in_flight -= 1
+            self.server.requests += 1
+            self.server.created += created
+            self.server.altered += altered
+        response = RESPONSE.format(created=created, altered=altered, errors=errors).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/xml; charset=utf-8")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds Tally takes per request")
+    args = parser.parse_args()
+
+    server = FakeTally(args.port, args.delay)
+    print(f"Fake Tally listening on http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"{server.requests} requests, {server.created} created, {server.altered} altered")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+import csv
+import random
+from datetime import date, timedelta
+
+from tallyerp9_import.csv_reader import TEMPLATE_METADATA_ROWS, TEMPLATE_PREAMBLE_ROWS
+
+# The instructions ERPNext puts above the column header of a data import template
+PREAMBLE = [
+    "Data Import Template",
+    "Table:",
+    "",
+    "",
+    "Notes:",
+    "Please do not change the template headings.",
+    "First data column must be blank.",
+    'If you are uploading new records, leave the "name" (ID) column blank.',
+    'If you are uploading new records, "Naming Series" becomes mandatory, if present.',
+    "Only mandatory fields are necessary for new records. You can delete non-mandatory columns if you wish.",
+    "For updating, you can update only selective columns.",
+    "You can only upload upto 5000 records in one go. (may be less in some cases)",
+    "",
+    "DocType:",
+    "",
+]
+METADATA = ["Column Labels:", "Mandatory:", "Type:", "Info:"]
+
+# Names with the characters that need escaping in XML, as real masters have them
+PARTY_NAMES = [
+    "Sharma Traders", "Gupta & Sons", "Patel Bros.", "Iyer <Chennai>", "D'Souza Enterprises",
+    'Reddy "Gold" Jewellers', "Singh Transport", "Mehta Textiles", "Khan Hardware", "Nair Spices",
+]
+ITEM_NAMES = ["Steel Rod", "Copper Wire", "PVC Pipe", "Cement Bag", "Paint & Primer", "LED Bulb", "Door Hinge"]
+ITEM_GROUPS = ["Products", "Raw Material", "Consumable", "Sub Assemblies", "Services"]
+UOMS = ["Nos", "Kg", "Box", "Meter", "Litre"]
+HSN_CODES = ["7214", "7408", "3917", "2523", "3208", "8539", "8302"]
+GST_CATEGORIES = ["Registered Regular", "Unregistered", "Registered Composition", "Overseas"]
+COUNTRIES = ["India", "India", "India", "United Arab Emirates", "Singapore"]
+ACCOUNT_GROUPS = ["Application of Funds (Assets)", "Source of Funds (Liabilities)", "Income", "Expenses"]
+
+START_DATE = date(2024, 4, 1)
+
+
+def write_template_csv(path, converter, rows, seed=0):
+    """Write a CSV of ``rows`` synthetic records for ``converter``, a key of ``GENERATORS``.
+
+    The records are random but the same for the same ``seed``. Every converter but
+    Chart of Accounts gets the layout of an ERPNext data import template; journal
+    entries and orders have their own columns only on the first of their rows.
+    """
+    columns, generate, is_template = GENERATORS[converter]
+    rng = random.Random(seed)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        blank = [""] * (len(columns) - 1)
+        if is_template:
+            for line in PREAMBLE[:TEMPLATE_PREAMBLE_ROWS]:
+                writer.writerow([line, *blank])
+        writer.writerow(columns)
+        if is_template:
+            for line in METADATA[:TEMPLATE_METADATA_ROWS]:
+                writer.writerow([line, *blank])
+        writer.writerows(generate(rng, rows))
+
+
+def _day(rng):
+    return (START_DATE + timedelta(days=rng.randrange(365))).strftime("%d-%m-%Y")
+
+
+def _party_rows(rng, rows, prefix):
+    for i in range(rows):
+        yield [
+            f"{prefix}-{i:07d}",
+            f"{rng.choice(PARTY_NAMES)} {i}",
+            f"accounts{i}@example.com" if rng.random() < 0.8 else "",
+            f"{i} MG Road, Pune" if rng.random() < 0.6 else "",
+            f"27AAAAA{i % 10000:04d}A1Z5" if rng.random() < 0.7 else "",
+            "https://example.com" if rng.random() < 0.2 else "",
+            f"AAAAA{i % 10000:04d}A",
+            rng.choice(COUNTRIES),
+            f"98{i % 100000000:08d}" if rng.random() < 0.9 else "",
+        ]
+
+
+def customer_rows(rng, rows):
+    return _party_rows(rng, rows, "CUST")
+
+
+def supplier_rows(rng, rows):
+    return _party_rows(rng, rows, "SUPP")
+
+
+def account_rows(rng, rows):
+    for i in range(rows):
+        if i < len(ACCOUNT_GROUPS):
+            yield [ACCOUNT_GROUPS[i], ""]
+        else:
+            yield [f"{rng.choice(PARTY_NAMES)} Account {i}", rng.choice(ACCOUNT_GROUPS)]
+
+
+def item_rows(rng, rows):
+    for i in range(rows):
+        yield [
+            f"ITEM-{i:07d}",
+            f"{rng.choice(ITEM_NAMES)} {i}",
+            rng.choice(ITEM_GROUPS),
+            rng.choice(UOMS),
+            rng.choice(HSN_CODES) if rng.random() < 0.8 else "",
+        ]
+
+
+def sales_order_rows(rng, rows):
+    # Orders of 1 to 4 items, a row each, the order's fields on its first one
+    for i, count in enumerate(_child_counts(rng, rows)):
+        items = [_order_item(rng) for _ in range(count)]
+        total = f"{sum(float(amount) for *_, amount in items):.2f}"
+        for n, (item_name, rate, qty, amount) in enumerate(items):
+            if n == 0:
+                yield [
+                    f"SAL-ORD-2024-{i:07d}", _day(rng), f"{rng.choice(PARTY_NAMES)} {i % 1000}",
+                    item_name, rate, total, qty, amount, rng.choice(GST_CATEGORIES),
+                ]
+            else:
+                yield ["", "", "", item_name, rate, "", qty, amount, ""]
+
+
+def purchase_order_rows(rng, rows):
+    # Orders of 1 to 4 items, a row each, the order's fields on its first one
+    for i, count in enumerate(_child_counts(rng, rows)):
+        day = _day(rng)
+        items = [_order_item(rng) for _ in range(count)]
+        total = f"{sum(float(amount) for *_, amount in items):.2f}"
+        for n, (item_name, rate, qty, amount) in enumerate(items):
+            if n == 0:
+                yield [
+                    f"PUR-ORD-2024-{i:07d}", day, day, f"SUPP-{i % 1000:07d}", f"{rng.choice(PARTY_NAMES)} {i % 1000}",
+                    total, item_name, rate, amount, qty, qty,
+                ]
+            else:
+                yield ["", "", "", "", "", "", item_name, rate, amount, qty, qty]
+
+
+def _order_item(rng):
+    rate = rng.randint(10, 5000)
+    qty = rng.randint(1, 100)
+    return rng.choice(ITEM_NAMES), f"{rate:.2f}", str(qty), f"{rate * qty:.2f}"
+
+
+def journal_entry_rows(rng, rows):
+    for i, count in enumerate(_child_counts(rng, rows)):
+        amount = f"{rng.randint(100, 100000):.2f}"
+        for n in range(count):
+            # The first account is debited, the rest credited
+            party_type = rng.choice(["Customer", "Supplier", ""])
+            party = f"{rng.choice(PARTY_NAMES)} {i % 1000}" if party_type else "Cash"
+            debit, credit = (amount, "0") if n == 0 else ("0", amount)
+            if n == 0:
+                yield [f"ACC-JV-2024-{i:07d}", _day(rng), party_type, party, debit, credit]
+            else:
+                yield ["", "", party_type, party, debit, credit]
+
+
+def _child_counts(rng, rows):
+    """How many child rows each parent has, 1 to 4, until there are ``rows`` in all."""
+    while rows > 0:
+        count = min(rng.randint(1, 4), rows)
+        rows -= count
+        yield count
+
+
+def payment_entry_rows(rng, rows):
+    for i in range(rows):
+        amount = rng.randint(100, 100000)
+        yield [
+            f"ACC-PAY-2024-{i:07d}",
+            _day(rng),
+            f"{rng.choice(PARTY_NAMES)} {i % 1000}",
+            f"PMO-{i:07d}" if rng.random() < 0.3 else "",
+            f"{amount:.2f}",
+            f"{amount * 0.18:.2f}" if rng.random() < 0.5 else "0",
+        ]
+
+
+# Columns, row generator and whether it is a data import template, by "Select Type"
+# option of Tally ERP9 Import Settings
+GENERATORS = {
+    'Customer': (
+        ["name", "customer_name", "email_id", "customer_primary_address", "gstin", "website", "pan", "country",
+         "mobile_no"],
+        customer_rows,
+        True,
+    ),
+    'Supplier': (
+        ["name", "supplier_name", "email_id", "supplier_primary_address", "gstin", "website", "pan", "country",
+         "mobile_no"],
+        supplier_rows,
+        True,
+    ),
+    'Sales Order': (
+        ["name", "transaction_date", "customer_name", "item_name", "rate", "total", "stock_qty", "amount",
+         "gst_category"],
+        sales_order_rows,
+        True,
+    ),
+    'Purchase Order': (
+        ["name", "transaction_date", "schedule_date", "supplier", "supplier_name", "total", "item_name",
+         "base_rate", "amount", "qty", "stock_qty"],
+        purchase_order_rows,
+        True,
+    ),
+    'Journal Entry': (
+        ["name", "posting_date", "party_type", "party", "debit_in_account_currency", "credit_in_account_currency"],
+        journal_entry_rows,
+        True,
+    ),
+    'Payment Entry': (
+        ["name", "posting_date", "party_name", "payment_order", "received_amount", "total_taxes_and_charges"],
+        payment_entry_rows,
+        True,
+    ),
+    'Item Master': (
+        ["name", "item_name", "item_group", "stock_uom", "gst_hsn_code"],
+        item_rows,
+        True,
+    ),
+    'Chart of Accounts': (
+        ["Account Name", "Parent Account"],
+        account_rows,
+        False,
+    ),
+}
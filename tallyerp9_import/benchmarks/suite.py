@@ -0,0 +1,174 @@
+import json
+import os
+import platform
+
+import frappe
+from frappe.utils import cint, now_datetime
+
+import tallyerp9_import
+from tallyerp9_import.batches import parse_batching
+from tallyerp9_import.benchmarks.generators import GENERATORS, write_template_csv
+from tallyerp9_import.jobs import CONVERTERS
+from tallyerp9_import.output_cache import CACHE_DOCTYPE, conversion_cache_key
+from tallyerp9_import.profiling import last_profile
+
+DEFAULT_SIZES = (1000, 10000)
+
+# A result is a regression when it is this much worse than the baseline
+REGRESSION_THRESHOLD = 0.1
+
+
+def run(sizes=None, converters=None, output=None, seed=0):
+    """Convert synthetic CSVs of every size with every converter and write the results to ``output``.
+
+    ``sizes`` and ``converters`` are lists or comma separated strings, by default 1k and
+    10k rows through all eight converters; 100k and 1M take a while. Meant for a
+    development site, the CSVs, their XML and their cache entries are deleted afterwards:
+
+        bench --site dev.localhost execute tallyerp9_import.benchmarks.run --kwargs "{'sizes': '1000,100000'}"
+
+    Times and peak memory are those of each conversion's profile, memory sampled every
+    ``tally_rss_sample_interval`` seconds of the site config; set it lower, to 0.005
+    say, for peaks that don't last.
+
+    Writes a JSON file, by default under the site's private/benchmarks, and returns its path.
+    """
+    sizes = [cint(size) for size in _as_list(sizes)] or list(DEFAULT_SIZES)
+    converters = _as_list(converters) or list(GENERATORS)
+    for converter in converters:
+        if converter not in GENERATORS:
+            frappe.throw(f"No benchmark for {converter}, it is one of {', '.join(GENERATORS)}")
+
+    results = []
+    for converter in converters:
+        for rows in sizes:
+            result = run_case(converter, rows, seed)
+            results.append(result)
+            print(
+                f"{converter:<18} {rows:>9} rows  {result['seconds']:>8.2f} s  {result['rows_per_sec']:>9.0f} rows/s  "
+                f"{result['peak_rss_mb']:>7.1f} MB peak  {result['output_bytes']:>12} bytes"
+            )
+
+    if not output:
+        directory = frappe.get_site_path('private', 'benchmarks')
+        os.makedirs(directory, exist_ok=True)
+        output = os.path.join(directory, f"tally-benchmark-{now_datetime():%Y%m%d-%H%M%S}.json")
+    with open(output, "w") as f:
+        json.dump(
+            {
+                'app_version': tallyerp9_import.__version__,
+                'frappe_version': frappe.__version__,
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'cpus': os.cpu_count(),
+                'started': str(now_datetime()),
+                'seed': seed,
+                'results': results,
+            },
+            f,
+            indent=1,
+        )
+    print(f"Results written to {output}")
+    return output
+
+
+def run_case(converter, rows, seed=0):
+    """Convert a synthetic CSV of ``rows`` records with ``converter`` and measure it."""
+    file_name = f"tally_benchmark_{frappe.scrub(converter)}_{rows}.csv"
+    csv_path = frappe.get_site_path('private', 'files', file_name)
+    write_template_csv(csv_path, converter, rows, seed)
+    csv_bytes = os.path.getsize(csv_path)
+    csv_doc = frappe.get_doc({
+        'doctype': 'File',
+        'file_name': file_name,
+        'file_url': f'/private/files/{file_name}',
+        'is_private': 1,
+    }).insert(ignore_permissions=True)
+
+    method = frappe.get_attr(CONVERTERS[converter])
+    # The key the converter caches under with the default settings
+    cache_key = conversion_cache_key(
+        method.__module__, csv_path, deterministic_ids=False, batching=parse_batching(), compression=None
+    )
+    result = None
+    try:
+        # A cached conversion would measure the cache, not the converter
+        _delete_cache_entry(cache_key)
+        result = method("Tally ERP9 Import Settings", "Tally ERP9 Import Settings", csv_file=csv_doc.file_url)
+        # Timed and sampled by the converter's own profile, the one its conversion log has
+        profile = last_profile.get()
+        seconds = profile.seconds
+        output_bytes = os.path.getsize(result['file_path'])
+    finally:
+        _delete_cache_entry(cache_key)
+        if result:
+            _delete_file(frappe.db.get_value("File", {'file_url': result['file_url']}))
+        _delete_file(csv_doc.name)
+
+    return {
+        'converter': converter,
+        'rows': rows,
+        'csv_bytes': csv_bytes,
+        'seconds': round(seconds, 4),
+        'rows_per_sec': round(rows / seconds, 1) if seconds else None,
+        'rss_before_mb': round(profile.rss_before / 1024 / 1024, 1),
+        'peak_rss_mb': round(profile.peak_rss / 1024 / 1024, 1),
+        'output_bytes': output_bytes,
+    }
+
+
+def compare(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """Print and return the cases of ``current`` that are slower or use more memory than
+    in ``baseline`` by more than ``threshold``; both are result files of ``run``.
+
+        bench --site dev.localhost execute tallyerp9_import.benchmarks.compare --args "['before.json', 'after.json']"
+    """
+    with open(baseline) as f:
+        before = {(r['converter'], r['rows']): r for r in json.load(f)['results']}
+    with open(current) as f:
+        after = json.load(f)['results']
+
+    regressions = []
+    for result in after:
+        old = before.get((result['converter'], result['rows']))
+        if not old:
+            continue
+        for metric, worse in (('rows_per_sec', -1), ('peak_rss_mb', 1), ('output_bytes', 1)):
+            if not (old[metric] and result[metric]):
+                continue
+            change = (result[metric] - old[metric]) / old[metric]
+            if change * worse > threshold:
+                regressions.append({
+                    'converter': result['converter'],
+                    'rows': result['rows'],
+                    'metric': metric,
+                    'baseline': old[metric],
+                    'current': result[metric],
+                    'change': round(change, 3),
+                })
+                print(
+                    f"{result['converter']} {result['rows']} rows: {metric} {old[metric]} -> {result[metric]} "
+                    f"({change:+.0%})"
+                )
+    if not regressions:
+        print("No regressions")
+    return regressions
+
+
+def _as_list(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = frappe.parse_json(value) if value.startswith("[") else value.split(",")
+    return [str(v).strip() for v in value if str(v).strip()]
+
+
+def _delete_cache_entry(cache_key):
+    if frappe.db.exists(CACHE_DOCTYPE, cache_key):
+        frappe.delete_doc(CACHE_DOCTYPE, cache_key, ignore_permissions=True)
+
+
+def _delete_file(name):
+    # Deleting the File doc deletes the file on disk as well
+    if name and frappe.db.exists("File", name):
+        frappe.delete_doc("File", name, ignore_permissions=True)
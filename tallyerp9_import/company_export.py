@@ -0,0 +1,178 @@
+import json
+import uuid
+import zipfile
+from contextlib import closing
+
+import frappe
+from frappe.utils import cint
+
+from tallyerp9_import.batch_conversion import MAX_WORKERS, iter_conversions
+from tallyerp9_import.db_source import save_watermark, watermark_sink
+from tallyerp9_import.jobs import CONVERTERS, DONE_EVENT, JOB_TIMEOUT, PROGRESS_EVENT
+from tallyerp9_import.reference_index import VOUCHER_REFERENCES, ReferenceIndex, throw_dangling
+
+# Converters in the order Tally has to import their XML: the groups and ledgers of the
+# chart of accounts, then the masters vouchers refer to, then the vouchers
+IMPORT_ORDER = [
+    ["Chart of Accounts"],
+    ["Item Master", "Customer", "Supplier"],
+    ["Sales Order", "Purchase Order", "Journal Entry", "Payment Entry"],
+]
+
+
+@frappe.whitelist()
+def enqueue_company_export(
+    filters=None, csv_files=None, deterministic_ids=False, max_workers=MAX_WORKERS, validate_references=False
+):
+    """Convert everything of a company in one background job and return its job id.
+
+    With ``filters`` every converter reads from the database, as with the ERPNext
+    Database source of Tally ERP9 Import Settings. Otherwise ``csv_files`` has the
+    CSV to convert by "Select Type" option, types without one are left out. Progress
+    and the finished bundle are sent as the realtime events of ``enqueue_conversion``.
+    With ``validate_references``, the vouchers are checked against the masters, those
+    of the CSVs when they are exported along, before anything is converted.
+    """
+    csv_files = frappe.parse_json(csv_files or {})
+    if filters is None and not csv_files:
+        frappe.throw("Please give the filters of the records or the CSV files to export.")
+    for select_type in csv_files:
+        if select_type not in CONVERTERS:
+            frappe.throw(f"XML conversion is not supported for {select_type}")
+
+    job_id = frappe.generate_hash(length=12)
+    frappe.enqueue(
+        "tallyerp9_import.company_export.run_company_export",
+        queue="long",
+        timeout=JOB_TIMEOUT,
+        filters=filters,
+        csv_files=csv_files,
+        deterministic_ids=deterministic_ids,
+        max_workers=max_workers,
+        validate_references=validate_references,
+        conversion_id=job_id,
+        user=frappe.session.user,
+    )
+    return {'job_id': job_id}
+
+
+def run_company_export(
+    filters,
+    csv_files,
+    conversion_id,
+    user,
+    deterministic_ids=False,
+    max_workers=MAX_WORKERS,
+    validate_references=False,
+):
+    try:
+        result = export_company(filters, csv_files, deterministic_ids, max_workers, conversion_id, validate_references)
+    except Exception as e:
+        frappe.publish_realtime(DONE_EVENT, {'job_id': conversion_id, 'error': str(e)}, user=user)
+        raise
+
+    frappe.publish_realtime(
+        DONE_EVENT, {'job_id': conversion_id, 'select_type': "Company", **result}, user=user, after_commit=True
+    )
+    return result
+
+
+def export_company(
+    filters=None, csv_files=None, deterministic_ids=False, max_workers=MAX_WORKERS, job_id=None, validate_references=False
+):
+    """Run the converters of a company export and bundle their XML in a single zip.
+
+    Converting has no order, a voucher's XML doesn't depend on the masters', so all
+    the converters run at once in up to ``max_workers`` processes and the export takes
+    about as long as the slowest of them. The order Tally has to import them in,
+    ``IMPORT_ORDER``, is that of the bundle: its XML files are numbered in it and its
+    manifest.json lists them in it.
+
+    The watermarks of a delta export only move once the bundle is saved, so a converter
+    that fails leaves every doctype to be exported again, however many workers there are.
+    """
+    csv_files = csv_files or {}
+    select_types = [
+        select_type
+        for level in IMPORT_ORDER
+        for select_type in level
+        if filters is not None or csv_files.get(select_type)
+    ]
+    if cint(validate_references):
+        # One index of the masters for all the vouchers, every dangling name reported at once
+        index = ReferenceIndex.build(filters, csv_files)
+        throw_dangling({
+            select_type: index.dangling(select_type, filters=filters, csv_file=csv_files.get(select_type))
+            for select_type in select_types
+            if select_type in VOUCHER_REFERENCES
+        })
+
+    conversions = {}
+    tasks = [
+        (select_type, select_type, {
+            'csv_file': csv_files.get(select_type), 'filters': filters, 'deterministic_ids': deterministic_ids
+        })
+        for select_type in select_types
+    ]
+    watermarks = []
+    token = watermark_sink.set(watermarks.append)
+    try:
+        # Closed on a failure, which cancels the converters that haven't started yet
+        with closing(iter_conversions(tasks, max_workers)) as outcomes:
+            for select_type, outcome in outcomes:
+                if outcome['status'] == "Failed":
+                    frappe.throw(f"Could not convert {select_type}: {outcome['error']}")
+                # Those of conversions in worker processes, the others went to the sink
+                watermarks.extend(outcome.pop('watermarks', ()))
+                conversions[select_type] = outcome
+                if job_id:
+                    frappe.publish_realtime(
+                        PROGRESS_EVENT,
+                        {
+                            'job_id': job_id,
+                            'done': len(conversions),
+                            'total': len(select_types),
+                            'label': f"{len(conversions)} of {len(select_types)} converted",
+                        },
+                        user=frappe.session.user,
+                    )
+    finally:
+        watermark_sink.reset(token)
+
+    bundle = save_bundle([(select_type, conversions[select_type]) for select_type in select_types])
+    for watermark in watermarks:
+        save_watermark(*watermark)
+    return bundle
+
+
+def save_bundle(conversions):
+    """Zip the output of ``conversions``, (select type, outcome of ``iter_conversions``) in import order,
+    attach it and return it as a converter would, with what went into it under ``converters``.
+    """
+    bundle_name = f'company_output_{uuid.uuid4().hex[:8]}.zip'
+    bundle_path = frappe.get_site_path('public', 'files', bundle_name)
+    manifest = []
+    with zipfile.ZipFile(bundle_path, "w", zipfile.ZIP_DEFLATED) as bundle:
+        for number, (select_type, result) in enumerate(conversions, 1):
+            files = []
+            for file in result.get('files', [result]):
+                member = f"{number:02d}_{file['file_name']}"
+                bundle.write(file['file_path'], member)
+                files.append(member)
+            manifest.append({'select_type': select_type, 'files': files, 'seconds': round(result.get('seconds', 0), 3)})
+        bundle.writestr("manifest.json", json.dumps({'import_order': manifest}, indent=1))
+
+    file_doc = frappe.get_doc({
+        'doctype': 'File',
+        'file_name': bundle_name,
+        'file_url': f'/files/{bundle_name}',
+        'is_private': 0,
+        'folder': 'Home/Attachments'
+    }).insert(ignore_permissions=True)
+    return {
+        'file_url': file_doc.file_url,
+        'file_name': file_doc.file_name,
+        'file_path': bundle_path,
+        'converters': manifest,
+    }
+
@@ -0,0 +1,145 @@
+import os
+import uuid
+
+import frappe
+
+from tallyerp9_import.batches import parse_batching, parse_compression, save_batches, writer_limits
+from tallyerp9_import.csv_reader import read_csv_chunks, read_template_chunks
+from tallyerp9_import.ids import record_ids
+from tallyerp9_import.jobs import track_progress
+from tallyerp9_import.output_cache import cache_output, conversion_cache_key, get_cached_output
+from tallyerp9_import.parallel import write_messages
+from tallyerp9_import.profiling import stage, timed_chunks
+from tallyerp9_import.utils import attached_file_path
+from tallyerp9_import.xml_writer import TallyXMLWriter
+
+
+class Converter:
+    """Converts the records of a doctype into a Tally import XML, from a CSV or the database.
+
+    Everything but the TALLYMESSAGEs is the same for every converter and done here:
+    finding the CSV, the output cache, reading it in chunks with progress and profiling,
+    writing the ENVELOPE in batches and compressed as asked, and attaching the output as
+    a File. A converter module gives the rest and calls ``convert`` from its
+    whitelisted ``convert_csv_to_xml``:
+
+        CONVERTER = Converter(__name__, "customer", DB_SOURCE, write_tally_messages)
+
+    ``write_tally_messages(writer, chunks, ids)`` writes the records of ``chunks``, in
+    worker processes for parallel conversions. With ``group``, a generator of the
+    records of the chunks, it is given those instead, ``batch_size`` at a time in
+    parallel. ``template`` is false for CSVs that aren't ERPNext data import
+    templates. Converters that write their records some other way override ``write``.
+    """
+
+    def __init__(self, name, output_prefix, db_source, write_tally_messages=None, report_name="All Masters", template=True,
+                 group=None, batch_size=1):
+        # Module of the converter, what its output is cached and logged under
+        self.name = name
+        self.output_prefix = output_prefix
+        self.db_source = db_source
+        self.write_tally_messages = write_tally_messages
+        self.report_name = report_name
+        self.template = template
+        self.group = group
+        self.batch_size = batch_size
+
+    def convert(self, csv_file=None, job_id=None, filters=None, deterministic_ids=False, workers=0, batching=None,
+                compression=None):
+        ids = record_ids(filters, deterministic_ids)
+        batching = parse_batching(batching)
+        compression = parse_compression(compression)
+
+        if filters is not None:
+            # Read the records straight from the database instead of an exported CSV
+            chunks = self.db_source.read_chunks(filters)
+            # Records in the database change, what they convert to is never cached
+            file_path = cache_key = None
+        else:
+            file_path = self.lookup(csv_file)
+
+            # Converting the same CSV the same way again gives the same XML, hand back the earlier one
+            cache_key = conversion_cache_key(
+                self.name, file_path, deterministic_ids=ids.deterministic, batching=batching, compression=compression
+            )
+            cached = get_cached_output(cache_key)
+            if cached:
+                return cached
+
+            chunks = self.read(file_path)
+
+        chunks = timed_chunks(track_progress(chunks, job_id))
+
+        try:
+            xml_dir = frappe.get_site_path('public', 'files')
+            os.makedirs(xml_dir, exist_ok=True)
+            # Generate a unique filename to prevent overwriting
+            xml_file_path = os.path.join(xml_dir, f'{self.output_prefix}_output_{uuid.uuid4().hex[:8]}.xml')
+
+            try:
+                with stage("convert"), TallyXMLWriter(xml_file_path, self.report_name, compression=compression, **writer_limits(batching)) as writer:
+                    self.write(writer, chunks, ids, workers, filters=filters, file_path=file_path)
+                logger().info(f"XML file created at {xml_file_path}")
+            except Exception as e:
+                # Logged with the rest below
+                frappe.throw(f"Error saving XML file: {str(e)}")
+
+            if len(writer.file_paths) > 1:
+                # The XML came out in several batches
+                return save_batches(writer.file_paths, batching, cache_key, self.name)
+
+            # Compressed, the XML went into an archive named after it
+            return self.attach(writer.file_paths[0], cache_key)
+
+        except Exception as main_error:
+            frappe.log_error(f"XML Generation Error: {str(main_error)}")
+            frappe.throw(f"Error in generating XML file: {str(main_error)}")
+
+    @stage("lookup")
+    def lookup(self, csv_file):
+        """Where on disk the attached CSV ``csv_file`` is."""
+        try:
+            return attached_file_path(csv_file)
+        except Exception as file_error:
+            frappe.log_error(f"File Retrieval Error: {str(file_error)}")
+            frappe.throw(f"Error retrieving CSV file: {str(file_error)}")
+
+    def read(self, file_path):
+        """The records of the CSV at ``file_path``, in chunks."""
+        if self.template:
+            return read_template_chunks(file_path, strip_columns=True)
+        return read_csv_chunks(file_path, strip_columns=True)
+
+    def write(self, writer, chunks, ids, workers=0, filters=None, file_path=None):
+        """Write the TALLYMESSAGEs of ``chunks``, read from ``file_path`` or the database records
+        matching ``filters``."""
+        records = self.group(chunks) if self.group else chunks
+        write_messages(writer, self.write_tally_messages, records, ids, workers=workers, batch_size=self.batch_size)
+
+    @stage("attach")
+    def attach(self, xml_file_path, cache_key):
+        file_name = os.path.basename(xml_file_path)
+        try:
+            file_doc = frappe.get_doc({
+                'doctype': 'File',
+                'file_name': file_name,
+                'file_url': f'/files/{file_name}',
+                'is_private': 0,
+                'folder': 'Home/Attachments'
+            }).insert(ignore_permissions=True)
+        except Exception as e:
+            frappe.throw(f"Error creating Frappe File document: {str(e)}")
+
+        # Remember the XML for the next conversion of the same CSV
+        cache_output(cache_key, self.name, file_doc, xml_file_path)
+
+        return {
+            'file_url': file_doc.file_url,
+            'file_name': file_doc.file_name,
+            'file_path': xml_file_path
+        }
+
+
+def logger():
+    """The app's logger, for what a conversion did rather than what went wrong with it."""
+    return frappe.logger("tallyerp9_import")
@@ -0,0 +1,209 @@
+import csv
+import mmap
+import os
+from contextlib import contextmanager
+
+import pandas as pd
+
+# ERPNext "Download Template" CSVs start with 15 rows of instructions, then the
+# column header, then 4 rows of column metadata before the first record
+TEMPLATE_PREAMBLE_ROWS = 15
+TEMPLATE_METADATA_ROWS = 4
+TEMPLATE_HEADER_ROWS = TEMPLATE_PREAMBLE_ROWS + 1 + TEMPLATE_METADATA_ROWS
+TEMPLATE_SKIPROWS = [
+    *range(0, TEMPLATE_PREAMBLE_ROWS),
+    *range(TEMPLATE_PREAMBLE_ROWS + 1, TEMPLATE_PREAMBLE_ROWS + 1 + TEMPLATE_METADATA_ROWS),
+]
+
+# Rows per DataFrame handed to the converters; peak memory scales with this,
+# not with the size of the file
+DEFAULT_CHUNK_SIZE = 10000
+
+# Templates from this size on are read through a memory map
+MEMORY_MAP_MIN_SIZE = 256 * 1024 * 1024
+
+
+def read_csv_chunks(file_path, chunk_size=DEFAULT_CHUNK_SIZE, strip_columns=False, header_rows=1, **kwargs):
+    """Read a CSV as an iterable of DataFrames with at most ``chunk_size`` rows each.
+
+    Every cell is read as text, so a column comes out the same whichever chunk it is
+    in; the values are exactly as written in the file and blanks are NaN. The file is
+    opened and its header parsed straight away, the rows are only read as the chunks
+    are consumed. Chunk indexes carry on from one chunk to the next.
+    """
+    reader = pd.read_csv(file_path, chunksize=chunk_size, dtype=str, **kwargs)
+    return CSVChunks(reader, file_path, strip_columns, header_rows)
+
+
+def read_template_chunks(file_path, chunk_size=DEFAULT_CHUNK_SIZE, strip_columns=False, memory_map=None, **kwargs):
+    """Read the records of an ERPNext data import template CSV in bounded chunks.
+
+    With ``memory_map``, by default for templates of ``MEMORY_MAP_MIN_SIZE`` and more,
+    the file is read through a memory map, see ``MappedCSVChunks``.
+    """
+    if memory_map is None:
+        memory_map = os.path.getsize(file_path) >= MEMORY_MAP_MIN_SIZE
+    if memory_map:
+        return MappedCSVChunks(file_path, TEMPLATE_PREAMBLE_ROWS, TEMPLATE_HEADER_ROWS, chunk_size, strip_columns, **kwargs)
+    return read_csv_chunks(
+        file_path,
+        chunk_size=chunk_size,
+        strip_columns=strip_columns,
+        header_rows=TEMPLATE_HEADER_ROWS,
+        skiprows=TEMPLATE_SKIPROWS,
+        **kwargs,
+    )
+
+
+class CSVChunks:
+    """The chunks of one CSV file, read once by iterating over them."""
+
+    def __init__(self, reader, file_path, strip_columns=False, header_rows=1):
+        self.reader = reader
+        self.file_path = file_path
+        self.strip_columns = strip_columns
+        self.header_rows = header_rows
+
+    def __iter__(self):
+        with self.reader:
+            for chunk in self.reader:
+                if self.strip_columns:
+                    # Remove any extra whitespace from column names
+                    chunk.columns = chunk.columns.str.strip()
+                yield chunk
+
+    def count_rows(self):
+        return count_csv_rows(self.file_path, self.header_rows)
+
+
+class MappedCSVChunks:
+    """The chunks of one CSV file read through a memory map, like ``CSVChunks``.
+
+    The header is found by scanning the map for the ends of the records before it, so
+    the rows to skip don't go through the parser, and pandas parses the records straight
+    from the map. Pages it is done with are dropped from the process as it goes: the OS
+    page cache holds the file once, and the memory of the conversion doesn't grow with it.
+    The file is only open while the header is found and while the chunks are read, a
+    conversion that fails before reading them leaves nothing open.
+    """
+
+    def __init__(self, file_path, header_row, header_rows, chunk_size=DEFAULT_CHUNK_SIZE, strip_columns=False,
+                 encoding="utf-8", **kwargs):
+        self.file_path = file_path
+        self.header_rows = header_rows
+        self.chunk_size = chunk_size
+        self.encoding = encoding
+        self.kwargs = kwargs
+
+        # The header is read straight away, as pandas does; the map is only open while the chunks are read
+        with self._mapped() as data:
+            header_start = _skip_records(data, 0, header_row)
+            self.data_start = _skip_records(data, header_start, header_rows - header_row)
+            header = data[header_start:_skip_records(data, header_start, 1)]
+        self.columns = _unique_columns(next(csv.reader([header.decode(encoding).rstrip("\r\n")]), []))
+        if not self.columns:
+            raise pd.errors.EmptyDataError("No columns to parse from file")
+        if strip_columns:
+            self.columns = [name.strip() for name in self.columns]
+
+    def __iter__(self):
+        with self._mapped() as data:
+            if self.data_start >= len(data):
+                # No records, pandas gives a single empty chunk then
+                usecols = self.kwargs.get('usecols')
+                columns = [name for name in self.columns if usecols is None or (usecols(name) if callable(usecols) else name in usecols)]
+                yield pd.DataFrame(columns=columns, dtype=object)
+                return
+            data.seek(self.data_start)
+            reader = pd.read_csv(
+                data,
+                header=None,
+                names=self.columns,
+                chunksize=self.chunk_size,
+                dtype=str,
+                encoding=self.encoding,
+                **self.kwargs,
+            )
+            with reader:
+                for chunk in reader:
+                    _release(data, data.tell())
+                    yield chunk
+
+    def count_rows(self):
+        return count_csv_rows(self.file_path, self.header_rows)
+
+    @contextmanager
+    def _mapped(self):
+        # The file mapped, closed on leaving however the chunks end; an empty file can't be mapped
+        with open(self.file_path, "rb") as f:
+            if not os.fstat(f.fileno()).st_size:
+                yield b""
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if hasattr(data, "madvise"):
+                    data.madvise(mmap.MADV_SEQUENTIAL)
+                yield data
+
+
+def _release(data, offset):
+    # Pages before what the parser has read are done with; they stay in the page cache
+    if hasattr(mmap, "MADV_DONTNEED"):
+        data.madvise(mmap.MADV_DONTNEED, 0, offset - offset % mmap.PAGESIZE)
+
+
+def _skip_records(data, start, records):
+    """The offset just past ``records`` CSV records from ``start``; a newline inside quotes doesn't end one."""
+    if not data:
+        return 0
+    end = len(data)
+    position = start
+    for _ in range(records):
+        quotes = 0
+        while position < end:
+            newline = data.find(b"\n", position)
+            if newline < 0:
+                newline = end - 1
+            quotes += data[position:newline].count(b'"')
+            position = newline + 1
+            if quotes % 2 == 0:
+                break
+    return min(position, end)
+
+
+def _unique_columns(columns):
+    # The names pandas gives columns when it reads the header itself: blank ones are
+    # "Unnamed: <position>", repeated ones get a ".1", ".2" suffix
+    seen = {}
+    unique = []
+    for position, name in enumerate(columns):
+        name = name or f"Unnamed: {position}"
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        unique.append(f"{name}.{count}" if count else name)
+    return unique
+
+
+def count_csv_rows(file_path, header_rows=1):
+    """Roughly count the records in a CSV by counting lines, for progress reporting.
+
+    Cells with embedded newlines make this an overestimate.
+    """
+    lines = 0
+    last = b"\n"
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            lines += block.count(b"\n")
+            last = block[-1:]
+    if last != b"\n":
+        lines += 1
+    return max(lines - header_rows, 0)
+
+
+def unique_values(chunks, name):
+    """Distinct non-blank values of a column across all chunks, in order of first appearance."""
+    seen = {}
+    for chunk in chunks:
+        for value in chunk[name].dropna():
+            seen.setdefault(value, None)
+    return list(seen)
+
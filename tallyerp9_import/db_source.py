@@ -0,0 +1,298 @@
+import hashlib
+import json
+from contextvars import ContextVar
+
+import frappe
+import pandas as pd
+from frappe.query_builder.functions import Count
+from frappe.utils import getdate, now_datetime
+from tallyerp9_import.csv_reader import DEFAULT_CHUNK_SIZE
+
+# "Document Status" options of Tally ERP9 Import Settings
+DOCSTATUS = {'Draft': 0, 'Submitted': 1, 'Cancelled': 2}
+
+# Blank cells, as pandas reads them from a CSV
+BLANK = float("nan")
+
+# Column telling converters whether a record is new to Tally ("Create") or was
+# exported before ("Alter"); only there for delta exports
+ACTION_COLUMN = 'tally_action'
+
+WATERMARK_DOCTYPE = "Tally Export Watermark"
+
+# Called with the arguments of ``save_watermark`` instead of saving it when a delta export
+# has read everything; exports made of several conversions set it to save them all at the end
+watermark_sink = ContextVar("watermark_sink", default=None)
+
+# Fields every doctype has but that aren't in its meta
+STANDARD_FIELDS = {'name', 'owner', 'creation', 'modified', 'modified_by', 'docstatus'}
+
+
+class DBSource:
+    """Where a converter's CSV columns live in the site database.
+
+    Records are read in the layout of an ERPNext data import template: one row per
+    child row, the parent's fields only on the first of them (blank after that), and
+    every cell as text, so converters treat them exactly like CSV chunks. ``name`` is
+    always read. Fields the site doesn't have are left out, like columns missing from
+    a CSV.
+
+        DB_SOURCE = DBSource(
+            "Journal Entry",
+            fields=["posting_date"],
+            child_table="accounts",
+            child_fields=["party", "party_type", "debit_in_account_currency"],
+            date_field="posting_date",
+        )
+    """
+
+    def __init__(self, doctype, fields, child_table=None, child_fields=(), date_field=None, columns=None):
+        self.doctype = doctype
+        self.fields = list(fields)
+        self.child_table = child_table
+        self.child_fields = list(child_fields)
+        self.date_field = date_field
+        # CSV column names for fields that don't go by their fieldname
+        self.columns = columns or {}
+
+    def read_chunks(self, filters=None, chunk_size=DEFAULT_CHUNK_SIZE, move_watermark=True):
+        """Read the records matching ``filters`` in chunks of at most ``chunk_size`` parents.
+
+        ``filters`` may have ``from_date`` and ``to_date`` (on ``date_field``), ``company``
+        and ``docstatus`` (Draft, Submitted or Cancelled). Each is only applied where the
+        doctype has that field.
+
+        With a truthy ``delta`` in ``filters`` only records modified since the last delta
+        export of the doctype with the same filters are read, each marked in
+        ``ACTION_COLUMN``. Once they have all been read, the Tally Export Watermark of the
+        doctype and those filters moves up to the newest of them, unless
+        ``move_watermark`` is false.
+        """
+        frappe.has_permission(self.doctype, "read", throw=True)
+        return DBChunks(self, frappe.parse_json(filters or {}), chunk_size, move_watermark)
+
+
+class DBChunks:
+    """The chunks of one database read, paginated on ``name`` so every page is an index range scan."""
+
+    def __init__(self, source, filters, chunk_size, move_watermark=True):
+        self.source = source
+        self.filters = filters
+        self.chunk_size = chunk_size
+        self.move_watermark = move_watermark
+
+        meta = frappe.get_meta(source.doctype)
+        self.fields = _existing_fields(meta, ["name", *(field for field in source.fields if field != "name")])
+        self.child_doctype = None
+        self.child_fields = []
+        if source.child_table:
+            self.child_doctype = meta.get_field(source.child_table).options
+            self.child_fields = _existing_fields(frappe.get_meta(self.child_doctype), source.child_fields)
+        self.delta = bool(filters.get('delta'))
+        # Records outside one export's filters were never sent by it, so each set of
+        # filters has a watermark of its own
+        self.watermark_filters = applied_filters(meta, source, filters)
+        self.watermark = get_watermark(source.doctype, self.watermark_filters) if self.delta else None
+        self.add_conditions = filter_conditions(meta, source, filters, self.watermark)
+
+    def __iter__(self):
+        table = frappe.qb.DocType(self.source.doctype)
+        columns = [self.source.columns.get(field, field) for field in self.fields + self.child_fields]
+        selected = [table[field] for field in self.fields]
+        if self.delta:
+            columns.append(ACTION_COLUMN)
+            selected += [table.creation, table.modified]
+        last_name = None
+        last_modified = None
+        records = 0
+        start = 0
+
+        while True:
+            query = (
+                frappe.qb.from_(table)
+                .select(*selected)
+                .orderby(table.name)
+                .limit(self.chunk_size)
+            )
+            query = self.add_conditions(query, table)
+            if last_name is not None:
+                query = query.where(table.name > last_name)
+            parents = query.run()
+            if not parents:
+                break
+            last_name = parents[-1][0]
+
+            if self.delta:
+                # Split off creation and modified, the action takes their place
+                page_modified = max(parent[-1] for parent in parents)
+                last_modified = max(last_modified, page_modified) if last_modified else page_modified
+                records += len(parents)
+                parents = [(*parent[:-2], self._action(parent[-2])) for parent in parents]
+
+            rows = list(self._rows(parents))
+            yield pd.DataFrame(rows, columns=columns, index=range(start, start + len(rows)), dtype=object)
+            start += len(rows)
+
+            if len(parents) < self.chunk_size:
+                break
+
+        # Only reached once the converter has been through every chunk. A failure after
+        # this rolls the request or job back, watermark included.
+        if self.delta and self.move_watermark and last_modified:
+            watermark = (self.source.doctype, last_modified, records, self.watermark_filters)
+            sink = watermark_sink.get()
+            if sink:
+                sink(watermark)
+            else:
+                save_watermark(*watermark)
+
+    def count_rows(self):
+        # Roughly: a parent takes as many rows as it has children, and at least one
+        table = frappe.qb.DocType(self.source.doctype)
+        parents = self.add_conditions(frappe.qb.from_(table).select(Count("*")), table).run()[0][0]
+        if not self.child_doctype:
+            return parents
+
+        child = frappe.qb.DocType(self.child_doctype)
+        query = (
+            frappe.qb.from_(child)
+            .join(table)
+            .on(child.parent == table.name)
+            .select(Count("*"))
+            .where(child.parenttype == self.source.doctype)
+            .where(child.parentfield == self.source.child_table)
+        )
+        children = self.add_conditions(query, table).run()[0][0]
+        return max(parents, children)
+
+    def _action(self, creation):
+        # Anything these filters let through that was created before their last export went to Tally then
+        if self.watermark and creation <= self.watermark:
+            return "Alter"
+        return "Create"
+
+    def _rows(self, parents):
+        children = self._children([parent[0] for parent in parents])
+        width = len(self.fields)
+        blank_parent = [BLANK] * width
+        blank_child = [BLANK] * len(self.child_fields)
+
+        for parent in parents:
+            parent_values = [_text(value) for value in parent[:width]]
+            # The action goes on every row of the record, after the child fields
+            action = list(parent[width:])
+            child_rows = children.get(parent[0]) or [blank_child]
+            for index, child_values in enumerate(child_rows):
+                yield (parent_values if index == 0 else blank_parent) + child_values + action
+
+    def _children(self, names):
+        if not self.child_doctype:
+            return {}
+
+        child = frappe.qb.DocType(self.child_doctype)
+        query = (
+            frappe.qb.from_(child)
+            .select(child.parent, *(child[field] for field in self.child_fields))
+            .where(child.parenttype == self.source.doctype)
+            .where(child.parentfield == self.source.child_table)
+            .where(child.parent.isin(names))
+            .orderby(child.parent)
+            .orderby(child.idx)
+        )
+        children = {}
+        for parent, *values in query.run():
+            children.setdefault(parent, []).append([_text(value) for value in values])
+        return children
+
+
+def applied_filters(meta, source, filters):
+    """The ``filters`` that apply to ``source``, normalised: what tells one delta export of
+    its doctype from another."""
+    date_field = _date_field(meta, source)
+    applied = {}
+    for key in ('from_date', 'to_date'):
+        if date_field and filters.get(key):
+            applied[key] = str(getdate(filters[key]))
+    if meta.has_field('company') and filters.get('company'):
+        applied['company'] = filters['company']
+    if meta.is_submittable and filters.get('docstatus') in DOCSTATUS:
+        applied['docstatus'] = filters['docstatus']
+    return applied
+
+
+def filter_conditions(meta, source, filters, modified_after=None):
+    """Build a function adding the ``filters`` that apply to ``source`` to a query on its table."""
+    applied = applied_filters(meta, source, filters)
+    date_field = _date_field(meta, source)
+    docstatus = DOCSTATUS.get(applied.get('docstatus'))
+
+    def add_conditions(query, table):
+        if 'from_date' in applied:
+            query = query.where(table[date_field] >= applied['from_date'])
+        if 'to_date' in applied:
+            query = query.where(table[date_field] <= applied['to_date'])
+        if 'company' in applied:
+            query = query.where(table.company == applied['company'])
+        if docstatus is not None:
+            query = query.where(table.docstatus == docstatus)
+        if modified_after:
+            query = query.where(table.modified > modified_after)
+        return query
+
+    return add_conditions
+
+
+def watermark_name(doctype, filters=None):
+    """The Tally Export Watermark of delta exports of ``doctype`` with the ``applied_filters``
+    ``filters``: named after the doctype when there are none, else after both."""
+    if not filters:
+        return doctype
+    key = hashlib.sha1(_filters_key(filters).encode()).hexdigest()[:10]
+    return f"{doctype}-{key}"
+
+
+def get_watermark(doctype, filters=None):
+    """The ``modified`` of the newest record in the last delta export of ``doctype`` with
+    ``filters``, if any."""
+    return frappe.db.get_value(WATERMARK_DOCTYPE, watermark_name(doctype, filters), "last_modified")
+
+
+def save_watermark(doctype, last_modified, records, filters=None):
+    name = watermark_name(doctype, filters)
+    values = {'last_modified': last_modified, 'last_export': now_datetime(), 'records': records}
+    if frappe.db.exists(WATERMARK_DOCTYPE, name):
+        frappe.db.set_value(WATERMARK_DOCTYPE, name, values)
+    else:
+        frappe.get_doc({
+            'doctype': WATERMARK_DOCTYPE,
+            'reference_doctype': doctype,
+            'filters': _filters_key(filters) if filters else "",
+            **values,
+        }).insert(ignore_permissions=True, set_name=name)
+
+
+def _existing_fields(meta, fields):
+    return [field for field in fields if _has_field(meta, field)]
+
+
+def _date_field(meta, source):
+    if source.date_field and _has_field(meta, source.date_field):
+        return source.date_field
+    return None
+
+
+def _filters_key(filters):
+    return json.dumps(filters, sort_keys=True)
+
+
+def _has_field(meta, field):
+    return field in STANDARD_FIELDS or meta.has_field(field)
+
+
+def _text(value):
+    # The same text a template CSV would hold; dates in the dd-mm-yyyy the converters expect
+    if value is None or value == "":
+        return BLANK
+    if hasattr(value, 'strftime'):
+        return value.strftime("%d-%m-%Y")
+    return str(value)
@@ -166,6 +166,12 @@ app_license = "mit"
 # 	],
 # }
 
+scheduler_events = {
+	"daily": [
+		"tallyerp9_import.output_cache.evict_cache"
+	],
+}
+
 # Testing
 # -------
 
@@ -241,3 +247,7 @@ app_license = "mit"
 # default_log_clearing_doctypes = {
 # 	"Logging DocType Name": 30  # days to retain logs
 # }
+
+default_log_clearing_doctypes = {
+	"Tally Conversion Log": 90
+}
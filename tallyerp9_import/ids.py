@@ -0,0 +1,63 @@
+import uuid
+
+import frappe
+from frappe.utils import cint
+
+# Namespace of the UUIDv5 GUIDs. Changing it changes the GUID of every record ever
+# exported, Tally would import them all again as new records.
+TALLY_NAMESPACE = uuid.UUID("6f1b7c2e-3d4a-5b8e-9c0f-1a2b3c4d5e6f")
+
+
+class TallyIds:
+    """Hands out the GUIDs, REMOTEIDs and VCHKEYs of one conversion.
+
+    They are random unless ``deterministic``. Then each is a UUIDv5 of the company,
+    the doctype and the ERPNext name of the record, so converting the same record
+    again gives Tally the same ID and it updates the record instead of importing a
+    duplicate. The same input then also converts to the same XML.
+
+        ids = TallyIds("Techsolvo Pvt Ltd", deterministic=True)
+        ids.guid("Journal Entry", "ACC-JV-2024-00001")
+        ids.guid("Journal Entry", "ACC-JV-2024-00001", "VCHKEY")  # a second ID for the same voucher
+    """
+
+    def __init__(self, company=None, deterministic=False):
+        self.company = company or ""
+        self.deterministic = deterministic
+
+    def guid(self, doctype, name, purpose=None, default=None):
+        """The ID of the record ``name``; ``purpose`` tells apart IDs of the same record.
+
+        Records without a name get a random ID. ``default`` is what to give instead of
+        a random one when IDs aren't deterministic.
+        """
+        if self.deterministic and not _blank(name):
+            key = f"{self.company}:{doctype}:{name}"
+            if purpose:
+                key = f"{key}:{purpose}"
+            return str(uuid.uuid5(TALLY_NAMESPACE, key))
+        if default is not None:
+            return default
+        return str(uuid.uuid4())
+
+
+def record_ids(filters=None, deterministic_ids=False):
+    """The ``TallyIds`` of a conversion, for the company in ``filters`` or else the default company."""
+    company = frappe.parse_json(filters or {}).get('company')
+    if not company:
+        company = frappe.defaults.get_global_default("company")
+    return TallyIds(company, deterministic=bool(cint(deterministic_ids)))
+
+
+def record_names(df, fallback=None):
+    """The ERPNext name of every row: the ``name`` column, or the ``fallback`` column
+    for CSVs that don't have one."""
+    for name in ("name", fallback):
+        if name and name in df.columns:
+            return df[name].tolist()
+    return [None] * len(df)
+
+
+def _blank(name):
+    # NaN is the only value that isn't equal to itself
+    return name is None or name != name or str(name).strip() == ""
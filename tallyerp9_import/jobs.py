@@ -0,0 +1,155 @@
+from functools import partial
+
+import frappe
+from frappe.utils import cint
+
+from tallyerp9_import.push_pipeline import convert_and_push
+from tallyerp9_import.reference_index import check_references, throw_dangling
+from tallyerp9_import.tally_client import SETTINGS, parse_push, push_batching
+
+# Converter for each "Select Type" option of Tally ERP9 Import Settings
+CONVERTERS = {
+    'Customer': 'tallyerp9_import.customer.convert_csv_to_xml',
+    'Supplier': 'tallyerp9_import.supplier.convert_csv_to_xml',
+    'Sales Order': 'tallyerp9_import.sales_order.convert_csv_to_xml',
+    'Purchase Order': 'tallyerp9_import.purchase_order.convert_csv_to_xml',
+    'Journal Entry': 'tallyerp9_import.journal_entry.convert_csv_to_xml',
+    'Payment Entry': 'tallyerp9_import.payment_entry.convert_csv_to_xml',
+    'Item Master': 'tallyerp9_import.item_master.convert_csv_to_xml',
+    'Chart of Accounts': 'tallyerp9_import.coa.convert_csv_to_xml'
+}
+
+# Realtime events the settings form listens to
+PROGRESS_EVENT = "tally_conversion_progress"
+DONE_EVENT = "tally_conversion_done"
+
+# Multi-GB exports take a while, don't let RQ kill them at the long queue's default
+JOB_TIMEOUT = 4 * 60 * 60
+
+
+@frappe.whitelist()
+def enqueue_conversion(
+    select_type,
+    csv_file=None,
+    doctype=None,
+    docname=None,
+    filters=None,
+    deterministic_ids=False,
+    workers=0,
+    batching=None,
+    compression=None,
+    push=None,
+    validate_references=False,
+):
+    """Run a converter as a background job and return its job id straight away.
+
+    Progress and the finished file are sent to the current user as realtime events,
+    both carrying the job id. With ``filters``, the records are read from the database
+    instead of ``csv_file``. With ``push``, the XML is sent to Tally's HTTP server at the
+    URL saved in the settings as well and the done event carries Tally's counters under
+    ``push``. With ``validate_references``, the job fails naming every ledger, party or
+    item the vouchers refer to that doesn't exist, before converting any of them.
+    """
+    # Only those who can change the settings convert from them
+    frappe.has_permission(SETTINGS, "write", throw=True)
+    if select_type not in CONVERTERS:
+        frappe.throw(f"XML conversion is not supported for {select_type}")
+    if filters is None and not csv_file:
+        frappe.throw("Please upload a CSV file first.")
+
+    job_id = frappe.generate_hash(length=12)
+    frappe.enqueue(
+        "tallyerp9_import.jobs.run_conversion",
+        queue="long",
+        timeout=JOB_TIMEOUT,
+        select_type=select_type,
+        csv_file=csv_file,
+        doctype=doctype,
+        docname=docname,
+        filters=filters,
+        deterministic_ids=deterministic_ids,
+        workers=workers,
+        batching=batching,
+        compression=compression,
+        push=push,
+        validate_references=validate_references,
+        conversion_id=job_id,
+        user=frappe.session.user,
+    )
+    return {'job_id': job_id}
+
+
+def run_conversion(
+    select_type,
+    csv_file,
+    doctype,
+    docname,
+    filters,
+    conversion_id,
+    user,
+    deterministic_ids=False,
+    workers=0,
+    batching=None,
+    compression=None,
+    push=None,
+    validate_references=False,
+):
+    converter = frappe.get_attr(CONVERTERS[select_type])
+    push = parse_push(push)
+    if push:
+        # Each batch goes to Tally as a request of its own, sent while the next is converted
+        batching = push_batching(batching)
+        converter = partial(convert_and_push, push, converter)
+    try:
+        if cint(validate_references):
+            # Before any XML is written
+            throw_dangling({select_type: check_references(select_type, csv_file, filters)})
+        result = converter(
+            doctype,
+            docname,
+            csv_file,
+            job_id=conversion_id,
+            filters=filters,
+            deterministic_ids=deterministic_ids,
+            workers=workers,
+            batching=batching,
+            compression=compression,
+        )
+    except Exception as e:
+        frappe.publish_realtime(
+            DONE_EVENT, {'job_id': conversion_id, 'error': str(e)}, user=user
+        )
+        raise
+
+    # The File doc is only visible once the job commits
+    frappe.publish_realtime(
+        DONE_EVENT, {'job_id': conversion_id, 'select_type': select_type, **result}, user=user, after_commit=True
+    )
+    return result
+
+
+def track_progress(chunks, job_id):
+    """Pass chunks through unchanged, publishing how many rows are done after each one.
+
+    ``chunks`` is what a reader returns, it has to be able to ``count_rows()``. Does
+    nothing unless the conversion runs as a job.
+    """
+    if not job_id:
+        return chunks
+    return _track_progress(chunks, job_id, chunks.count_rows())
+
+
+def _track_progress(chunks, job_id, total):
+    done = 0
+    publish_progress(job_id, done, total)
+    for chunk in chunks:
+        yield chunk
+        # The converter has written the chunk, or handed it to a worker, by the time it asks for the next one
+        done += len(chunk)
+        publish_progress(job_id, done, max(total, done))
+
+
+def publish_progress(job_id, done, total):
+    frappe.publish_realtime(
+        PROGRESS_EVENT, {'job_id': job_id, 'done': done, 'total': total}, user=frappe.session.user
+    )
@@ -0,0 +1,147 @@
+import xml.etree.ElementTree as ET
+from operator import attrgetter
+
+from tallyerp9_import.xml_writer import Fragment, _escape, _escape_text, serialize
+
+
+class Field:
+    """Text or attribute value taken from the record being written, by attribute name.
+
+    An ``optional`` attribute is left out when the record's value is empty.
+    """
+
+    def __init__(self, name, optional=False):
+        self.name = name
+        self.optional = optional
+        self.get = attrgetter(name)
+
+
+class Element:
+    """An element of a mapping: its tag, attributes and either text or children.
+
+    Attribute values and text are constants or ``Field``s. Children are ``Element``s,
+    or ElementTree elements and ``Fragment``s for what is the same in every record.
+    """
+
+    def __init__(self, tag, attrib=None, text=None, children=()):
+        if text is not None and children:
+            raise ValueError(f"{tag} can't have both text and children in a mapping")
+        self.tag = tag
+        self.attrib = attrib or {}
+        self.text = text
+        self.children = list(children)
+
+
+class Mapping:
+    """How a Tally object is written from a record, declared once as a tree of elements.
+
+    The tree is compiled, for each indentation it is written at, into a single format
+    string with a slot for every ``Field``, so writing a record only escapes its values
+    and fills them in. The markup is byte for byte what ``TallyXMLWriter.write`` makes
+    of the same elements built with ElementTree.
+
+        GROUP = Mapping(Element("TALLYMESSAGE", {"xmlns:UDF": "TallyUDF"}, children=[
+            Element("GROUP", {"NAME": Field("name"), "ACTION": Field("action", optional=True)}, children=[
+                Element("PARENT", text=Field("parent")),
+                GROUP_FLAGS,
+            ]),
+        ]))
+
+        GROUP.write(writer, prepared_rows(name=..., action=..., parent=...))
+    """
+
+    def __init__(self, element):
+        self.element = element
+        self._emitters = {}
+
+    def write(self, writer, records):
+        """Write a record for each of ``records``, to a ``TallyXMLWriter`` or ``RenderedElements``."""
+        emit = self.emitter(*writer.layout())
+        writer.write_rendered(map(emit, records))
+
+    def emitter(self, indent, addindent, newl):
+        """The function rendering a record at this indentation, compiled the first time."""
+        key = (indent, addindent, newl)
+        emit = self._emitters.get(key)
+        if emit is None:
+            parts = []
+            _compile(parts, self.element, indent, addindent, newl)
+            emit = self._emitters[key] = _emitter(parts)
+        return emit
+
+
+def _compile(parts, element, indent, addindent, newl):
+    # Constant markup goes into ``parts`` as strings, a function per value of the record
+    if isinstance(element, Fragment):
+        parts.append(element.render(indent, addindent, newl))
+        return
+    if isinstance(element, ET.Element):
+        serialize(parts, element, indent, addindent, newl)
+        return
+
+    tag = element.tag
+    parts.append(f"{indent}<{tag}")
+    # xmlns declarations first, as ``TallyXMLWriter`` writes them
+    for key, value in sorted(element.attrib.items(), key=lambda item: not (item[0] == "xmlns" or item[0].startswith("xmlns:"))):
+        if isinstance(value, Field):
+            parts.append(_attribute(key, value))
+        else:
+            parts.append(f' {key}="{_escape(str(value))}"')
+
+    if element.children:
+        parts.append(">" + newl)
+        for child in element.children:
+            _compile(parts, child, indent + addindent, addindent, newl)
+        parts.append(f"{indent}</{tag}>{newl}")
+    elif isinstance(element.text, Field):
+        parts.append(_text(tag, element.text, newl))
+    elif element.text:
+        parts.append(f">{_escape_text(str(element.text))}</{tag}>{newl}")
+    else:
+        parts.append(f"/>{newl}")
+
+
+def _attribute(key, field):
+    get = field.get
+
+    def render(record):
+        value = get(record)
+        if field.optional and not value:
+            return ""
+        return f' {key}="{_escape(str(value))}"'
+
+    return render
+
+
+def _text(tag, field, newl):
+    get = field.get
+    empty = f"/>{newl}"
+
+    def render(record):
+        value = get(record)
+        if value is None:
+            return empty
+        value = str(value)
+        if not value:
+            return empty
+        return f">{_escape_text(value)}</{tag}>{newl}"
+
+    return render
+
+
+def _emitter(parts):
+    # Runs of constant markup become the literal text of one format string
+    template = []
+    values = []
+    for part in parts:
+        if isinstance(part, str):
+            template.append(part.replace("{", "{{").replace("}", "}}"))
+        else:
+            template.append("{}")
+            values.append(part)
+    fill = "".join(template).format
+
+    def emit(record):
+        return fill(*[value(record) for value in values])
+
+    return emit
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import re
+
+import frappe
+from frappe.utils import add_to_date, cint, now_datetime
+
+import tallyerp9_import
+from tallyerp9_import.profiling import stage
+
+CACHE_DOCTYPE = "Tally Conversion Cache"
+
+# How long an unused XML is kept and how much of them in total; site_config.json
+# can override both with tally_cache_max_age_days and tally_cache_max_size_mb
+MAX_CACHE_AGE_DAYS = 30
+MAX_CACHE_SIZE_MB = 1024
+
+# File names the converters give their XML, "customer_output_1a2b3c4d.xml", its batches,
+# "customer_output_1a2b3c4d_001.xml", gzipped "customer_output_1a2b3c4d.xml.gz", and the
+# zip of the XML or its batches, "customer_output_1a2b3c4d.zip"
+OUTPUT_FILE_NAME = re.compile(r"^[a-z_]+_output_[0-9a-f]{8}(\.zip|(_[0-9]{3,})?\.xml(\.gz)?)$")
+OUTPUT_FOLDER = "Home/Attachments"
+
+
+@stage("hash")
+def conversion_cache_key(converter, file_path, **settings):
+    """The cache key of converting ``file_path`` with ``converter`` and ``settings``.
+
+    A sha256 of the file's bytes, the converter, the settings and the app version,
+    so a new release of a converter doesn't hand out XML made by the old one.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    context = json.dumps(
+        {'converter': converter, 'version': tallyerp9_import.__version__, 'settings': settings},
+        sort_keys=True,
+        default=str,
+    )
+    digest.update(context.encode())
+    return digest.hexdigest()
+
+
+@stage("cache")
+def get_cached_output(cache_key):
+    """The result of an earlier conversion with the same key, if its XML is still there."""
+    entry = frappe.db.get_value(CACHE_DOCTYPE, cache_key, ["file", "file_url", "file_name", "hits"], as_dict=True)
+    if not entry:
+        return None
+
+    file_path = frappe.get_site_path('public', 'files', entry.file_name)
+    if not (frappe.db.exists("File", entry.file) and os.path.exists(file_path)):
+        # The XML was deleted since, convert again
+        frappe.delete_doc(CACHE_DOCTYPE, cache_key, ignore_permissions=True)
+        return None
+
+    frappe.db.set_value(
+        CACHE_DOCTYPE, cache_key, {'last_used': now_datetime(), 'hits': (entry.hits or 0) + 1}, update_modified=False
+    )
+    return {
+        'file_url': entry.file_url,
+        'file_name': entry.file_name,
+        'file_path': file_path
+    }
+
+
+@stage("cache")
+def cache_output(cache_key, converter, file_doc, xml_file_path):
+    """Remember the XML a conversion made, for the next conversion with the same key.
+
+    Does nothing without a key, conversions from the database aren't cached.
+    """
+    if not cache_key:
+        return
+    try:
+        frappe.get_doc({
+            'doctype': CACHE_DOCTYPE,
+            'cache_key': cache_key,
+            'converter': converter,
+            'file': file_doc.name,
+            'file_url': file_doc.file_url,
+            'file_name': file_doc.file_name,
+            'file_size': os.path.getsize(xml_file_path),
+            'last_used': now_datetime(),
+        }).insert(ignore_permissions=True)
+    except frappe.DuplicateEntryError:
+        # An identical conversion running alongside this one cached its XML first,
+        # this one's File is left for evict_cache to clean up
+        pass
+
+
+def evict_cache():
+    """Delete the cached XML that hasn't been used for a while, then the least recently
+    used until the rest fits in the size limit. Also deletes converter output no cache
+    entry refers to once it is as old. Runs daily.
+    """
+    max_age_days = cint(frappe.conf.get("tally_cache_max_age_days")) or MAX_CACHE_AGE_DAYS
+    max_size = (cint(frappe.conf.get("tally_cache_max_size_mb")) or MAX_CACHE_SIZE_MB) * 1024 * 1024
+    cutoff = add_to_date(now_datetime(), days=-max_age_days)
+
+    entries = frappe.get_all(
+        CACHE_DOCTYPE, fields=["name", "file", "file_size", "last_used"], order_by="last_used desc"
+    )
+    cached_files = set()
+    total_size = 0
+    for entry in entries:
+        total_size += entry.file_size or 0
+        if not entry.last_used or entry.last_used < cutoff or total_size > max_size:
+            frappe.delete_doc(CACHE_DOCTYPE, entry.name, ignore_permissions=True)
+            _delete_file(entry.file)
+        else:
+            cached_files.add(entry.file)
+
+    # Output of conversions from the database, of ones that lost a race to the cache,
+    # and of ones from before there was a cache
+    output_files = frappe.get_all(
+        "File",
+        filters={
+            'folder': OUTPUT_FOLDER,
+            'file_name': ["like", "%_output_%"],
+            'attached_to_doctype': ["is", "not set"],
+            'creation': ["<", cutoff],
+        },
+        fields=["name", "file_name"],
+    )
+    for output_file in output_files:
+        if output_file.name not in cached_files and OUTPUT_FILE_NAME.match(output_file.file_name):
+            _delete_file(output_file.name)
+
+
+def _delete_file(name):
+    # Deleting the File doc deletes the file on disk as well
+    if name and frappe.db.exists("File", name):
+        frappe.delete_doc("File", name, ignore_permissions=True)
@@ -0,0 +1,56 @@
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from frappe.utils import cint
+
+from tallyerp9_import.xml_writer import RenderedElements
+
+# Batches handed to the pool ahead of the one being written, per worker; bounds the
+# memory of records waiting for a worker and of XML waiting to be written
+PENDING_PER_WORKER = 2
+
+
+def write_messages(writer, write, records, *args, workers=1, batch_size=1):
+    """Write ``records`` with ``write(writer, records, *args)``, in ``workers`` processes if more than one.
+
+    In parallel the records are cut into batches of ``batch_size``, every batch is
+    rendered by ``write`` in a worker process and the XML is written in the order of
+    the batches, the same output as writing them all here. That takes ``write`` to be
+    a module-level function that writes each batch the same whichever batches came
+    before it: records that depend on each other must be in the same batch.
+
+        write_messages(writer, write_tally_messages, chunks, ids, workers=workers)
+    """
+    workers = cint(workers)
+    if workers <= 1:
+        write(writer, records, *args)
+        return
+
+    layout = writer.layout()
+    # Spawned rather than forked, so the workers don't inherit the site's database connection
+    pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        pending = deque()
+        for batch in _batches(records, batch_size):
+            pending.append(pool.submit(_render, write, batch, args, layout))
+            if len(pending) >= workers * PENDING_PER_WORKER:
+                writer.write_rendered(pending.popleft().result())
+        while pending:
+            writer.write_rendered(pending.popleft().result())
+    finally:
+        # After a failure, don't render what will never be written
+        pool.shutdown(cancel_futures=True)
+
+
+def _render(write, batch, args, layout):
+    rendered = RenderedElements(*layout)
+    write(rendered, batch, *args)
+    return rendered.elements
+
+
+def _batches(records, batch_size):
+    records = iter(records)
+    while batch := list(islice(records, batch_size)):
+        yield batch
@@ -0,0 +1,168 @@
+import xml.etree.ElementTree as ET
+
+from tallyerp9_import.db_source import ACTION_COLUMN
+from tallyerp9_import.ids import record_names
+from tallyerp9_import.mapping import Element, Field, Mapping
+from tallyerp9_import.utils import column, prepared_rows, raw_column
+from tallyerp9_import.xml_writer import Fragment
+
+# Flags every ledger has, the same for all of them
+LEDGER_FLAGS = Fragment()
+ET.SubElement(LEDGER_FLAGS, "GSTTYPE").text = ""
+ET.SubElement(LEDGER_FLAGS, "APPROPRIATEFOR").text = ""
+ET.SubElement(LEDGER_FLAGS, "EXCISELEDGERCLASSIFICATION").text = ""
+ET.SubElement(LEDGER_FLAGS, "EXCISEDUTYTYPE").text = ""
+ET.SubElement(LEDGER_FLAGS, "EXCISENATUREOFPURCHASE").text = ""
+ET.SubElement(LEDGER_FLAGS, "LEDGERFBTCATEGORY").text = ""
+ET.SubElement(LEDGER_FLAGS, "ISBILLWISEON").text = "Yes"
+ET.SubElement(LEDGER_FLAGS, "ISCOSTCENTRESON").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISINTERESTON").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ALLOWINMOBILE").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISCOSTTRACKINGON").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISBENEFICIARYCODEON").text = "No"
+ET.SubElement(LEDGER_FLAGS, "PLASINCOMEEXPENSE").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISUPDATINGTARGETID").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ASORIGINAL").text = "Yes"
+ET.SubElement(LEDGER_FLAGS, "ISCONDENSED").text = "No"
+ET.SubElement(LEDGER_FLAGS, "AFFECTSSTOCK").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISRATEINCLUSIVEVAT").text = "No"
+ET.SubElement(LEDGER_FLAGS, "FORPAYROLL").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISABCENABLED").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISCREDITDAYSCHKON").text = "No"
+ET.SubElement(LEDGER_FLAGS, "INTERESTONBILLWISE").text = "No"
+ET.SubElement(LEDGER_FLAGS, "OVERRIDEINTEREST").text = "No"
+ET.SubElement(LEDGER_FLAGS, "OVERRIDEADVINTEREST").text = "No"
+ET.SubElement(LEDGER_FLAGS, "USEFORVAT").text = "No"
+ET.SubElement(LEDGER_FLAGS, "IGNORETDSEXEMPT").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISTCSAPPLICABLE").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISTDSAPPLICABLE").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISFBTAPPLICABLE").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISGSTAPPLICABLE").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISEXCISEAPPLICABLE").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISTDSEXPENSE").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISEDLIAPPLICABLE").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISRELATEDPARTY").text = "No"
+ET.SubElement(LEDGER_FLAGS, "USEFORESIELIGIBILITY").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISINTERESTINCLLASTDAY").text = "No"
+ET.SubElement(LEDGER_FLAGS, "APPROPRIATETAXVALUE").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISBEHAVEASDUTY").text = "No"
+ET.SubElement(LEDGER_FLAGS, "INTERESTINCLDAYOFADDITION").text = "No"
+ET.SubElement(LEDGER_FLAGS, "INTERESTINCLDAYOFDEDUCTION").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISOTHTERRITORYASSESSEE").text = "No"
+ET.SubElement(LEDGER_FLAGS, "OVERRIDECREDITLIMIT").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISAGAINSTFORMC").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISCHEQUEPRINTINGENABLED").text = "Yes"
+ET.SubElement(LEDGER_FLAGS, "ISPAYUPLOAD").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISPAYBATCHONLYSAL").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISBNFCODESUPPORTED").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ALLOWEXPORTWITHERRORS").text = "No"
+ET.SubElement(LEDGER_FLAGS, "CONSIDERPURCHASEFOREXPORT").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISTRANSPORTER").text = "No"
+ET.SubElement(LEDGER_FLAGS, "USEFORNOTIONALITC").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISECOMMOPERATOR").text = "No"
+ET.SubElement(LEDGER_FLAGS, "SHOWINPAYSLIP").text = "No"
+ET.SubElement(LEDGER_FLAGS, "USEFORGRATUITY").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISTDSPROJECTED").text = "No"
+ET.SubElement(LEDGER_FLAGS, "FORSERVICETAX").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISINPUTCREDIT").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISEXEMPTED").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISABATEMENTAPPLICABLE").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISSTXPARTY").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISSTXNONREALIZEDTYPE").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISUSEDFORCVD").text = "No"
+ET.SubElement(LEDGER_FLAGS, "LEDBELONGSTONONTAXABLE").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISEXCISEMERCHANTEXPORTER").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISPARTYEXEMPTED").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISSEZPARTY").text = "No"
+ET.SubElement(LEDGER_FLAGS, "TDSDEDUCTEEISSPECIALRATE").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISECHEQUESUPPORTED").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISEDDSUPPORTED").text = "No"
+ET.SubElement(LEDGER_FLAGS, "HASECHEQUEDELIVERYMODE").text = "No"
+ET.SubElement(LEDGER_FLAGS, "HASECHEQUEDELIVERYTO").text = "No"
+ET.SubElement(LEDGER_FLAGS, "HASECHEQUEPRINTLOCATION").text = "No"
+ET.SubElement(LEDGER_FLAGS, "HASECHEQUEPAYABLELOCATION").text = "No"
+ET.SubElement(LEDGER_FLAGS, "HASECHEQUEBANKLOCATION").text = "No"
+ET.SubElement(LEDGER_FLAGS, "HASEDDDELIVERYMODE").text = "No"
+ET.SubElement(LEDGER_FLAGS, "HASEDDDELIVERYTO").text = "No"
+ET.SubElement(LEDGER_FLAGS, "HASEDDPRINTLOCATION").text = "No"
+ET.SubElement(LEDGER_FLAGS, "HASEDDPAYABLELOCATION").text = "No"
+ET.SubElement(LEDGER_FLAGS, "HASEDDBANKLOCATION").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISEBANKINGENABLED").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISEXPORTFILEENCRYPTED").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISBATCHENABLED").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISPRODUCTCODEBASED").text = "No"
+ET.SubElement(LEDGER_FLAGS, "HASEDDCITY").text = "No"
+ET.SubElement(LEDGER_FLAGS, "HASECHEQUECITY").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISFILENAMEFORMATSUPPORTED").text = "No"
+ET.SubElement(LEDGER_FLAGS, "HASCLIENTCODE").text = "No"
+ET.SubElement(LEDGER_FLAGS, "PAYINSISBATCHAPPLICABLE").text = "No"
+ET.SubElement(LEDGER_FLAGS, "PAYINSISFILENUMAPP").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISSALARYTRANSGROUPEDFORBRS").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISEBANKINGSUPPORTED").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISSCBUAE").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISBANKSTATUSAPP").text = "No"
+ET.SubElement(LEDGER_FLAGS, "ISSALARYGROUPED").text = "No"
+ET.SubElement(LEDGER_FLAGS, "USEFORPURCHASETAX").text = "No"
+ET.SubElement(LEDGER_FLAGS, "AUDITED").text = "No"
+ET.SubElement(LEDGER_FLAGS, "SORTPOSITION").text = "1000"
+
+
+def party_ledger(parent):
+    """The LEDGER of a customer or supplier, under the group ``parent``."""
+    # Country, registration and group of every ledger, the same for all of them
+    details = Fragment()
+    ET.SubElement(details, "COUNTRYNAME").text = "India"
+    ET.SubElement(details, "GSTREGISTRATIONTYPE").text = "Regular"
+    ET.SubElement(details, "VATDEALERTYPE").text = "Regular"
+    ET.SubElement(details, "PARENT").text = parent
+    ET.SubElement(details, "TAXCLASSIFICATIONNAME").text = ""
+    ET.SubElement(details, "TAXTYPE").text = "Others"
+
+    return Mapping(Element("TALLYMESSAGE", {"xmlns_UDF": "TallyUDF"}, children=[
+        Element("LEDGER", {
+            "NAME": Field("name"),
+            "RESERVEDNAME": "",
+            # Delta exports say whether Tally already has the ledger
+            "ACTION": Field("action", optional=True),
+        }, children=[
+            Element("ADDRESS.LIST", {"TYPE": "String"}, children=[Element("ADDRESS", text=Field("address"))]),
+            Element("MAILINGNAME.LIST", {"TYPE": "String"}, children=[Element("MAILINGNAME", text=Field("name"))]),
+            Element("OLDAUDITENTRYIDS.LIST", {"TYPE": "Number"}, children=[Element("OLDAUDITENTRYIDS", text="-1")]),
+            Element("GUID", text=Field("guid")),
+            Element("EMAIL", text=Field("email")),
+            Element("PRIORSTATENAME", text=Field("address")),
+            Element("PINCODE"),
+            Element("WEBSITE", text=Field("website")),
+            Element("INCOMETAXNUMBER", text=Field("pan")),
+            details,
+            Element("COUNTRYOFRESIDENCE", text=Field("country")),
+            Element("LEDGERPHONE", text=Field("mobile_no")),
+            Element("LEDGERFAX", text=Field("mobile_no")),
+            Element("LEDGERCONTACT", text=Field("name")),
+            Element("LEDGERMOBILE", text=Field("mobile_no")),
+            LEDGER_FLAGS,
+            Element("ALTERID", text=Field("alter_id")),
+            Element("LANGUAGENAME.LIST", children=[
+                Element("NAME.LIST", {"TYPE": "String"}, children=[Element("NAME", text=Field("name"))]),
+            ]),
+        ]),
+    ]))
+
+
+def write_party_ledgers(writer, ledger, chunks, ids, doctype, prefix):
+    """Write the ``ledger`` of every customer or supplier in ``chunks``; ``prefix`` is that
+    of their name and address columns, "customer" for ``customer_name``."""
+    for df in chunks:
+        names = record_names(df, fallback=f'{prefix}_name')
+        ledger.write(writer, prepared_rows(
+            name=column(df, f'{prefix}_name', escape=True),
+            email=column(df, 'email_id', escape=True),
+            address=column(df, f'{prefix}_primary_address', escape=True),
+            website=column(df, 'website', escape=True),
+            pan=column(df, 'pan', escape=True),
+            country=column(df, 'country', escape=True),
+            mobile_no=column(df, 'mobile_no', escape=True),
+            action=raw_column(df, ACTION_COLUMN),
+            guid=[ids.guid(doctype, name) for name in names],
+            alter_id=[str(index + 1) for index in df.index],
+        ))
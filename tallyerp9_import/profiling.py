@@ -0,0 +1,287 @@
+import functools
+import inspect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import frappe
+import psutil
+from frappe.query_builder.functions import Avg, Count, Date, Max, Sum
+from frappe.utils import cint, flt
+
+LOG_DOCTYPE = "Tally Conversion Log"
+STAGE_DOCTYPE = "Tally Conversion Stage"
+
+# Seconds between samples of the memory of the process while a conversion runs, unless
+# the site sets tally_rss_sample_interval; every stage is sampled as it starts as well
+RSS_SAMPLE_INTERVAL = 0.1
+
+# Time of a conversion outside any of its stages: working out file names, dispatch and the like
+OTHER_STAGE = "other"
+
+# The profile of the conversion running in this context, its stages record into it
+current_profile = ContextVar("current_profile", default=None)
+
+# The profile of the last conversion that finished in this context, for callers running many
+last_profile = ContextVar("last_profile", default=None)
+
+
+def profile_conversion(convert):
+    """Profile every call of the converter ``convert`` and keep it as a Tally Conversion Log.
+
+    Its stages are recorded by the shared code it runs through: ``lookup`` of the
+    CSV, ``hash`` of the CSV for the cache key, ``cache`` lookups and stores, ``read``
+    of the rows, ``convert`` of the rows into XML written out, and ``attach`` of the
+    XML as a File. A conversion that fails is rolled back along with its log.
+    """
+    signature = inspect.signature(convert)
+
+    @functools.wraps(convert)
+    def profiled(*args, **kwargs):
+        profile = ConversionProfile()
+        token = current_profile.set(profile)
+        try:
+            with profile:
+                result = convert(*args, **kwargs)
+        finally:
+            current_profile.reset(token)
+        last_profile.set(profile)
+        save_log(profile, convert.__module__, signature.bind(*args, **kwargs).arguments, result)
+        return result
+
+    return profiled
+
+
+@contextmanager
+def stage(name, rows=0):
+    """Count the time in the block towards stage ``name`` of the conversion being profiled.
+
+    Stages nest, the time of an inner stage only counts towards the inner one. Entered
+    again, a stage adds up. Does nothing outside a profiled conversion; works as a
+    decorator as well.
+    """
+    profile = current_profile.get()
+    if not profile:
+        yield
+        return
+    profile.enter(name)
+    try:
+        yield
+    finally:
+        profile.exit(rows)
+
+
+def timed_chunks(chunks):
+    """Pass chunks through unchanged, counting the time it takes to get each one and its
+    rows towards the ``read`` stage."""
+    if not current_profile.get():
+        return chunks
+    return _timed_chunks(chunks)
+
+
+def _timed_chunks(chunks):
+    chunks = iter(chunks)
+    while True:
+        profile = current_profile.get()
+        profile.enter("read")
+        try:
+            chunk = next(chunks, None)
+        finally:
+            profile.exit(len(chunk) if chunk is not None else 0)
+        if chunk is None:
+            return
+        yield chunk
+
+
+class ConversionProfile:
+    """Wall time, CPU time, peak memory and rows of each stage of a conversion.
+
+    CPU time is that of the whole process, worker processes of parallel conversions
+    aren't in it. Memory is the resident memory of the process, sampled as each stage
+    starts and from a thread every ``interval`` seconds in between, put down to the
+    stage running at the time, so a spike shorter than the interval can be missed.
+    """
+
+    def __init__(self, interval=None):
+        self.interval = interval or flt(frappe.conf.get("tally_rss_sample_interval")) or RSS_SAMPLE_INTERVAL
+        self.process = psutil.Process()
+        self.stages = {}
+        self.seconds = self.cpu_seconds = 0.0
+        self.rss_before = self.peak_rss = 0
+        # Open stages as [name, wall start, cpu start, wall of inner stages, cpu of inner stages]
+        self._stack = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.rss_before = self.peak_rss = self.process.memory_info().rss
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample_once()
+        self.seconds = time.perf_counter() - self._wall
+        self.cpu_seconds = time.process_time() - self._cpu
+        other = self._stage(OTHER_STAGE)
+        other['seconds'] = max(self.seconds - sum(s['seconds'] for s in self.stages.values()), 0)
+        other['cpu_seconds'] = max(self.cpu_seconds - sum(s['cpu_seconds'] for s in self.stages.values()), 0)
+
+    def enter(self, name):
+        self._stage(name)['calls'] += 1
+        self._stack.append([name, time.perf_counter(), time.process_time(), 0.0, 0.0])
+        # Every stage gets a sample, however short
+        self._sample_once()
+
+    def exit(self, rows=0):
+        name, wall, cpu, inner_wall, inner_cpu = self._stack.pop()
+        wall = time.perf_counter() - wall
+        cpu = time.process_time() - cpu
+        stage = self.stages[name]
+        stage['seconds'] += wall - inner_wall
+        stage['cpu_seconds'] += cpu - inner_cpu
+        stage['rows'] += rows
+        if self._stack:
+            self._stack[-1][3] += wall
+            self._stack[-1][4] += cpu
+
+    @property
+    def rows(self):
+        return self.stages['read']['rows'] if 'read' in self.stages else 0
+
+    def _stage(self, name):
+        if name not in self.stages:
+            self.stages[name] = {'seconds': 0.0, 'cpu_seconds': 0.0, 'peak_rss': 0, 'rows': 0, 'calls': 0}
+        return self.stages[name]
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self._sample_once()
+
+    def _sample_once(self):
+        rss = self.process.memory_info().rss
+        self.peak_rss = max(self.peak_rss, rss)
+        try:
+            name = self._stack[-1][0]
+        except IndexError:
+            name = OTHER_STAGE
+        stage = self._stage(name)
+        stage['peak_rss'] = max(stage['peak_rss'], rss)
+
+
+def save_log(profile, converter, arguments, result):
+    """Keep the profile of a conversion as a Tally Conversion Log."""
+    try:
+        frappe.get_doc({
+            'doctype': LOG_DOCTYPE,
+            'converter': converter,
+            'source': arguments.get('csv_file') if arguments.get('filters') is None else "ERPNext Database",
+            'workers': arguments.get('workers') or 0,
+            **conversion_stats(profile, result),
+            'stages': [
+                {
+                    'stage': name,
+                    'seconds': stage['seconds'],
+                    'cpu_seconds': stage['cpu_seconds'],
+                    'peak_memory_mb': _mb(stage['peak_rss']),
+                    'row_count': stage['rows'],
+                    'calls': stage['calls'],
+                }
+                for name, stage in profile.stages.items()
+            ],
+        }).insert(ignore_permissions=True)
+    except Exception:
+        # The XML is there, a log that couldn't be kept mustn't fail the conversion
+        frappe.log_error(f"Could not log the conversion of {converter}")
+
+
+def conversion_stats(profile, result):
+    """The figures of a finished conversion, as its Tally Conversion Log has them."""
+    files = result.get('files', [result])
+    return {
+        'cached': 'convert' not in profile.stages,
+        'row_count': profile.rows,
+        'seconds': profile.seconds,
+        'cpu_seconds': profile.cpu_seconds,
+        'rows_per_sec': profile.rows / profile.seconds if profile.seconds else 0,
+        'peak_memory_mb': _mb(profile.peak_rss),
+        'memory_before_mb': _mb(profile.rss_before),
+        'output_files': len(files),
+        'output_mb': _mb(sum(os.path.getsize(f['file_path']) for f in files if os.path.exists(f['file_path']))),
+    }
+
+
+@frappe.whitelist()
+def get_conversion_stats(converter=None, from_date=None, to_date=None, by_day=False):
+    """How the converters performed in the conversions logged from ``from_date`` to ``to_date``.
+
+    For each converter, or each converter and day with ``by_day``: the conversions, rows,
+    average seconds, rows per second and peak memory, and the average seconds and peak
+    memory of each stage. Conversions answered from the cache are left out.
+
+        frappe.call("tallyerp9_import.profiling.get_conversion_stats", {converter: "tallyerp9_import.customer"})
+    """
+    frappe.has_permission(LOG_DOCTYPE, throw=True)
+
+    log = frappe.qb.DocType(LOG_DOCTYPE)
+    stage = frappe.qb.DocType(STAGE_DOCTYPE)
+    conditions = log.cached == 0
+    if converter:
+        conditions &= log.converter == converter
+    if from_date:
+        conditions &= Date(log.creation) >= from_date
+    if to_date:
+        conditions &= Date(log.creation) <= to_date
+    group_by = [log.converter, Date(log.creation).as_("day")] if cint(by_day) else [log.converter]
+
+    conversions = (
+        frappe.qb.from_(log)
+        .select(
+            *group_by,
+            Count(log.name).as_("conversions"),
+            Sum(log.row_count).as_("rows"),
+            Avg(log.seconds).as_("avg_seconds"),
+            Avg(log.cpu_seconds).as_("avg_cpu_seconds"),
+            (Sum(log.row_count) / Sum(log.seconds)).as_("rows_per_sec"),
+            Avg(log.peak_memory_mb).as_("avg_peak_memory_mb"),
+            Max(log.peak_memory_mb).as_("max_peak_memory_mb"),
+        )
+        .where(conditions)
+        .groupby(*group_by)
+        .orderby(*group_by)
+        .run(as_dict=True)
+    )
+    stages = (
+        frappe.qb.from_(log)
+        .join(stage)
+        .on((stage.parent == log.name) & (stage.parenttype == LOG_DOCTYPE))
+        .select(
+            *group_by,
+            stage.stage,
+            Avg(stage.seconds).as_("avg_seconds"),
+            Avg(stage.cpu_seconds).as_("avg_cpu_seconds"),
+            Max(stage.peak_memory_mb).as_("max_peak_memory_mb"),
+        )
+        .where(conditions)
+        .groupby(*group_by, stage.stage)
+        .run(as_dict=True)
+    )
+
+    by_key = {(row.converter, row.get('day')): {**row, 'stages': {}} for row in conversions}
+    for row in stages:
+        by_key[(row.converter, row.get('day'))]['stages'][row.stage] = {
+            'avg_seconds': row.avg_seconds,
+            'avg_cpu_seconds': row.avg_cpu_seconds,
+            'max_peak_memory_mb': row.max_peak_memory_mb,
+        }
+    return list(by_key.values())
+
+
+def _mb(size):
+    return round(size / 1024 / 1024, 1)
@@ -1,78 +1,267 @@
 import frappe
-import pandas as pd
 import xml.etree.ElementTree as ET
-from xml.dom import minidom
-import uuid
-import io, os
-import re
-import xml.sax.saxutils as saxutils
-from datetime import datetime, timedelta
+from collections import namedtuple
+from tallyerp9_import.converter import Converter
+from tallyerp9_import.db_source import DBSource
+from tallyerp9_import.ids import record_names
+from tallyerp9_import.profiling import profile_conversion
+from tallyerp9_import.utils import (
+    ColumnFields, column, map_unique, prepared_rows, raw_column, tally_date, tally_order_due_date, template_records
+)
+from tallyerp9_import.xml_writer import Fragment
 
-@frappe.whitelist()
-def convert_csv_to_xml(doctype, docname, csv_file):
-    try:
-        file_doc = frappe.get_doc('File', {'file_url': csv_file})
-        
-        # Determine the correct file path for both public and private files
-        if file_doc.is_private:
-            # For private files
-            file_path = frappe.get_site_path('private', 'files', file_doc.file_name)
-        else:
-            # For public files
-            file_path = frappe.get_site_path('public', 'files', file_doc.file_name)
-        
-        print(f"File Path: {file_path}")
-        print(f"Is Private: {file_doc.is_private}")
-        
-        # Check if the file exists
-        if not os.path.exists(file_path):
-            frappe.throw(f"File {file_path} not found")
+# The CSV columns this converter reads, for converting straight from the database
+DB_SOURCE = DBSource(
+    "Purchase Order",
+    fields=["transaction_date", "schedule_date", "supplier", "supplier_name", "total", "shipping_address"],
+    child_table="items",
+    child_fields=["item_name", "base_rate", "amount", "qty", "stock_qty", "gst_class"],
+    date_field="transaction_date",
+)
+
+# Voucher flags a CSV can set per row, and what they are when it doesn't
+VOUCHER_FLAGS = ColumnFields([
+    ("DIFFACTUALQTY", 'diff_actual_qty', 'No'),
+    ("ISMSTFROMSYNC", 'is_mst_from_sync', 'No'),
+    ("ASORIGINAL", 'as_original', 'No'),
+    ("AUDITED", 'audited', 'No'),
+    ("FORJOBCOSTING", 'for_job_costing', 'No'),
+    ("ISOPTIONAL", 'is_optional', 'No'),
+])
+
+# The ones after EFFECTIVEDATE
+MORE_VOUCHER_FLAGS = ColumnFields([
+    ("USEFOREXCISE", 'use_for_excise', 'No'),
+    ("ISFORJOBWORKIN", 'is_for_job_work_in', 'No'),
+    ("ALLOWCONSUMPTION", 'allow_consumption', 'No'),
+    ("USEFORINTEREST", 'use_for_interest', 'No'),
+    ("USEFORGAINLOSS", 'use_for_gain_loss', 'No'),
+    ("USEFORGODOWNTRANSFER", 'use_for_godown_transfer', 'No'),
+    ("USEFORCOMPOUND", 'use_for_compound', 'No'),
+    ("USEFORSERVICETAX", 'use_for_service_tax', 'No'),
+    ("ISDELETED", 'is_deleted', 'No'),
+    ("ISONHOLD", 'is_on_hold', 'No'),
+    ("ISBOENOTAPPLICABLE", 'is_boe_not_applicable', 'No'),
+    ("ISEXCISEVOUCHER", 'is_excise_voucher', 'No'),
+    ("EXCISETAXOVERRIDE", 'excise_tax_override', 'No'),
+    ("USEFORTAXUNITTRANSFER", 'use_for_tax_unit_transfer', 'No'),
+    ("IGNOREPOSVALIDATION", 'ignore_pos_validation', 'No'),
+    ("EXCISEOPENING", 'excise_opening', 'No'),
+    ("USEFORFINALPRODUCTION", 'use_for_final_production', 'No'),
+    ("ISTDSOVERRIDDEN", 'is_tds_overridden', 'No'),
+    ("ISTCSOVERRIDDEN", 'is_tcs_overridden', 'No'),
+    ("ISTDSTCSCASHVCH", 'is_tds_tcs_cash_vch', 'No'),
+    ("INCLUDEADVPYMTVCH", 'include_adv_payment_vch', 'No'),
+    ("ISSUBWORKSCONTRACT", 'is_sub_works_contract', 'No'),
+    ("ISVATOVERRIDDEN", 'is_vat_overridden', 'No'),
+    ("IGNOREORIGVCHDATE", 'ignore_orig_vch_date', 'No'),
+    ("ISVATPAIDATCUSTOMS", 'is_vat_paid_at_customs', 'No'),
+    ("ISDECLAREDTOCUSTOMS", 'is_declared_to_customs', 'No'),
+    ("ISSERVICETAXOVERRIDDEN", 'is_service_tax_overridden', 'No'),
+    ("ISISDVOUCHER", 'is_isd_voucher', 'No'),
+    ("ISEXCISEOVERRIDDEN", 'is_excise_overridden', 'No'),
+    ("ISEXCISESUPPLYVCH", 'is_excise_supply_vch', 'No'),
+    ("ISGSTOVERRIDDEN", 'is_gst_overridden', 'No'),
+    ("GSTNOTEXPORTED", 'gst_not_exported', 'No'),
+    ("IGNOREGSTINVALIDATION", 'ignore_gst_invalidation', 'No'),
+    ("ISGSTREFUND", 'is_gst_refund', 'No'),
+    ("ISGSTSECSEVENAPPLICABLE", 'is_gst_sec_seven_applicable', 'No'),
+    ("ISVATPRINCIPALACCOUNT", 'is_vat_principal_account', 'No'),
+    ("ISSHIPPINGWITHINSTATE", 'is_shipping_within_state', 'No'),
+    ("ISOVERSEASTOURISTTRANS", 'is_overseas_tourist_trans', 'No'),
+    ("ISDESIGNATEDZONEPARTY", 'is_designated_zone_party', 'No'),
+    ("ISCANCELLED", 'is_cancelled', 'No'),
+    ("HASCASHFLOW", 'has_cash_flow', 'No'),
+    ("ISPOSTDATED", 'is_post_dated', 'No'),
+    ("USETRACKINGNUMBER", 'use_tracking_number', 'No'),
+    ("ISINVOICE", 'is_invoice', 'Yes'),
+    ("ISJOURNAL", 'is_journal', 'No'),
+    ("HASDISCOUNTS", 'has_discounts', 'No'),
+    ("ASPAYSLIP", 'as_pay_slip', 'No'),
+    ("ISCOSTCENTRE", 'is_cost_centre', 'No'),
+    ("ISSTXNONREALIZEDVCH", 'is_stx_non_realized_vch', 'No'),
+    ("ISEXCISEMANUFACTURERON", 'is_excise_manufacturer_on', 'No'),
+    ("ISBLANKCHEQUE", 'is_blank_cheque', 'No'),
+    ("ISVOID", 'is_void', 'No'),
+    ("ORDERLINESTATUS", 'order_line_status', 'No'),
+    ("VATISAGNSTCANCSALES", 'vat_is_against_cancel_sales', 'No'),
+    ("VATISPURCEXEMPTED", 'vat_is_purchase_exempted', 'No'),
+    ("ISVATRESTAXINVOICE", 'is_vat_rest_tax_invoice', 'No'),
+    ("VATISASSESABLECALCVCH", 'vat_is_assessable_calc_vch', 'No'),
+    ("ISVATDUTYPAID", 'is_vat_duty_paid', 'Yes'),
+    ("ISDELIVERYSAMEASCONSIGNEE", 'is_delivery_same_as_consignee', 'No'),
+    ("ISDISPATCHSAMEASCONSIGNOR", 'is_dispatch_same_as consignor', 'No'),
+    ("CHANGEVCHMODE", 'change_vch_mode', 'No'),
+])
+
+# Empty lists every voucher has after its VOUCHERKEY
+VOUCHER_EMPTY_LISTS = Fragment()
+for tag in [
+    "EWAYBILLDETAILS.LIST", "EXCLUDEDTAXATIONS.LIST", "OLDAUDITENTRIES.LIST", "ACCOUNTAUDITENTRIES.LIST",
+    "AUDITENTRIES.LIST", "DUTYHEADDETAILS.LIST"
+]:
+    ET.SubElement(VOUCHER_EMPTY_LISTS, tag).text = "     "
+
+BATCH_EMPTY_LISTS = Fragment()
+for tag in [
+    "ADDITIONALDETAILS.LIST", "VOUCHERCOMPONENTLIST.LIST"
+]:
+    ET.SubElement(BATCH_EMPTY_LISTS, tag).text = "     "
+
+# Closed sub-lists with empty content, the same for every item
+ALLOCATION_EMPTY_LISTS = Fragment()
+for tag in [
+    "SERVICETAXDETAILS.LIST", "BANKALLOCATIONS.LIST", "BILLALLOCATIONS.LIST", "INTERESTCOLLECTION.LIST",
+    "OLDAUDITENTRIES.LIST", "ACCOUNTAUDITENTRIES.LIST", "AUDITENTRIES.LIST", "INPUTCRALLOCS.LIST",
+    "DUTYHEADDETAILS.LIST", "EXCISEDUTYHEADDETAILS.LIST", "RATEDETAILS.LIST", "SUMMARYALLOCS.LIST",
+    "STPYMTDETAILS.LIST", "EXCISEPAYMENTALLOCATIONS.LIST", "TAXBILLALLOCATIONS.LIST",
+    "TAXOBJECTALLOCATIONS.LIST", "TDSEXPENSEALLOCATIONS.LIST", "VATSTATUTORYDETAILS.LIST",
+    "COSTTRACKALLOCATIONS.LIST", "REFVOUCHERDETAILS.LIST", "INVOICEWISEDETAILS.LIST", "VATITCDETAILS.LIST",
+    "ADVANCETAXDETAILS.LIST"
+]:
+    ET.SubElement(ALLOCATION_EMPTY_LISTS, tag).text = "        "
+
+INVOICE_ALLOCATION_EMPTY_LISTS = Fragment()
+for tag in [
+    "DUTYHEADDETAILS.LIST", "SUPPLEMENTARYDUTYHEADDETAILS.LIST", "TAXOBJECTALLOCATIONS.LIST",
+    "REFVOUCHERDETAILS.LIST", "EXCISEALLOCATIONS.LIST", "EXPENSEALLOCATIONS.LIST", "INVOICEDELNOTES.LIST",
+    "INVOICEORDERLIST.LIST", "INVOICEINDENTLIST.LIST", "ATTENDANCEENTRIES.LIST", "ORIGINVOICEDETAILS.LIST",
+    "INVOICEEXPORTLIST.LIST"
+]:
+    ET.SubElement(INVOICE_ALLOCATION_EMPTY_LISTS, tag).text = "        "
+
+LEDGER_ENTRY_EMPTY_LISTS = Fragment()
+for tag in [
+    "SERVICETAXDETAILS.LIST", "BANKALLOCATIONS.LIST", "BILLALLOCATIONS.LIST", "INTERESTCOLLECTION.LIST",
+    "OLDAUDITENTRIES.LIST", "ACCOUNTAUDITENTRIES.LIST", "AUDITENTRIES.LIST", "INPUTCRALLOCS.LIST",
+    "DUTYHEADDETAILS.LIST", "EXCISEDUTYHEADDETAILS.LIST", "RATEDETAILS.LIST", "SUMMARYALLOCS.LIST",
+    "STPYMTDETAILS.LIST", "EXCISEPAYMENTALLOCATIONS.LIST", "TAXBILLALLOCATIONS.LIST",
+    "TAXOBJECTALLOCATIONS.LIST", "TDSEXPENSEALLOCATIONS.LIST", "VATSTATUTORYDETAILS.LIST",
+    "COSTTRACKALLOCATIONS.LIST", "REFVOUCHERDETAILS.LIST", "INVOICEWISEDETAILS.LIST", "VATITCDETAILS.LIST",
+    "ADVANCETAXDETAILS.LIST"
+]:
+    ET.SubElement(LEDGER_ENTRY_EMPTY_LISTS, tag).text = "        "
 
-    except Exception as file_error:
-        frappe.log_error(f"File Retrieval Error: {str(file_error)}")
-        frappe.throw(f"Error retrieving CSV file: {str(file_error)}")
+ALLOCATION_PAYROLL_LISTS = Fragment()
+for tag in [
+    "PAYROLLMODEOFPAYMENT.LIST", "ATTDRECORDS.LIST", "GSTEWAYCONSIGNORADDRESS.LIST",
+    "GSTEWAYCONSIGNEEADDRESS.LIST", "TEMPGSTRATEDETAILS.LIST"
+]:
+    ET.SubElement(ALLOCATION_PAYROLL_LISTS, tag).text = "        "
 
-    df = pd.read_csv(file_path, skiprows=[*range(0, 15), 16, 17, 18, 19], encoding='utf-8')
-    df.columns = df.columns.str.strip()
+# A row of a purchase order, the order's own with its first item or one of its other
+# items; a module-level type so grouped rows can be sent to worker processes
+OrderRow = namedtuple("OrderRow", [
+    "index", "order", "name", "formatted_date", "reference", "supplier_name", "old_audit_entry_id",
+    "country_of_residence", "shipping_address", "supplier", "voucher_type_name", "voucher_number",
+    "cst_form_issue_type", "cst_form_recv_type", "fbt_payment_type", "persisted_view", "basic_buyer_name",
+    "vch_gst_class", "flags", "more_flags", "alter_id", "master_id", "voucher_key", "item_name",
+    "inventory_is_deemed_positive", "inventory_is_last_deemed_positive", "is_auto_negate", "is_customs_clearance",
+    "is_track_component", "is_track_production", "is_primary_item", "is_scrap", "base_rate", "inventory_amount", "qty",
+    "batch_name", "indent_no", "order_no", "tracking_number", "dynamic_cst_is_cleared", "amount", "stock_qty",
+    "order_due_date_text", "gst_class", "is_deemed_positive", "ledger_from_item", "remove_zero_entries",
+    "is_party_ledger", "is_last_deemed_positive", "is_cap_vat_tax_altered", "is_cap_vat_not_claimed",
+    "ledger_gst_class", "ledger_is_deemed_positive", "ledger_is_party_ledger", "ledger_is_last_deemed_positive",
+    "ledger_name",
+])
 
-    # Create the XML root
-    envelope = ET.Element("ENVELOPE")
+# Purchase orders each worker renders at a time in parallel conversions
+ORDERS_PER_BATCH = 100
+
+@frappe.whitelist()
+@profile_conversion
+def convert_csv_to_xml(doctype, docname, csv_file=None, job_id=None, filters=None, deterministic_ids=False, workers=0,
+                       batching=None, compression=None):
+    return CONVERTER.convert(csv_file, job_id, filters, deterministic_ids, workers, batching, compression)
 
-    # Create HEADER
-    header = ET.SubElement(envelope, "HEADER")
-    ET.SubElement(header, "TALLYREQUEST").text = "Import Data"
 
-    # Create BODY
-    body = ET.SubElement(envelope, "BODY")
-    import_data = ET.SubElement(body, "IMPORTDATA")
+def order_rows(chunks):
+    """The rows of every chunk as ``OrderRow``s, every field stringified, escaped and
+    reformatted once per column instead of once per row."""
+    for df in chunks:
+        # ALTERID and MASTERID fall back to the row number
+        row_numbers = [str(index + 1) for index in df.index]
 
-    # Create REQUESTDESC
-    request_desc = ET.SubElement(import_data, "REQUESTDESC")
-    ET.SubElement(request_desc, "REPORTNAME").text = "Vouchers"
-    static_variables = ET.SubElement(request_desc, "STATICVARIABLES")
-    ET.SubElement(static_variables, "SVCURRENTCOMPANY").text = "Techsolvo"
+        yield from prepared_rows(
+            OrderRow,
+            index=df.index.tolist(),
+            # Without names in the CSV every row is an order of its own
+            order=df['name'].tolist() if 'name' in df.columns else df.index.tolist(),
+            name=record_names(df),
+            formatted_date=map_unique(raw_column(df, 'transaction_date', default=''), tally_date),
+            reference=column(df, 'name', escape=True, strip=True),
+            supplier_name=column(df, 'supplier_name', escape=True),
+            old_audit_entry_id=column(df, 'old_audit_entry_id', default='-1'),
+            country_of_residence=column(df, 'country_of_residence', default='India'),
+            shipping_address=column(df, 'shipping_address', default='Delhi'),
+            supplier=column(df, 'supplier', default=None, escape=True),
+            voucher_type_name=column(df, 'voucher_type_name', default='Purchase Order'),
+            voucher_number=column(df, 'voucher_number', default='1'),
+            cst_form_issue_type=column(df, 'cst_form_issue_type'),
+            cst_form_recv_type=column(df, 'cst_form_recv_type'),
+            fbt_payment_type=column(df, 'fbt_payment_type', default='Default'),
+            persisted_view=column(df, 'persisted_view', default='Invoice Voucher View'),
+            basic_buyer_name=column(df, 'basic_buyer_name', default='Techsolvo'),
+            vch_gst_class=column(df, 'vch_gst_class'),
+            flags=VOUCHER_FLAGS.values(df),
+            more_flags=MORE_VOUCHER_FLAGS.values(df),
+            alter_id=column(df, 'alter_id') if 'alter_id' in df.columns else row_numbers,
+            master_id=column(df, 'master_id') if 'master_id' in df.columns else row_numbers,
+            voucher_key=column(df, 'voucher_key', default='194914205827104'),
+            item_name=column(df, 'item_name', default=None, escape=True),
+            inventory_is_deemed_positive=column(df, 'is_deemed_positive', default='Yes', escape=True),
+            inventory_is_last_deemed_positive=column(df, 'is_last_deemed_positive', default='Yes', escape=True),
+            is_auto_negate=column(df, 'is_auto_negate', default='No', escape=True),
+            is_customs_clearance=column(df, 'is_customs_clearance', default='No', escape=True),
+            is_track_component=column(df, 'is_track_component', default='No', escape=True),
+            is_track_production=column(df, 'is_track_production', default='No', escape=True),
+            is_primary_item=column(df, 'is_primary_item', default='No', escape=True),
+            is_scrap=column(df, 'is_scrap', default='No', escape=True),
+            base_rate=column(df, 'base_rate', default=None, escape=True),
+            inventory_amount=column(df, 'amount', default=None, escape=True),
+            qty=column(df, 'qty', default=None, escape=True),
+            batch_name=column(df, 'batch_name', default='Primary Batch'),
+            indent_no=column(df, 'indent_no'),
+            order_no=column(df, 'name', default='PUR/ORD/001_24'),
+            tracking_number=column(df, 'tracking_number'),
+            dynamic_cst_is_cleared=column(df, 'dynamic_cst_is_cleared', default='No'),
+            amount=column(df, 'amount', default=None),
+            stock_qty=column(df, 'stock_qty', default=None),
+            order_due_date_text=map_unique(raw_column(df, 'transaction_date'), tally_order_due_date),
+            gst_class=column(df, 'gst_class'),
+            is_deemed_positive=column(df, 'is_deemed_positive', default='Yes'),
+            ledger_from_item=column(df, 'ledger_from_item', default='No'),
+            remove_zero_entries=column(df, 'remove_zero_entries', default='No'),
+            is_party_ledger=column(df, 'is_party_ledger', default='No'),
+            is_last_deemed_positive=column(df, 'is_last_deemed_positive', default='Yes'),
+            is_cap_vat_tax_altered=column(df, 'is_cap_vat_tax_altered', default='No'),
+            is_cap_vat_not_claimed=column(df, 'is_cap_vat_not_claimed', default='No'),
+            ledger_gst_class=column(df, 'gst_class', default='Standard Rate'),
+            ledger_is_deemed_positive=column(df, 'is_deemed_positive', default='No'),
+            ledger_is_party_ledger=column(df, 'is_party_ledger', default='Yes'),
+            ledger_is_last_deemed_positive=column(df, 'is_last_deemed_positive', default='No'),
+            ledger_name=column(df, 'supplier_name', default=None),
+        )
 
-    # Create REQUESTDATA
-    request_data = ET.SubElement(import_data, "REQUESTDATA")
 
-    # Iterate over the rows to create VOUCHER elements
-    for _, row in df.iterrows():
-        if 'transaction_date' in row and row['transaction_date']:
-            day, month, year = row['transaction_date'].split("-")
-            formatted_date = f"{year}{month}{day}"
-        else:
-            formatted_date = ""
+def group_orders(chunks):
+    """Every purchase order of ``chunks`` as the list of its rows, one per item, the first
+    with the order's own fields; only the order being read is held."""
+    return template_records(order_rows(chunks), field="order")
 
-        purchase_order_number = saxutils.escape(str(row.get('name', '')).strip())
-        delivery_due_date = saxutils.escape(str(row.get('schedule_date', '')).strip())
-        supplier_name = saxutils.escape(str(row.get('supplier_name', '')))
-        amount = saxutils.escape(str(row.get('total', '')))
+
+def write_tally_messages(writer, orders, ids):
+    for lines in orders:
+        # The order's own fields are on its first row
+        row = lines[0]
+        formatted_date = row.formatted_date
+        supplier_name = row.supplier_name
 
         # Create a unique GUID for this purchase order
-        guid = str(uuid.uuid4())
+        guid = ids.guid("Purchase Order", row.name)
 
         # Create VOUCHER element
-        voucher = ET.SubElement(request_data, "TALLYMESSAGE", xmlns_UDF="TallyUDF")
+        voucher = ET.Element("TALLYMESSAGE", xmlns_UDF="TallyUDF")
         voucher_element = ET.SubElement(voucher, "VOUCHER", {
             "REMOTEID": f"{guid}-00000008",
             "VCHKEY": f"{guid}-0000b146:00000010",
@@ -83,341 +272,111 @@ def convert_csv_to_xml(doctype, docname, csv_file):
 
         # Add fields to VOUCHER, Add OLDAUDITENTRYIDS.LIST
         old_audit_entry_ids = ET.SubElement(voucher_element, "OLDAUDITENTRYIDS.LIST", TYPE="Number")
-        ET.SubElement(old_audit_entry_ids, "OLDAUDITENTRYIDS").text = str(row.get('old_audit_entry_id', '-1'))  # Default to -1 if not present
+        ET.SubElement(old_audit_entry_ids, "OLDAUDITENTRYIDS").text = row.old_audit_entry_id  # Default to -1 if not present
         ET.SubElement(voucher_element, "DATE").text = formatted_date
         ET.SubElement(voucher_element, "GUID").text = f"{guid}-00000008"
-        ET.SubElement(voucher_element, "COUNTRYOFRESIDENCE").text = str(row.get('country_of_residence', 'India'))  # Default to India
-        ET.SubElement(voucher_element, "PLACEOFSUPPLY").text = str(row.get('shipping_address', 'Delhi'))  # Default to Delhi
-        ET.SubElement(voucher_element, "PARTYNAME").text = saxutils.escape(str(row['supplier'])) 
+        ET.SubElement(voucher_element, "COUNTRYOFRESIDENCE").text = row.country_of_residence  # Default to India
+        ET.SubElement(voucher_element, "PLACEOFSUPPLY").text = row.shipping_address  # Default to Delhi
+        ET.SubElement(voucher_element, "PARTYNAME").text = row.supplier
         ET.SubElement(voucher_element, "PARTYLEDGERNAME").text = supplier_name  # Assuming same as PARTYNAME
-        ET.SubElement(voucher_element, "VOUCHERTYPENAME").text = str(row.get('voucher_type_name', 'Purchase Order'))  # Default to Purchase Order
-        ET.SubElement(voucher_element, "REFERENCE").text = purchase_order_number
-        ET.SubElement(voucher_element, "VOUCHERNUMBER").text = str(row.get('voucher_number', '1'))  # Assuming constant value
+        ET.SubElement(voucher_element, "VOUCHERTYPENAME").text = row.voucher_type_name  # Default to Purchase Order
+        ET.SubElement(voucher_element, "REFERENCE").text = row.reference
+        ET.SubElement(voucher_element, "VOUCHERNUMBER").text = row.voucher_number  # Assuming constant value
         ET.SubElement(voucher_element, "BASICBASEPARTYNAME").text = supplier_name
-        ET.SubElement(voucher_element, "CSTFORMISSUETYPE").text = str(row.get('cst_form_issue_type', ''))
-        ET.SubElement(voucher_element, "CSTFORMRECVTYPE").text = str(row.get('cst_form_recv_type', ''))
-        ET.SubElement(voucher_element, "FBTPAYMENTTYPE").text = str(row.get('fbt_payment_type', 'Default'))  # Default to Default
-        ET.SubElement(voucher_element, "PERSISTEDVIEW").text = str(row.get('persisted_view', 'Invoice Voucher View'))  # Default to Invoice Voucher View
-        ET.SubElement(voucher_element, "BASICBUYERNAME").text = str(row.get('basic_buyer_name', 'Techsolvo'))  # Default to Techsolvo
-        ET.SubElement(voucher_element, "VCHGSTCLASS").text = str(row.get('vch_gst_class', ''))
-        ET.SubElement(voucher_element, "DIFFACTUALQTY").text = str(row.get('diff_actual_qty', 'No'))
-        ET.SubElement(voucher_element, "ISMSTFROMSYNC").text = str(row.get('is_mst_from_sync', 'No'))
-        ET.SubElement(voucher_element, "ASORIGINAL").text = str(row.get('as_original', 'No'))
-        ET.SubElement(voucher_element, "AUDITED").text = str(row.get('audited', 'No'))
-        ET.SubElement(voucher_element, "FORJOBCOSTING").text = str(row.get('for_job_costing', 'No'))
-        ET.SubElement(voucher_element, "ISOPTIONAL").text = str(row.get('is_optional', 'No'))
+        ET.SubElement(voucher_element, "CSTFORMISSUETYPE").text = row.cst_form_issue_type
+        ET.SubElement(voucher_element, "CSTFORMRECVTYPE").text = row.cst_form_recv_type
+        ET.SubElement(voucher_element, "FBTPAYMENTTYPE").text = row.fbt_payment_type  # Default to Default
+        ET.SubElement(voucher_element, "PERSISTEDVIEW").text = row.persisted_view  # Default to Invoice Voucher View
+        ET.SubElement(voucher_element, "BASICBUYERNAME").text = row.basic_buyer_name  # Default to Techsolvo
+        ET.SubElement(voucher_element, "VCHGSTCLASS").text = row.vch_gst_class
+        voucher_element.extend(VOUCHER_FLAGS.elements(row.flags))
         ET.SubElement(voucher_element, "EFFECTIVEDATE").text = formatted_date
-        ET.SubElement(voucher_element, "USEFOREXCISE").text = str(row.get('use_for_excise', 'No'))
-        ET.SubElement(voucher_element, "ISFORJOBWORKIN").text = str(row.get('is_for_job_work_in', 'No'))
-        ET.SubElement(voucher_element, "ALLOWCONSUMPTION").text = str(row.get('allow_consumption', 'No'))
-        ET.SubElement(voucher_element, "USEFORINTEREST").text = str(row.get('use_for_interest', 'No'))
-        ET.SubElement(voucher_element, "USEFORGAINLOSS").text = str(row.get('use_for_gain_loss', 'No'))
-        ET.SubElement(voucher_element, "USEFORGODOWNTRANSFER").text = str(row.get('use_for_godown_transfer', 'No'))
-        ET.SubElement(voucher_element, "USEFORCOMPOUND").text = str(row.get('use_for_compound', 'No'))
-        ET.SubElement(voucher_element, "USEFORSERVICETAX").text = str(row.get('use_for_service_tax', 'No'))
-        ET.SubElement(voucher_element, "ISDELETED").text = str(row.get('is_deleted', 'No'))
-        ET.SubElement(voucher_element, "ISONHOLD").text = str(row.get('is_on_hold', 'No'))
-        ET.SubElement(voucher_element, "ISBOENOTAPPLICABLE").text = str(row.get('is_boe_not_applicable', 'No'))
-        ET.SubElement(voucher_element, "ISEXCISEVOUCHER").text = str(row.get('is_excise_voucher', 'No'))
-        ET.SubElement(voucher_element, "EXCISETAXOVERRIDE").text = str(row.get('excise_tax_override', 'No'))
-        ET.SubElement(voucher_element, "USEFORTAXUNITTRANSFER").text = str(row.get('use_for_tax_unit_transfer', 'No'))
-        ET.SubElement(voucher_element, "IGNOREPOSVALIDATION").text = str(row.get('ignore_pos_validation', 'No'))
-        ET.SubElement(voucher_element, "EXCISEOPENING").text = str(row.get('excise_opening', 'No'))
-        ET.SubElement(voucher_element, "USEFORFINALPRODUCTION").text = str(row.get('use_for_final_production', 'No'))
-        ET.SubElement(voucher_element, "ISTDSOVERRIDDEN").text = str(row.get('is_tds_overridden', 'No'))
-        ET.SubElement(voucher_element, "ISTCSOVERRIDDEN").text = str(row.get('is_tcs_overridden', 'No'))
-        ET.SubElement(voucher_element, "ISTDSTCSCASHVCH").text = str(row.get('is_tds_tcs_cash_vch', 'No'))
-        ET.SubElement(voucher_element, "INCLUDEADVPYMTVCH").text = str(row.get('include_adv_payment_vch', 'No'))
-        ET.SubElement(voucher_element, "ISSUBWORKSCONTRACT").text = str(row.get('is_sub_works_contract', 'No'))
-        ET.SubElement(voucher_element, "ISVATOVERRIDDEN").text = str(row.get('is_vat_overridden', 'No'))
-        ET.SubElement(voucher_element, "IGNOREORIGVCHDATE").text = str(row.get('ignore_orig_vch_date', 'No'))
-        ET.SubElement(voucher_element, "ISVATPAIDATCUSTOMS").text = str(row.get('is_vat_paid_at_customs', 'No'))
-        ET.SubElement(voucher_element, "ISDECLAREDTOCUSTOMS").text = str(row.get('is_declared_to_customs', 'No'))
-        ET.SubElement(voucher_element, "ISSERVICETAXOVERRIDDEN").text = str(row.get('is_service_tax_overridden', 'No'))
-        ET.SubElement(voucher_element, "ISISDVOUCHER").text = str(row.get('is_isd_voucher', 'No'))
-        ET.SubElement(voucher_element, "ISEXCISEOVERRIDDEN").text = str(row.get('is_excise_overridden', 'No'))
-        ET.SubElement(voucher_element, "ISEXCISESUPPLYVCH").text = str(row.get('is_excise_supply_vch', 'No'))
-        ET.SubElement(voucher_element, "ISGSTOVERRIDDEN").text = str(row.get('is_gst_overridden', 'No'))
-        ET.SubElement(voucher_element, "GSTNOTEXPORTED").text = str(row.get('gst_not_exported', 'No'))
-        ET.SubElement(voucher_element, "IGNOREGSTINVALIDATION").text = str(row.get('ignore_gst_invalidation', 'No'))
-        ET.SubElement(voucher_element, "ISGSTREFUND").text = str(row.get('is_gst_refund', 'No'))
-        ET.SubElement(voucher_element, "ISGSTSECSEVENAPPLICABLE").text = str(row.get('is_gst_sec_seven_applicable', 'No'))
-        ET.SubElement(voucher_element, "ISVATPRINCIPALACCOUNT").text = str(row.get('is_vat_principal_account', 'No'))
-        ET.SubElement(voucher_element, "ISSHIPPINGWITHINSTATE").text = str(row.get('is_shipping_within_state', 'No'))
-        ET.SubElement(voucher_element, "ISOVERSEASTOURISTTRANS").text = str(row.get('is_overseas_tourist_trans', 'No'))
-        ET.SubElement(voucher_element, "ISDESIGNATEDZONEPARTY").text = str(row.get('is_designated_zone_party', 'No'))
-        ET.SubElement(voucher_element, "ISCANCELLED").text = str(row.get('is_cancelled', 'No'))
-        ET.SubElement(voucher_element, "HASCASHFLOW").text = str(row.get('has_cash_flow', 'No'))
-        ET.SubElement(voucher_element, "ISPOSTDATED").text = str(row.get('is_post_dated', 'No'))
-        ET.SubElement(voucher_element, "USETRACKINGNUMBER").text = str(row.get('use_tracking_number', 'No'))
-        ET.SubElement(voucher_element, "ISINVOICE").text = str(row.get('is_invoice', 'Yes'))
-        ET.SubElement(voucher_element, "ISJOURNAL").text = str(row.get('is_journal', 'No'))
-        ET.SubElement(voucher_element, "HASDISCOUNTS").text = str(row.get('has_discounts', 'No'))
-        ET.SubElement(voucher_element, "ASPAYSLIP").text = str(row.get('as_pay_slip', 'No'))
-        ET.SubElement(voucher_element, "ISCOSTCENTRE").text = str(row.get('is_cost_centre', 'No'))
-        ET.SubElement(voucher_element, "ISSTXNONREALIZEDVCH").text = str(row.get('is_stx_non_realized_vch', 'No'))
-        ET.SubElement(voucher_element, "ISEXCISEMANUFACTURERON").text = str(row.get('is_excise_manufacturer_on', 'No'))
-        ET.SubElement(voucher_element, "ISBLANKCHEQUE").text = str(row.get('is_blank_cheque', 'No'))
-        ET.SubElement(voucher_element, "ISVOID").text = str(row.get('is_void', 'No'))
-        ET.SubElement(voucher_element, "ORDERLINESTATUS").text = str(row.get('order_line_status', 'No'))
-        ET.SubElement(voucher_element, "VATISAGNSTCANCSALES").text = str(row.get('vat_is_against_cancel_sales', 'No'))
-        ET.SubElement(voucher_element, "VATISPURCEXEMPTED").text = str(row.get('vat_is_purchase_exempted', 'No'))
-        ET.SubElement(voucher_element, "ISVATRESTAXINVOICE").text = str(row.get('is_vat_rest_tax_invoice', 'No'))
-        ET.SubElement(voucher_element, "VATISASSESABLECALCVCH").text = str(row.get('vat_is_assessable_calc_vch', 'No'))
-        ET.SubElement(voucher_element, "ISVATDUTYPAID").text = str(row.get('is_vat_duty_paid', 'Yes'))
-        ET.SubElement(voucher_element, "ISDELIVERYSAMEASCONSIGNEE").text = str(row.get('is_delivery_same_as_consignee', 'No'))
-        ET.SubElement(voucher_element, "ISDISPATCHSAMEASCONSIGNOR").text = str(row.get('is_dispatch_same_as consignor', 'No'))
-        ET.SubElement(voucher_element, "CHANGEVCHMODE").text = str(row.get('change_vch_mode', 'No'))
-        ET.SubElement(voucher_element, "ALTERID").text = str(row.get('alter_id', _+1)) 
-        ET.SubElement(voucher_element, "MASTERID").text = str(row.get('master_id', _+1))  
-        ET.SubElement(voucher_element, "VOUCHERKEY").text = str(row.get('voucher_key', '194914205827104'))  
-        ET.SubElement(voucher_element, "EWAYBILLDETAILS.LIST").text = "     " 
-        ET.SubElement(voucher_element, "EXCLUDEDTAXATIONS.LIST").text = "     "
-        # Add OLDAUDITENTRIES.LIST
-        ET.SubElement(voucher_element, "OLDAUDITENTRIES.LIST").text = "     "
-        # Add ACCOUNTAUDITENTRIES.LIST
-        account_audit_entries = ET.SubElement(voucher_element, "ACCOUNTAUDITENTRIES.LIST").text = "     "
-        # Add necessary sub-elements to ACCOUNTINGAUDITENTRIES.LIST if needed
-        # Add AUDITENTRIES.LIST
-        ET.SubElement(voucher_element, "AUDITENTRIES.LIST").text = "     "
-        # Add DUTYHEADDETAILS.LIST
-        ET.SubElement(voucher_element, "DUTYHEADDETAILS.LIST").text = "     "
-        # Add INVENTORYENTRIES.LIST
-        inventory_entries = ET.SubElement(voucher_element, "INVENTORYENTRIES.LIST")
-        item_name = saxutils.escape(str(row.get('item_name')))
-        is_deemed_positive = saxutils.escape(str(row.get('is_deemed_positive', 'Yes')))
-        is_last_deemed_positive = saxutils.escape(str(row.get('is_last_deemed_positive', 'Yes')))
-        is_auto_negate = saxutils.escape(str(row.get('is_auto_negate', 'No')))
-        is_customs_clearance = saxutils.escape(str(row.get('is_customs_clearance', 'No')))
-        is_track_component = saxutils.escape(str(row.get('is_track_component', 'No')))
-        is_track_production = saxutils.escape(str(row.get('is_track_production', 'No')))
-        is_primary_item = saxutils.escape(str(row.get('is_primary_item', 'No')))
-        is_scrap = saxutils.escape(str(row.get('is_scrap', 'No')))
-        rate = saxutils.escape(str(row.get('base_rate')))  # Adjust as necessary
-        amount = saxutils.escape(str(row.get('amount')))  # Adjust as necessary
-        actual_qty = saxutils.escape(str(row.get('qty')))  # Adjust as necessary
-        billed_qty = saxutils.escape(str(row.get('qty')))  # Adjust as necessary
-        # Add details inside INVENTORYENTRIES.LIST
-        ET.SubElement(inventory_entries, "STOCKITEMNAME").text = item_name
-        ET.SubElement(inventory_entries, "ISDEEMEDPOSITIVE").text = is_deemed_positive
-        ET.SubElement(inventory_entries, "ISLASTDEEMEDPOSITIVE").text = is_last_deemed_positive
-        ET.SubElement(inventory_entries, "ISAUTONEGATE").text = is_auto_negate
-        ET.SubElement(inventory_entries, "ISCUSTOMSCLEARANCE").text = is_customs_clearance
-        ET.SubElement(inventory_entries, "ISTRACKCOMPONENT").text = is_track_component
-        ET.SubElement(inventory_entries, "ISTRACKPRODUCTION").text = is_track_production
-        ET.SubElement(inventory_entries, "ISPRIMARYITEM").text = is_primary_item
-        ET.SubElement(inventory_entries, "ISSCRAP").text = is_scrap
-        ET.SubElement(inventory_entries, "RATE").text = rate
-        ET.SubElement(inventory_entries, "AMOUNT").text = amount
-        ET.SubElement(inventory_entries, "ACTUALQTY").text = actual_qty
-        ET.SubElement(inventory_entries, "BILLEDQTY").text = billed_qty
-        # Create BATCHALLOCATIONS.LIST element
-        batch_allocations = ET.SubElement(inventory_entries, "BATCHALLOCATIONS.LIST")
-        # Assuming 'row' contains the relevant data
-        batch_name = str(row.get('batch_name', 'Primary Batch'))  # Default to "Primary Batch"
-        indent_no = str(row.get('indent_no', ''))  # Default to empty string
-        order_no = str(row.get('name', 'PUR/ORD/001_24'))  # Default to "PUR/ORD/001_24"
-        tracking_number = str(row.get('tracking_number', ''))  # Default to empty string
-        dynamic_cst_is_cleared = str(row.get('dynamic_cst_is_cleared', 'No'))  # Default to "No"
-        amount = str(row.get('amount')) 
-        actual_qty = str(row.get('stock_qty'))  
-        billed_qty = str(row.get('stock_qty')) 
-        order_due_date = str(row.get('order_due_date'))  
-        order_due_date_jd = str(row.get('order_due_date_jd')) 
-        order_due_date_p = str(row.get('order_due_date_p'))  
-        # Add elements to BATCHALLOCATIONS.LIST
-        ET.SubElement(batch_allocations, "BATCHNAME").text = batch_name
-        ET.SubElement(batch_allocations, "INDENTNO").text = indent_no
-        ET.SubElement(batch_allocations, "ORDERNO").text = order_no
-        ET.SubElement(batch_allocations, "TRACKINGNUMBER").text = tracking_number
-        ET.SubElement(batch_allocations, "DYNAMICCSTISCLEARED").text = dynamic_cst_is_cleared
-        ET.SubElement(batch_allocations, "AMOUNT").text = amount
-        ET.SubElement(batch_allocations, "ACTUALQTY").text = actual_qty
-        ET.SubElement(batch_allocations, "BILLEDQTY").text = billed_qty
-        td = saxutils.escape(str(row.get('transaction_date')))
-        new_date_str = (datetime.strptime(td, "%d-%m-%Y") + timedelta(days=0)).strftime("%d-%b-%Y").lstrip("0")
-        ET.SubElement(batch_allocations, "ORDERDUEDATE", JD=str(_+1), P=new_date_str).text = new_date_str
-        ET.SubElement(batch_allocations, "ADDITIONALDETAILS.LIST").text = "     "
-        ET.SubElement(batch_allocations, "VOUCHERCOMPONENTLIST.LIST").text = "     "
-        # Add ACCOUNTINGALLOCATIONS.LIST
-        accounting_allocations = ET.SubElement(inventory_entries, "ACCOUNTINGALLOCATIONS.LIST")
-        # OLDAUDITENTRYIDS.LIST
-        old_audit_entry_ids = ET.SubElement(accounting_allocations, "OLDAUDITENTRYIDS.LIST", TYPE="Number")
-        ET.SubElement(old_audit_entry_ids, "OLDAUDITENTRYIDS").text = str(row.get('old_audit_entry_id', '-1'))   
-        gst_class = str(row.get('gst_class', ''))  # Default to empty string
-        is_deemed_positive = str(row.get('is_deemed_positive', 'Yes'))  # Default to "Yes"
-        ledger_from_item = str(row.get('ledger_from_item', 'No'))  # Default to "No"
-        remove_zero_entries = str(row.get('remove_zero_entries', 'No'))  # Default to "No"
-        is_party_ledger = str(row.get('is_party_ledger', 'No'))  # Default to "No"
-        is_last_deemed_positive = str(row.get('is_last_deemed_positive', 'Yes'))  # Default to "Yes"
-        is_cap_vat_tax_altered = str(row.get('is_cap_vat_tax_altered', 'No'))  # Default to "No"
-        is_cap_vat_not_claimed = str(row.get('is_cap_vat_not_claimed', 'No'))  # Default to "No"
-        amount = str(row.get('amount'))  
-        # Add elements to ACCOUNTINGALLOCATIONS.LIST
-        ET.SubElement(accounting_allocations, "LEDGERNAME").text = "PRCORD" 
-        ET.SubElement(accounting_allocations, "GSTCLASS").text = gst_class
-        ET.SubElement(accounting_allocations, "ISDEEMEDPOSITIVE").text = is_deemed_positive
-        ET.SubElement(accounting_allocations, "LEDGERFROMITEM").text = ledger_from_item
-        ET.SubElement(accounting_allocations, "REMOVEZEROENTRIES").text = remove_zero_entries
-        ET.SubElement(accounting_allocations, "ISPARTYLEDGER").text = is_party_ledger
-        ET.SubElement(accounting_allocations, "ISLASTDEEMEDPOSITIVE").text = is_last_deemed_positive
-        ET.SubElement(accounting_allocations, "ISCAPVATTAXALTERED").text = is_cap_vat_tax_altered
-        ET.SubElement(accounting_allocations, "ISCAPVATNOTCLAIMED").text = is_cap_vat_not_claimed
-        ET.SubElement(accounting_allocations, "AMOUNT").text = amount
-
-        # Add closed sub-lists with empty content
-        def add_empty_element(parent, tag):
-            element = ET.SubElement(parent, tag)
-            element.text = "        "  # Ensure it has empty text for desired output
-
-        add_empty_element(accounting_allocations, "SERVICETAXDETAILS.LIST")
-        add_empty_element(accounting_allocations, "BANKALLOCATIONS.LIST")
-        add_empty_element(accounting_allocations, "BILLALLOCATIONS.LIST")
-        add_empty_element(accounting_allocations, "INTERESTCOLLECTION.LIST")
-        add_empty_element(accounting_allocations, "OLDAUDITENTRIES.LIST")
-        add_empty_element(accounting_allocations, "ACCOUNTAUDITENTRIES.LIST")
-        add_empty_element(accounting_allocations, "AUDITENTRIES.LIST")
-        add_empty_element(accounting_allocations, "INPUTCRALLOCS.LIST")
-        add_empty_element(accounting_allocations, "DUTYHEADDETAILS.LIST")
-        add_empty_element(accounting_allocations, "EXCISEDUTYHEADDETAILS.LIST")
-        add_empty_element(accounting_allocations, "RATEDETAILS.LIST")
-        add_empty_element(accounting_allocations, "SUMMARYALLOCS.LIST")
-        add_empty_element(accounting_allocations, "STPYMTDETAILS.LIST")
-        add_empty_element(accounting_allocations, "EXCISEPAYMENTALLOCATIONS.LIST")
-        add_empty_element(accounting_allocations, "TAXBILLALLOCATIONS.LIST")
-        add_empty_element(accounting_allocations, "TAXOBJECTALLOCATIONS.LIST")
-        add_empty_element(accounting_allocations, "TDSEXPENSEALLOCATIONS.LIST")
-        add_empty_element(accounting_allocations, "VATSTATUTORYDETAILS.LIST")
-        add_empty_element(accounting_allocations, "COSTTRACKALLOCATIONS.LIST")
-        add_empty_element(accounting_allocations, "REFVOUCHERDETAILS.LIST")
-        add_empty_element(accounting_allocations, "INVOICEWISEDETAILS.LIST")
-        add_empty_element(accounting_allocations, "VATITCDETAILS.LIST")
-        add_empty_element(accounting_allocations, "ADVANCETAXDETAILS.LIST")
-
-        def add_empty_element(parent, tag):
-            element = ET.SubElement(parent, tag)
-            element.text = "        "  
-
-        # Create the ACCOUNTINGALLOCATIONS.LIST element
-        accounting_allocations = ET.SubElement(inventory_entries, "ACCOUNTINGALLOCATIONS.LIST")
-        add_empty_element(accounting_allocations, "DUTYHEADDETAILS.LIST")
-        add_empty_element(accounting_allocations, "SUPPLEMENTARYDUTYHEADDETAILS.LIST")
-        add_empty_element(accounting_allocations, "TAXOBJECTALLOCATIONS.LIST")
-        add_empty_element(accounting_allocations, "REFVOUCHERDETAILS.LIST")
-        add_empty_element(accounting_allocations, "EXCISEALLOCATIONS.LIST")
-        add_empty_element(accounting_allocations, "EXPENSEALLOCATIONS.LIST")
-        add_empty_element(accounting_allocations, "INVOICEDELNOTES.LIST")
-        add_empty_element(accounting_allocations, "INVOICEORDERLIST.LIST")
-        add_empty_element(accounting_allocations, "INVOICEINDENTLIST.LIST")
-        add_empty_element(accounting_allocations, "ATTENDANCEENTRIES.LIST")
-        add_empty_element(accounting_allocations, "ORIGINVOICEDETAILS.LIST")
-        add_empty_element(accounting_allocations, "INVOICEEXPORTLIST.LIST")
-
-        # Creating LEDGERENTRIES.LIST with nested elements
-        ledger_entries = ET.SubElement(accounting_allocations, "LEDGERENTRIES.LIST")
-        old_audit_entry_ids_list = ET.SubElement(ledger_entries, "OLDAUDITENTRYIDS.LIST", TYPE="Number")
-        ET.SubElement(old_audit_entry_ids_list, "OLDAUDITENTRYIDS").text = str(row.get('old_audit_entry_id', '-1'))  # Default to -1 if not present
-        # Assuming 'row' contains the relevant data
-        gst_class = str(row.get('gst_class', 'Standard Rate')) 
-        is_deemed_positive = str(row.get('is_deemed_positive', 'No'))  # Default to "No"
-        ledger_from_item = str(row.get('ledger_from_item', 'No'))  # Default to "No"
-        remove_zero_entries = str(row.get('remove_zero_entries', 'No'))  # Default to "No"
-        is_party_ledger = str(row.get('is_party_ledger', 'Yes'))  # Default to "Yes"
-        is_last_deemed_positive = str(row.get('is_last_deemed_positive', 'No'))  # Default to "No"
-        is_cap_vat_tax_altered = str(row.get('is_cap_vat_tax_altered', 'No'))  # Default to "No"
-        is_cap_vat_not_claimed = str(row.get('is_cap_vat_not_claimed', 'No'))  # Default to "No"
-        amount = str(row.get('amount')) 
+        voucher_element.extend(MORE_VOUCHER_FLAGS.elements(row.more_flags))
+        ET.SubElement(voucher_element, "ALTERID").text = row.alter_id
+        ET.SubElement(voucher_element, "MASTERID").text = row.master_id
+        ET.SubElement(voucher_element, "VOUCHERKEY").text = row.voucher_key
+        # Add EWAYBILLDETAILS.LIST up to DUTYHEADDETAILS.LIST
+        voucher_element.append(VOUCHER_EMPTY_LISTS)
 
-        # Add elements to LEDGERENTRIES.LIST
-        ET.SubElement(ledger_entries, "LEDGERNAME").text = str(row.get('supplier_name'))
-        ET.SubElement(ledger_entries, "GSTCLASS").text = gst_class
-        ET.SubElement(ledger_entries, "ISDEEMEDPOSITIVE").text = is_deemed_positive
-        ET.SubElement(ledger_entries, "LEDGERFROMITEM").text = ledger_from_item
-        ET.SubElement(ledger_entries, "REMOVEZEROENTRIES").text = remove_zero_entries
-        ET.SubElement(ledger_entries, "ISPARTYLEDGER").text = is_party_ledger
-        ET.SubElement(ledger_entries, "ISLASTDEEMEDPOSITIVE").text = is_last_deemed_positive
-        ET.SubElement(ledger_entries, "ISCAPVATTAXALTERED").text = is_cap_vat_tax_altered
-        ET.SubElement(ledger_entries, "ISCAPVATNOTCLAIMED").text = is_cap_vat_not_claimed
-        ET.SubElement(ledger_entries, "AMOUNT").text = amount
-        add_empty_element(ledger_entries, "SERVICETAXDETAILS.LIST")
-        add_empty_element(ledger_entries, "BANKALLOCATIONS.LIST")
-        add_empty_element(ledger_entries, "BILLALLOCATIONS.LIST")
-        add_empty_element(ledger_entries, "INTERESTCOLLECTION.LIST")
-        add_empty_element(ledger_entries, "OLDAUDITENTRIES.LIST")
-        add_empty_element(ledger_entries, "ACCOUNTAUDITENTRIES.LIST")
-        add_empty_element(ledger_entries, "AUDITENTRIES.LIST")
-        add_empty_element(ledger_entries, "INPUTCRALLOCS.LIST")
-        add_empty_element(ledger_entries, "DUTYHEADDETAILS.LIST")
-        add_empty_element(ledger_entries, "EXCISEDUTYHEADDETAILS.LIST")
-        add_empty_element(ledger_entries, "RATEDETAILS.LIST")
-        add_empty_element(ledger_entries, "SUMMARYALLOCS.LIST")
-        add_empty_element(ledger_entries, "STPYMTDETAILS.LIST")
-        add_empty_element(ledger_entries, "EXCISEPAYMENTALLOCATIONS.LIST")
-        add_empty_element(ledger_entries, "TAXBILLALLOCATIONS.LIST")
-        add_empty_element(ledger_entries, "TAXOBJECTALLOCATIONS.LIST")
-        add_empty_element(ledger_entries, "TDSEXPENSEALLOCATIONS.LIST")
-        add_empty_element(ledger_entries, "VATSTATUTORYDETAILS.LIST")
-        add_empty_element(ledger_entries, "COSTTRACKALLOCATIONS.LIST")
-        add_empty_element(ledger_entries, "REFVOUCHERDETAILS.LIST")
-        add_empty_element(ledger_entries, "INVOICEWISEDETAILS.LIST")
-        add_empty_element(ledger_entries, "VATITCDETAILS.LIST")
-        add_empty_element(ledger_entries, "ADVANCETAXDETAILS.LIST")
-        add_empty_element(accounting_allocations, "PAYROLLMODEOFPAYMENT.LIST")
-        add_empty_element(accounting_allocations, "ATTDRECORDS.LIST")
-        add_empty_element(accounting_allocations, "GSTEWAYCONSIGNORADDRESS.LIST")
-        add_empty_element(accounting_allocations, "GSTEWAYCONSIGNEEADDRESS.LIST")
-        add_empty_element(accounting_allocations, "TEMPGSTRATEDETAILS.LIST")
+        # An INVENTORYENTRIES.LIST for every item of the order
+        for line in lines:
+            inventory_entries = ET.SubElement(voucher_element, "INVENTORYENTRIES.LIST")
+            # Add details inside INVENTORYENTRIES.LIST
+            ET.SubElement(inventory_entries, "STOCKITEMNAME").text = line.item_name
+            ET.SubElement(inventory_entries, "ISDEEMEDPOSITIVE").text = line.inventory_is_deemed_positive
+            ET.SubElement(inventory_entries, "ISLASTDEEMEDPOSITIVE").text = line.inventory_is_last_deemed_positive
+            ET.SubElement(inventory_entries, "ISAUTONEGATE").text = line.is_auto_negate
+            ET.SubElement(inventory_entries, "ISCUSTOMSCLEARANCE").text = line.is_customs_clearance
+            ET.SubElement(inventory_entries, "ISTRACKCOMPONENT").text = line.is_track_component
+            ET.SubElement(inventory_entries, "ISTRACKPRODUCTION").text = line.is_track_production
+            ET.SubElement(inventory_entries, "ISPRIMARYITEM").text = line.is_primary_item
+            ET.SubElement(inventory_entries, "ISSCRAP").text = line.is_scrap
+            ET.SubElement(inventory_entries, "RATE").text = line.base_rate
+            ET.SubElement(inventory_entries, "AMOUNT").text = line.inventory_amount
+            ET.SubElement(inventory_entries, "ACTUALQTY").text = line.qty
+            ET.SubElement(inventory_entries, "BILLEDQTY").text = line.qty
+            # Create BATCHALLOCATIONS.LIST element
+            batch_allocations = ET.SubElement(inventory_entries, "BATCHALLOCATIONS.LIST")
+            amount = line.amount
+            # Add elements to BATCHALLOCATIONS.LIST
+            ET.SubElement(batch_allocations, "BATCHNAME").text = line.batch_name  # Default to "Primary Batch"
+            ET.SubElement(batch_allocations, "INDENTNO").text = line.indent_no
+            ET.SubElement(batch_allocations, "ORDERNO").text = row.order_no  # Default to "PUR/ORD/001_24"
+            ET.SubElement(batch_allocations, "TRACKINGNUMBER").text = line.tracking_number
+            ET.SubElement(batch_allocations, "DYNAMICCSTISCLEARED").text = line.dynamic_cst_is_cleared  # Default to "No"
+            ET.SubElement(batch_allocations, "AMOUNT").text = amount
+            ET.SubElement(batch_allocations, "ACTUALQTY").text = line.stock_qty
+            ET.SubElement(batch_allocations, "BILLEDQTY").text = line.stock_qty
+            new_date_str = row.order_due_date_text
+            ET.SubElement(batch_allocations, "ORDERDUEDATE", JD=str(row.index + 1), P=new_date_str).text = new_date_str
+            batch_allocations.append(BATCH_EMPTY_LISTS)
+            # Add ACCOUNTINGALLOCATIONS.LIST
+            accounting_allocations = ET.SubElement(inventory_entries, "ACCOUNTINGALLOCATIONS.LIST")
+            # OLDAUDITENTRYIDS.LIST
+            old_audit_entry_ids = ET.SubElement(accounting_allocations, "OLDAUDITENTRYIDS.LIST", TYPE="Number")
+            ET.SubElement(old_audit_entry_ids, "OLDAUDITENTRYIDS").text = line.old_audit_entry_id
+            # Add elements to ACCOUNTINGALLOCATIONS.LIST
+            ET.SubElement(accounting_allocations, "LEDGERNAME").text = "PRCORD"
+            ET.SubElement(accounting_allocations, "GSTCLASS").text = line.gst_class
+            ET.SubElement(accounting_allocations, "ISDEEMEDPOSITIVE").text = line.is_deemed_positive
+            ET.SubElement(accounting_allocations, "LEDGERFROMITEM").text = line.ledger_from_item
+            ET.SubElement(accounting_allocations, "REMOVEZEROENTRIES").text = line.remove_zero_entries
+            ET.SubElement(accounting_allocations, "ISPARTYLEDGER").text = line.is_party_ledger
+            ET.SubElement(accounting_allocations, "ISLASTDEEMEDPOSITIVE").text = line.is_last_deemed_positive
+            ET.SubElement(accounting_allocations, "ISCAPVATTAXALTERED").text = line.is_cap_vat_tax_altered
+            ET.SubElement(accounting_allocations, "ISCAPVATNOTCLAIMED").text = line.is_cap_vat_not_claimed
+            ET.SubElement(accounting_allocations, "AMOUNT").text = amount
 
-    xml_str = ET.tostring(envelope, encoding='utf-8')
-    parsed_xml = minidom.parseString(xml_str)
-    pretty_xml_as_string = parsed_xml.toprettyxml(indent="  ")
+            # Add closed sub-lists with empty content
+            accounting_allocations.append(ALLOCATION_EMPTY_LISTS)
 
-    try:
-        # Save XML to a file
-        xml_dir = frappe.get_site_path('public', 'files')
-        if not os.path.exists(xml_dir):
-            os.makedirs(xml_dir)
-            print(f"Created directory: {xml_dir}")
+            # Create the ACCOUNTINGALLOCATIONS.LIST element
+            accounting_allocations = ET.SubElement(inventory_entries, "ACCOUNTINGALLOCATIONS.LIST")
+            accounting_allocations.append(INVOICE_ALLOCATION_EMPTY_LISTS)
 
-        # Generate a unique filename to prevent overwriting
-        unique_filename = f'purchase_order_output_{uuid.uuid4().hex[:8]}.xml'
-        xml_file_path = os.path.join(xml_dir, unique_filename)
+            # Creating LEDGERENTRIES.LIST with nested elements
+            ledger_entries = ET.SubElement(accounting_allocations, "LEDGERENTRIES.LIST")
+            old_audit_entry_ids_list = ET.SubElement(ledger_entries, "OLDAUDITENTRYIDS.LIST", TYPE="Number")
+            ET.SubElement(old_audit_entry_ids_list, "OLDAUDITENTRYIDS").text = line.old_audit_entry_id  # Default to -1 if not present
 
-        try:
-            with open(xml_file_path, 'w', encoding='utf-8') as xml_file:
-                xml_file.write(pretty_xml_as_string)
-            print(f"XML file created successfully at: {xml_file_path}")
-        except Exception as e:
-            print(f"Error saving XML file: {str(e)}")
-            frappe.throw(f"Error saving XML file: {str(e)}")
+            # Add elements to LEDGERENTRIES.LIST
+            ET.SubElement(ledger_entries, "LEDGERNAME").text = row.ledger_name
+            ET.SubElement(ledger_entries, "GSTCLASS").text = line.ledger_gst_class
+            ET.SubElement(ledger_entries, "ISDEEMEDPOSITIVE").text = line.ledger_is_deemed_positive  # Default to "No"
+            ET.SubElement(ledger_entries, "LEDGERFROMITEM").text = line.ledger_from_item
+            ET.SubElement(ledger_entries, "REMOVEZEROENTRIES").text = line.remove_zero_entries
+            ET.SubElement(ledger_entries, "ISPARTYLEDGER").text = line.ledger_is_party_ledger  # Default to "Yes"
+            ET.SubElement(ledger_entries, "ISLASTDEEMEDPOSITIVE").text = line.ledger_is_last_deemed_positive  # Default to "No"
+            ET.SubElement(ledger_entries, "ISCAPVATTAXALTERED").text = line.is_cap_vat_tax_altered
+            ET.SubElement(ledger_entries, "ISCAPVATNOTCLAIMED").text = line.is_cap_vat_not_claimed
+            ET.SubElement(ledger_entries, "AMOUNT").text = amount
+            ledger_entries.append(LEDGER_ENTRY_EMPTY_LISTS)
+            accounting_allocations.append(ALLOCATION_PAYROLL_LISTS)
 
-        # Create Frappe File document
-        try:
-            # Construct a proper file URL
-            site_name = frappe.local.site
-            file_url = f'/files/{unique_filename}'
-            
-            file_doc = frappe.get_doc({
-                'doctype': 'File',
-                'file_name': unique_filename,
-                'file_url': file_url,
-                'is_private': 0,
-                'folder': 'Home/Attachments'
-            }).insert(ignore_permissions=True)
-            print(f"Frappe File document created: {file_doc.name}")
+        writer.write(voucher)
 
-        except Exception as e:
-            print(f"Error creating Frappe File document: {str(e)}")
-            frappe.throw(f"Error creating Frappe File document: {str(e)}")
 
-        # Return file details with a full URL
-        return {
-            'file_url': file_url,
-            'file_name': unique_filename,
-            'file_path': xml_file_path
-        }
-    
-    except Exception as main_error:
-        print(f"Main error: {str(main_error)}")
-        frappe.log_error(f"XML Generation Error: {str(main_error)}")
-        frappe.throw(f"Error in generating XML file: {str(main_error)}")
\ No newline at end of file
+CONVERTER = Converter(
+    __name__, "purchase_order", DB_SOURCE, write_tally_messages, report_name="Vouchers", group=group_orders,
+    batch_size=ORDERS_PER_BATCH,
+)
@@ -0,0 +1,96 @@
+import asyncio
+import threading
+
+import frappe
+import requests
+
+from tallyerp9_import.tally_client import TallyClient, add_response, empty_response, request_bodies
+from tallyerp9_import.xml_writer import batch_sink
+
+# Times a request is sent again when the connection to Tally fails, waiting twice as long each time
+SEND_RETRIES = 3
+RETRY_DELAY = 2
+
+
+def convert_and_push(push, converter, *args, **kwargs):
+    """Run ``converter(*args, **kwargs)`` and push its XML to Tally while it runs.
+
+    The converter writes in a thread of its own and every batch it finishes goes on a
+    queue that ``push['in_flight']`` senders take from, so converting one batch and
+    sending the last overlap. The queue holds as many batches as there are senders,
+    a conversion that gets ahead of Tally waits for room on it. Returns the
+    converter's result with Tally's counters added up under ``push``.
+    """
+    return asyncio.run(_convert_and_push(push, converter, args, kwargs))
+
+
+async def _convert_and_push(push, converter, args, kwargs):
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(push['in_flight'])
+    queued = set()
+    failures = []
+    stopped = threading.Event()
+    totals = {**empty_response(), 'requests': 0}
+
+    def sink(file_path):
+        # Called in the converter's thread, blocks it while the queue is full
+        if stopped.is_set():
+            raise RuntimeError("The push to Tally failed")
+        queued.add(file_path)
+        asyncio.run_coroutine_threadsafe(queue.put(file_path), loop).result()
+
+    with TallyClient(push['url'], max_in_flight=push['in_flight']) as client:
+        senders = [
+            asyncio.create_task(_send(client, queue, totals, failures, stopped)) for _ in range(push['in_flight'])
+        ]
+        # The converter's thread runs in a copy of this context, sink and all
+        batch_sink.set(sink)
+        try:
+            result = await asyncio.to_thread(converter, *args, **kwargs)
+            # A cached conversion writes nothing, send what it hands back
+            for file in result.get('files', [result]):
+                if file['file_path'] not in queued:
+                    await queue.put(file['file_path'])
+        except Exception:
+            # A failed push stops the converter, report the push
+            if not failures:
+                stopped.set()
+                raise
+        finally:
+            for sender in senders:
+                await queue.put(None)
+            await asyncio.gather(*senders)
+
+    if failures:
+        frappe.throw(f"Could not push the XML to Tally at {push['url']}: {failures[0]}")
+    result['push'] = totals
+    return result
+
+
+async def _send(client, queue, totals, failures, stopped):
+    while (file_path := await queue.get()) is not None:
+        # After a failure, only make room on the queue until the converter stops
+        if stopped.is_set():
+            continue
+        try:
+            for read in request_bodies([file_path]):
+                add_response(totals, await _post(client, read))
+        except Exception as e:
+            failures.append(e)
+            stopped.set()
+
+
+async def _post(client, read):
+    for attempt in range(SEND_RETRIES + 1):
+        try:
+            return await asyncio.to_thread(_post_read, client, read)
+        except requests.ConnectionError:
+            # Tally restarting or a dropped connection, give it a moment
+            if attempt == SEND_RETRIES:
+                raise
+            await asyncio.sleep(RETRY_DELAY * 2 ** attempt)
+
+
+def _post_read(client, read):
+    # Read in the sending thread, only the requests in flight are held in memory
+    return client.post(read())
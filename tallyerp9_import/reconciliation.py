@@ -0,0 +1,221 @@
+import csv
+import os
+import re
+import uuid
+import xml.etree.ElementTree as ET
+from collections import Counter, namedtuple
+
+import frappe
+from frappe.utils import cint
+
+from tallyerp9_import.profiling import stage
+from tallyerp9_import.tally_client import COUNTERS
+from tallyerp9_import.utils import attached_file_path
+from tallyerp9_import.xml_reader import child_text, file_urls, local_name, tally_objects, xml_sources
+
+# A record of the XML sent to Tally: where it is in it, counting from 1, what it is
+# and the IDs its result comes back under
+SentRecord = namedtuple("SentRecord", ["position", "object", "voucher_type", "name", "guid", "remote_id"])
+
+# What Tally did with a record, and its error if it failed
+Result = namedtuple("Result", ["status", "message"])
+
+# Status of a record by the counter of Tally's answer it is under
+STATUSES = {
+    "CREATED": "Created",
+    "ALTERED": "Altered",
+    "DELETED": "Deleted",
+    "COMBINED": "Combined",
+    "IGNORED": "Ignored",
+    "ERRORS": "Error",
+    "CANCELLED": "Cancelled",
+    "EXCEPTIONS": "Exception",
+}
+
+# Status of a record Tally names without saying what it did with it, as in an
+# exception file, and of one it doesn't name at all
+EXCEPTION = "Exception"
+NOT_REPORTED = "Not Reported"
+
+# The GUIDs and REMOTEIDs the converters give records, with their suffixes, as Tally
+# quotes them in a LINEERROR
+ID_PATTERN = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}(?:-[0-9a-f]{8})?", re.I)
+
+# LINEERRORs that name no record, kept to show; the rest are counted
+MAX_UNMATCHED_SHOWN = 100
+
+REPORT_COLUMNS = ["Position", "Object", "Voucher Type", "Name", "GUID", "Status", "Message"]
+
+
+@frappe.whitelist()
+def reconcile_tally_response(xml_files, response_files):
+    """Match what Tally answered to importing a conversion's XML back to its records.
+
+    ``xml_files`` are the file URLs of the XML the conversion made, ``response_files``
+    those of Tally's answers to importing it or of its exception files, each a single
+    URL or a list of them. Returns the report of ``reconcile`` attached as a CSV, with
+    the records by status under ``statuses``.
+    """
+    xml_paths = [attached_file_path(file_url) for file_url in file_urls(xml_files)]
+    response_paths = [attached_file_path(file_url) for file_url in file_urls(response_files)]
+
+    report_path = frappe.get_site_path('public', 'files', f'tally_reconciliation_{uuid.uuid4().hex[:8]}.csv')
+    summary = reconcile(xml_paths, response_paths, report_path)
+
+    file_name = os.path.basename(report_path)
+    file_doc = frappe.get_doc({
+        'doctype': 'File',
+        'file_name': file_name,
+        'file_url': f'/files/{file_name}',
+        'is_private': 0,
+        'folder': 'Home/Attachments'
+    }).insert(ignore_permissions=True)
+    return {
+        'file_url': file_doc.file_url,
+        'file_name': file_doc.file_name,
+        'file_path': report_path,
+        **summary,
+    }
+
+
+def reconcile(xml_paths, response_paths, report_path):
+    """Write a CSV at ``report_path`` with what became of every record of ``xml_paths``
+    by Tally's answers in ``response_paths``, and return a summary of it.
+
+    Both are read with an iterative parser and every element let go of once read, so
+    only the results Tally gives record by record are held, not the XML. The report
+    follows the records in the order they were sent, a record Tally doesn't name is
+    "Not Reported". The summary has the records by ``statuses``, Tally's counters
+    added up under ``response`` and the LINEERRORs that name no record sent.
+    """
+    with stage("parse"):
+        results, response = response_results(response_paths)
+
+    statuses = Counter()
+    matched = set()
+    with stage("report"), open(report_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(REPORT_COLUMNS)
+        for record in sent_records(xml_paths):
+            keys = [key for key in (record.guid, record.remote_id) if key]
+            result = next((results[key] for key in keys if key in results), None)
+            matched.update(keys)
+            status, message = result or (NOT_REPORTED, "")
+            statuses[status] += 1
+            writer.writerow([
+                record.position, record.object, record.voucher_type, record.name, record.guid, status, message
+            ])
+
+    # Errors that quote an ID of no record sent are as good as naming none
+    unmatched = list(dict.fromkeys(
+        result.message for key, result in results.items() if key not in matched and result.message
+    ))
+    unmatched_count = response['unmatched_count'] + len(unmatched)
+    unmatched = (response['unmatched_errors'] + unmatched)[:MAX_UNMATCHED_SHOWN]
+    return {
+        'statuses': dict(statuses),
+        'response': {counter.lower(): response[counter.lower()] for counter in COUNTERS},
+        'unmatched_errors': unmatched,
+        'unmatched_count': unmatched_count,
+    }
+
+
+def sent_records(xml_paths):
+    """Every record of the XML files ``xml_paths``, plain, gzipped or zipped, as a ``SentRecord``.
+
+    A record is a Tally object, whether its TALLYMESSAGE has just it, as most
+    converters write them, or all of them, as journal entries are.
+    """
+    position = 0
+    for path in xml_paths:
+        for source in xml_sources(path):
+            for element in tally_objects(source):
+                position += 1
+                yield SentRecord(
+                    position,
+                    local_name(element.tag),
+                    element.get("VCHTYPE", ""),
+                    _record_name(element),
+                    child_text(element, "GUID"),
+                    element.get("REMOTEID", ""),
+                )
+
+
+def response_results(response_paths):
+    """The ``Result`` of every record Tally's answers in ``response_paths`` name, by its
+    GUID and REMOTEID, and the counters of the answers added up, as ``parse_response``
+    gives them, with the LINEERRORs that name no record.
+
+    A record is named by an element with its REMOTEID, or right under a TALLYMESSAGE
+    with its GUID, as in the XML sent and Tally's exception files, or by a LINEERROR
+    quoting one of its IDs. Its status is that of a counter in it, CREATED, ALTERED
+    and the rest, "Error" with a LINEERROR, else "Exception".
+    """
+    results = {}
+    response = {**{counter.lower(): 0 for counter in COUNTERS}, 'unmatched_errors': [], 'unmatched_count': 0}
+    for path in response_paths:
+        for source in xml_sources(path):
+            _read_response(source, results, response)
+    response['unmatched_errors'] = response['unmatched_errors'][:MAX_UNMATCHED_SHOWN]
+    return results, response
+
+
+def _read_response(source, results, response):
+    # Open elements, with whether each is a record Tally names
+    parents = []
+    records_open = 0
+    for event, element in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            is_record = bool(element.get("REMOTEID")) or bool(
+                parents and local_name(parents[-1][0].tag).upper() == "TALLYMESSAGE"
+            )
+            parents.append((element, is_record))
+            records_open += is_record
+            continue
+
+        element, is_record = parents.pop()
+        records_open -= is_record
+        tag = local_name(element.tag).upper()
+        if is_record:
+            result = _record_result(element)
+            for key in (element.get("REMOTEID"), child_text(element, "GUID")):
+                if key:
+                    results[key] = result
+        elif records_open:
+            # Part of a record, read with it
+            continue
+        elif tag in COUNTERS:
+            response[tag.lower()] += cint(element.text)
+        elif tag == "LINEERROR" and element.text and element.text.strip():
+            message = element.text.strip()
+            keys = ID_PATTERN.findall(message)
+            for key in keys:
+                results[key.lower()] = Result(STATUSES["ERRORS"], message)
+            if not keys:
+                response['unmatched_count'] += 1
+                if len(response['unmatched_errors']) < MAX_UNMATCHED_SHOWN:
+                    response['unmatched_errors'].append(message)
+
+        # Read, let go of it
+        if parents:
+            parents[-1][0].remove(element)
+
+
+def _record_result(element):
+    errors = [
+        error.text.strip()
+        for error in element.iter()
+        if local_name(error.tag).upper() == "LINEERROR" and error.text and error.text.strip()
+    ]
+    if errors:
+        return Result(STATUSES["ERRORS"], "; ".join(errors))
+    for child in element:
+        tag = local_name(child.tag).upper()
+        if tag in STATUSES and cint(child.text):
+            return Result(STATUSES[tag], "")
+    return Result(EXCEPTION, "")
+
+
+def _record_name(element):
+    # Masters are named by their NAME, vouchers by the ERPNext name in their REFERENCE
+    return element.get("NAME") or child_text(element, "REFERENCE") or child_text(element, "NAME")
@@ -0,0 +1,174 @@
+from collections import namedtuple
+
+import frappe
+from frappe.utils import escape_html
+
+from tallyerp9_import.csv_reader import read_csv_chunks, read_template_chunks
+from tallyerp9_import.db_source import DBSource
+from tallyerp9_import.profiling import stage
+from tallyerp9_import.utils import attached_file_path
+
+# A kind of master vouchers refer to by name: the field its names are in, and the
+# "Select Type" whose CSV exports it along with the column they are in there and
+# whether that CSV is an ERPNext data import template
+Master = namedtuple("Master", ["doctype", "field", "select_type", "column", "template"])
+
+MASTERS = {
+    'Account': Master("Account", "account_name", "Chart of Accounts", "Account Name", False),
+    'Customer': Master("Customer", "customer_name", "Customer", "customer_name", True),
+    'Supplier': Master("Supplier", "supplier_name", "Supplier", "supplier_name", True),
+    'Item': Master("Item", "item_name", "Item Master", "item_name", True),
+}
+
+# Any ledger: Tally keeps accounts and parties alike as ledgers
+LEDGER = 'Ledger'
+LEDGER_MASTERS = ('Account', 'Customer', 'Supplier')
+
+# The names a voucher converter puts in the XML, by the kind of master they have to be:
+# where to read just them from the database, and their CSV column
+References = namedtuple("References", ["source", "columns"])
+
+VOUCHER_REFERENCES = {
+    'Sales Order': References(
+        DBSource(
+            "Sales Order",
+            fields=["customer_name"],
+            child_table="items",
+            child_fields=["item_name"],
+            date_field="transaction_date",
+        ),
+        {'customer_name': 'Customer', 'item_name': 'Item'},
+    ),
+    'Purchase Order': References(
+        DBSource(
+            "Purchase Order",
+            fields=["supplier_name"],
+            child_table="items",
+            child_fields=["item_name"],
+            date_field="transaction_date",
+        ),
+        {'supplier_name': 'Supplier', 'item_name': 'Item'},
+    ),
+    'Journal Entry': References(
+        DBSource("Journal Entry", fields=[], child_table="accounts", child_fields=["party"], date_field="posting_date"),
+        {'party': LEDGER},
+    ),
+    'Payment Entry': References(
+        DBSource("Payment Entry", fields=["party_name"], date_field="posting_date"),
+        {'party_name': LEDGER},
+    ),
+}
+
+# Dangling names of each kind spelt out in an error, the rest are counted
+MAX_NAMES_SHOWN = 20
+
+
+class ReferenceIndex:
+    """The names of the masters vouchers can refer to, built once to check any number
+    of references against in constant time each.
+
+        index = ReferenceIndex.build(filters, {'Item Master': "/private/files/items.csv"})
+        dangling = index.dangling('Sales Order', filters=filters)
+
+    Names are compared as Tally compares them, with surrounding whitespace ignored.
+    """
+
+    def __init__(self, names):
+        # Set of names by kind of master
+        self.names = {kind: set(names.get(kind, ())) for kind in MASTERS}
+        self.names[LEDGER] = set().union(*(self.names[kind] for kind in LEDGER_MASTERS))
+
+    @classmethod
+    @stage("index")
+    def build(cls, filters=None, csv_files=None):
+        """Index the masters from the CSVs of ``csv_files`` that are being exported along,
+        by "Select Type" option, and the rest from the database. Accounts are those of
+        the ``company`` in ``filters``, if there is one."""
+        filters = frappe.parse_json(filters or {})
+        csv_files = frappe.parse_json(csv_files or {})
+        names = {}
+        for kind, master in MASTERS.items():
+            if csv_files.get(master.select_type):
+                csv_path = attached_file_path(csv_files[master.select_type])
+                names[kind] = _column_values(csv_path, master.column, master.template)
+            else:
+                names[kind] = _master_names(master, filters)
+        return cls(names)
+
+    @stage("validate")
+    def dangling(self, voucher_type, filters=None, csv_file=None):
+        """The names the ``voucher_type`` vouchers of ``csv_file``, or of the database
+        records matching ``filters``, refer to but no master has: {kind: {name: rows}}.
+        Only the referring columns are read."""
+        references = VOUCHER_REFERENCES[voucher_type]
+        if filters is not None:
+            # Only looking, the conversion that follows moves the watermark of a delta export
+            chunks = references.source.read_chunks(filters, move_watermark=False)
+        else:
+            chunks = _read_columns(attached_file_path(csv_file), references.columns)
+
+        dangling = {}
+        for df in chunks:
+            for column, kind in references.columns.items():
+                if column not in df.columns:
+                    continue
+                known = self.names[kind]
+                for name in df[column].dropna().str.strip():
+                    if name and name not in known:
+                        missing = dangling.setdefault(kind, {})
+                        missing[name] = missing.get(name, 0) + 1
+        return dangling
+
+
+@frappe.whitelist()
+def check_references(select_type, csv_file=None, filters=None):
+    """Every name the vouchers of a conversion refer to that isn't a ledger or stock item,
+    as {kind: {name: rows}}; empty if they all are or ``select_type`` converts masters.
+
+    Run before converting, it names all the dangling references at once instead of
+    Tally failing on them one import at a time.
+    """
+    if select_type not in VOUCHER_REFERENCES:
+        return {}
+    return ReferenceIndex.build(filters).dangling(select_type, filters=filters, csv_file=csv_file)
+
+
+def throw_dangling(dangling):
+    """Throw listing the dangling references of each voucher type in ``dangling``, if any."""
+    lines = []
+    for voucher_type, kinds in dangling.items():
+        for kind, names in kinds.items():
+            shown = sorted(names)[:MAX_NAMES_SHOWN]
+            more = len(names) - len(shown)
+            lines.append(
+                f"{voucher_type}, {kind}: "
+                + ", ".join(frappe.bold(escape_html(name)) for name in shown)
+                + (f" and {more} more" if more else "")
+            )
+    if lines:
+        frappe.throw(
+            "Vouchers refer to names that are not in the masters Tally has:<br>" + "<br>".join(lines),
+            title="Unknown References",
+        )
+
+
+def _master_names(master, filters):
+    meta_filters = {}
+    if filters.get('company') and frappe.get_meta(master.doctype).has_field('company'):
+        meta_filters['company'] = filters['company']
+    return {name.strip() for name in frappe.get_all(master.doctype, filters=meta_filters, pluck=master.field) if name}
+
+
+def _column_values(path, column, template=True):
+    values = set()
+    for df in _read_columns(path, [column], template):
+        if column in df.columns:
+            values.update(df[column].dropna().str.strip())
+    values.discard("")
+    return values
+
+
+def _read_columns(path, columns, template=True):
+    read = read_template_chunks if template else read_csv_chunks
+    # Column names can come padded with spaces
+    return read(path, strip_columns=True, usecols=lambda name: name.strip() in columns)
@@ -0,0 +1,160 @@
+import gzip
+import xml.etree.ElementTree as ET
+import zipfile
+from functools import partial
+
+import frappe
+import requests
+from frappe.utils import cint
+from requests.adapters import HTTPAdapter
+
+from tallyerp9_import.batches import parse_batching
+
+# Where the URL of Tally's HTTP server is saved
+SETTINGS = "Tally ERP9 Import Settings"
+
+# Where Tally ERP9 listens when its HTTP server is enabled under F12 > Advanced Configuration
+DEFAULT_URL = "http://localhost:9000"
+
+# Requests sent to Tally before the oldest one has to be answered; Tally imports one
+# request at a time, a couple more keep it busy while the next is on the wire
+MAX_IN_FLIGHT = 2
+
+# Seconds to wait for Tally to connect and to answer a request, importing a large one takes a while
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 15 * 60
+
+# Records per request when a push comes without batching of its own
+PUSH_BATCH_MESSAGES = 1000
+
+# The counters Tally answers an import with
+COUNTERS = ("CREATED", "ALTERED", "DELETED", "COMBINED", "IGNORED", "ERRORS", "CANCELLED", "EXCEPTIONS")
+
+
+def parse_push(push=None):
+    """Where to push a conversion's XML to, from the ``push`` sent by Tally ERP9 Import
+    Settings: the ``url`` of Tally's HTTP server and the requests ``in_flight`` at
+    once. None when the XML isn't pushed.
+
+    The URL is always the one saved in the settings, never one sent along: the server
+    would post to wherever a request told it to.
+    """
+    push = frappe.parse_json(push or {})
+    if not cint(push.get('enabled')):
+        return None
+    return {
+        'url': (frappe.db.get_single_value(SETTINGS, 'tally_url') or DEFAULT_URL).strip(),
+        'in_flight': cint(push.get('in_flight')) or MAX_IN_FLIGHT,
+    }
+
+
+def push_batching(batching):
+    """The ``batching`` of a conversion that is pushed: cut into requests of
+    ``PUSH_BATCH_MESSAGES`` records unless it is cut into batches already."""
+    batching = parse_batching(batching)
+    if not (batching['max_messages'] or batching['max_size_mb']):
+        batching['max_messages'] = PUSH_BATCH_MESSAGES
+    # Batches are sent while the rest is written, zipping them afterwards would take them from under the senders
+    batching['zip'] = False
+    return batching
+
+
+class TallyClient:
+    """Posts Tally XML requests to a Tally HTTP server over a pool of keep-alive connections.
+
+    ``post`` sends one request and is safe to call from several threads at once, up to
+    ``max_in_flight`` of them with a connection each. ``push_pipeline.convert_and_push``
+    posts every batch of a conversion this way, as ``request_bodies`` reads them:
+
+        with TallyClient("http://tally-pc:9000", max_in_flight=2) as client:
+            for read in request_bodies(file_paths):
+                add_response(totals, client.post(read()))
+    """
+
+    def __init__(self, url=DEFAULT_URL, max_in_flight=MAX_IN_FLIGHT, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)):
+        self.url = url
+        self.max_in_flight = max(cint(max_in_flight), 1)
+        self.timeout = timeout
+        self.session = requests.Session()
+        # A connection per request in flight, kept open from one request to the next
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_in_flight)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Content-Type"] = "text/xml; charset=utf-8"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    def post(self, body):
+        """Send one XML request and return Tally's answer to it, see ``parse_response``."""
+        response = self.session.post(self.url, data=body, timeout=self.timeout)
+        response.raise_for_status()
+        return parse_response(response.content)
+
+
+def parse_response(content):
+    """The counters of Tally's answer to an import, ``CREATED``, ``ALTERED``, ``ERRORS``
+    and the rest as lowercase keys, with its ``LINEERROR`` messages in ``line_errors``.
+
+    Tally ERP9 answers with a bare ``RESPONSE``, TallyPrime wraps the counters in an
+    ``ENVELOPE``; both are read the same.
+    """
+    root = ET.fromstring(content)
+    response = empty_response()
+    for element in root.iter():
+        tag = element.tag.upper()
+        if tag in COUNTERS:
+            response[tag.lower()] += cint(element.text)
+        elif tag == "LINEERROR" and element.text:
+            response['line_errors'].append(element.text.strip())
+    return response
+
+
+def empty_response():
+    return {**{counter.lower(): 0 for counter in COUNTERS}, 'line_errors': []}
+
+
+def add_response(totals, response):
+    """Add Tally's ``response`` to one request to the ``totals`` of a push."""
+    for counter in COUNTERS:
+        totals[counter.lower()] += response[counter.lower()]
+    totals['line_errors'].extend(response['line_errors'])
+    totals['requests'] += 1
+
+
+def request_bodies(file_paths):
+    """A function reading the body of each request in ``file_paths``: an XML, a gzipped
+    XML or every XML in a zip."""
+    for file_path in file_paths:
+        if file_path.endswith(".zip"):
+            with zipfile.ZipFile(file_path) as archive:
+                members = sorted(archive.namelist())
+            for member in members:
+                yield partial(_read_member, file_path, member)
+        elif file_path.endswith(".gz"):
+            yield partial(_read_gzip, file_path)
+        else:
+            yield partial(_read_file, file_path)
+
+
+def _read_member(file_path, member):
+    with zipfile.ZipFile(file_path) as archive:
+        body = archive.read(member)
+    # A zip of gzipped batches
+    return gzip.decompress(body) if member.endswith(".gz") else body
+
+
+def _read_gzip(file_path):
+    with gzip.open(file_path, "rb") as f:
+        return f.read()
+
+
+def _read_file(file_path):
+    with open(file_path, "rb") as f:
+        return f.read()
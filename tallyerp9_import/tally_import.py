@@ -0,0 +1,680 @@
+import re
+import threading
+from collections import Counter, namedtuple
+from datetime import datetime
+from queue import Full, Queue
+from xml.sax.saxutils import unescape
+
+import frappe
+from frappe.model import child_table_fields, default_fields
+from frappe.utils import flt, now
+from frappe.utils.nestedset import rebuild_tree
+
+from tallyerp9_import.jobs import DONE_EVENT, JOB_TIMEOUT, PROGRESS_EVENT
+from tallyerp9_import.profiling import stage
+from tallyerp9_import.utils import attached_file_path
+from tallyerp9_import.xml_reader import child_text, file_urls, local_name, tally_objects, xml_sources
+
+# Tally objects read and inserted at a time, each batch in a transaction of its own
+IMPORT_BATCH_SIZE = 1000
+
+# Batches read ahead of the database while it inserts the last one
+READ_AHEAD = 4
+
+# Doctypes in the order a batch is inserted, masters before the records referring to them
+DOCTYPES = [
+    "UOM", "Item Group", "Item", "Account", "Customer", "Supplier", "Sales Order", "Purchase Order", "Journal Entry",
+    "Payment Entry",
+]
+
+# Trees inserted without their lft and rgt, worked out once everything is in
+TREE_DOCTYPES = ["Item Group", "Account"]
+
+# Ledgers under these groups are parties, the rest accounts
+PARTY_GROUPS = {"Sundry Debtors": "Customer", "Sundry Creditors": "Supplier"}
+
+# The group Tally puts its top groups and stock groups under, and the item group ERPNext does
+PRIMARY_GROUP = "Primary"
+ROOT_ITEM_GROUP = "All Item Groups"
+
+# Root type of ERPNext's root accounts, as the chart of accounts converter writes them, and
+# of Tally's own primary groups; other groups take their parent's
+ROOT_TYPES = {
+    "Application of Funds (Assets)": "Asset",
+    "Source of Funds (Liabilities)": "Liability",
+    "Equity": "Equity",
+    "Income": "Income",
+    "Expenses": "Expense",
+    "Bank Accounts": "Asset",
+    "Cash-in-Hand": "Asset",
+    "Current Assets": "Asset",
+    "Deposits (Asset)": "Asset",
+    "Fixed Assets": "Asset",
+    "Investments": "Asset",
+    "Loans & Advances (Asset)": "Asset",
+    "Misc. Expenses (ASSET)": "Asset",
+    "Stock-in-Hand": "Asset",
+    "Sundry Debtors": "Asset",
+    "Capital Account": "Equity",
+    "Reserves & Surplus": "Equity",
+    "Bank OD A/c": "Liability",
+    "Branch / Divisions": "Liability",
+    "Current Liabilities": "Liability",
+    "Duties & Taxes": "Liability",
+    "Loans (Liability)": "Liability",
+    "Provisions": "Liability",
+    "Secured Loans": "Liability",
+    "Sundry Creditors": "Liability",
+    "Suspense A/c": "Liability",
+    "Unsecured Loans": "Liability",
+    "Direct Incomes": "Income",
+    "Indirect Incomes": "Income",
+    "Sales Accounts": "Income",
+    "Direct Expenses": "Expense",
+    "Indirect Expenses": "Expense",
+    "Purchase Accounts": "Expense",
+}
+
+REPORT_TYPES = {
+    "Asset": "Balance Sheet",
+    "Liability": "Balance Sheet",
+    "Equity": "Balance Sheet",
+    "Income": "Profit and Loss",
+    "Expense": "Profit and Loss",
+}
+
+# Account type of a ledger by the Tally group it is under
+ACCOUNT_TYPES = {"Bank Accounts": "Bank", "Cash-in-Hand": "Cash", "Duties & Taxes": "Tax", "Stock-in-Hand": "Stock"}
+
+# What is read of each Tally object, in the reading thread, before the database is asked anything
+Unit = namedtuple("Unit", ["name"])
+StockGroup = namedtuple("StockGroup", ["name", "parent"])
+StockItem = namedtuple("StockItem", ["name", "parent", "base_units", "hsn_code"])
+Group = namedtuple("Group", ["name", "parent"])
+Ledger = namedtuple("Ledger", ["name", "parent", "email", "website", "pan", "country", "mobile"])
+Voucher = namedtuple(
+    "Voucher", ["voucher_type", "name", "date", "party", "party_ledger", "voucher_number", "items", "entries"]
+)
+InventoryEntry = namedtuple("InventoryEntry", ["item", "qty", "rate", "amount", "due_date"])
+LedgerEntry = namedtuple("LedgerEntry", ["ledger", "amount"])
+
+# Leading number of a Tally quantity or rate, "51 Nos" or "1245.00/Nos"
+NUMBER_PATTERN = re.compile(r"-?\d*\.?\d+")
+
+
+@frappe.whitelist()
+def enqueue_tally_import(xml_files, company=None):
+    """Import the masters and vouchers of Tally XML into ERPNext as a background job and
+    return its job id straight away.
+
+    ``xml_files`` are the file URLs of Tally exports, plain, gzipped or zipped, a single
+    URL or a list of them. Progress and the records imported are sent to the current
+    user as realtime events carrying the job id, as conversions do.
+    """
+    # The job bulk inserts past permissions, only someone who could create every doctype starts it
+    for doctype in DOCTYPES:
+        frappe.has_permission(doctype, "create", throw=True)
+
+    paths = [attached_file_path(file_url) for file_url in file_urls(xml_files)]
+    if not paths:
+        frappe.throw("Please upload a Tally XML file first.")
+
+    job_id = frappe.generate_hash(length=12)
+    frappe.enqueue(
+        "tallyerp9_import.tally_import.run_tally_import",
+        queue="long",
+        timeout=JOB_TIMEOUT,
+        paths=paths,
+        company=company,
+        import_id=job_id,
+        user=frappe.session.user,
+    )
+    return {'job_id': job_id}
+
+
+def run_tally_import(paths, company, import_id, user):
+    try:
+        result = import_tally_xml(paths, company, job_id=import_id)
+    except Exception as e:
+        frappe.db.rollback()
+        frappe.publish_realtime(DONE_EVENT, {'job_id': import_id, 'error': str(e)}, user=user)
+        raise
+
+    frappe.publish_realtime(DONE_EVENT, {'job_id': import_id, **result}, user=user, after_commit=True)
+    return result
+
+
+def import_tally_xml(paths, company=None, job_id=None):
+    """Insert the masters and vouchers of the Tally XML files ``paths`` into ``company``.
+
+    Units, stock groups and items, groups and ledgers, and Sales Order, Purchase Order,
+    Journal and Payment vouchers are read in the shapes the converters write them.
+    A thread reads the XML with an iterative parser, every object let go of once read,
+    while the database inserts what was read before it, ``IMPORT_BATCH_SIZE`` objects
+    at a time with a bulk insert per doctype and a commit. Vouchers come in as drafts.
+    Records whose name is already taken are skipped: importing the same XML again adds
+    nothing, and after a failure picks up past the batches committed. Returns the
+    records ``imported`` and ``skipped`` by doctype, and the Tally objects ``ignored``
+    as nothing to import into.
+    """
+    importer = TallyImporter(company)
+    for batch in read_ahead(paths):
+        for tag, tally_object in batch:
+            importer.add(tag, tally_object)
+        with stage("insert"):
+            importer.flush()
+        if job_id:
+            done = sum(importer.imported.values())
+            frappe.publish_realtime(
+                PROGRESS_EVENT,
+                {'job_id': job_id, 'done': done, 'total': done, 'label': f"{done} records imported"},
+                user=frappe.session.user,
+            )
+
+    with stage("rebuild"):
+        for doctype in TREE_DOCTYPES:
+            if importer.imported[doctype]:
+                rebuild_tree(doctype)
+        frappe.db.commit()
+
+    return {
+        'company': importer.company,
+        'imported': dict(+importer.imported),
+        'skipped': dict(+importer.skipped),
+        'ignored': dict(+importer.ignored),
+    }
+
+
+def read_ahead(paths):
+    """The Tally objects of the XML files ``paths`` as ``(tag, object)`` pairs, in batches
+    of ``IMPORT_BATCH_SIZE``, read in a thread of its own up to ``READ_AHEAD`` batches
+    ahead. An object with nothing to import into comes as ``None``."""
+    batches = Queue(READ_AHEAD)
+    stopped = threading.Event()
+
+    def put(item):
+        # Blocks while the queue is full, gives up once the importer has stopped
+        while not stopped.is_set():
+            try:
+                batches.put(item, timeout=1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def read():
+        try:
+            batch = []
+            for path in paths:
+                for source in xml_sources(path):
+                    for element in tally_objects(source):
+                        tag = local_name(element.tag)
+                        reader = READERS.get(tag)
+                        batch.append((tag, reader(element) if reader else None))
+                        if len(batch) == IMPORT_BATCH_SIZE:
+                            if not put(batch):
+                                return
+                            batch = []
+            if put(batch):
+                put(None)
+        except Exception as e:
+            put(e)
+
+    thread = threading.Thread(target=read, daemon=True)
+    thread.start()
+    try:
+        while (batch := batches.get()) is not None:
+            if isinstance(batch, Exception):
+                raise batch
+            yield batch
+    finally:
+        stopped.set()
+        thread.join()
+
+
+class TallyImporter:
+    """Turns Tally objects into ERPNext records of ``company`` and bulk inserts them.
+
+    Records are held by doctype and name until ``flush``, with their child rows. The
+    default company is used without ``company``.
+    """
+
+    def __init__(self, company=None):
+        self.company = (
+            company
+            or frappe.defaults.get_user_default("Company")
+            or frappe.db.get_single_value("Global Defaults", "default_company")
+        )
+        if not self.company:
+            frappe.throw("Please set a default Company to import the Tally XML into.")
+        self.defaults = frappe.get_cached_value(
+            "Company",
+            self.company,
+            ["abbr", "default_currency", "default_receivable_account", "default_payable_account"],
+            as_dict=True,
+        )
+        self.customer_group = frappe.db.get_single_value("Selling Settings", "customer_group") or "All Customer Groups"
+        self.territory = frappe.db.get_single_value("Selling Settings", "territory") or "All Territories"
+        self.supplier_group = frappe.db.get_single_value("Buying Settings", "supplier_group") or "All Supplier Groups"
+
+        self.pending = {doctype: {} for doctype in DOCTYPES}
+        self.imported = Counter()
+        self.skipped = Counter()
+        self.ignored = Counter()
+        # What later objects look up of earlier ones, from the XML or else the database
+        self.root_types = {}
+        self.party_types = {}
+        self.stock_uoms = {}
+        self.columns = {}
+        # The record each object read becomes, if any
+        self.records = {
+            Unit: self._unit,
+            StockGroup: self._stock_group,
+            StockItem: self._stock_item,
+            Group: self._group,
+            Ledger: self._ledger,
+            Voucher: self._voucher,
+        }
+
+    def add(self, tag, tally_object):
+        """Hold the record ``tally_object``, read from a ``tag`` element, becomes."""
+        record = self.records[type(tally_object)](tally_object) if tally_object is not None else None
+        if record is None:
+            self.ignored[getattr(tally_object, "voucher_type", None) or tag] += 1
+            return
+        doctype, values, children = record
+        self.pending[doctype][values["name"]] = (values, children)
+
+    def flush(self):
+        """Insert the records held, doctype by doctype, and commit them."""
+        timestamp = now()
+        for doctype in DOCTYPES:
+            records = self.pending[doctype]
+            if not records:
+                continue
+            existing = set(frappe.get_all(doctype, filters={'name': ("in", list(records))}, pluck="name"))
+            rows = []
+            child_rows = {}
+            for name, (values, children) in records.items():
+                if name in existing:
+                    continue
+                rows.append(_with_standard_fields(values, timestamp))
+                for child_doctype, parentfield, entries in children:
+                    child_rows.setdefault(child_doctype, []).extend(
+                        _with_standard_fields(entry, timestamp, doctype, name, parentfield, idx)
+                        for idx, entry in enumerate(entries, start=1)
+                    )
+            self._insert(doctype, rows)
+            for child_doctype, entries in child_rows.items():
+                self._insert(child_doctype, entries)
+            self.imported[doctype] += len(rows)
+            self.skipped[doctype] += len(existing)
+            records.clear()
+        frappe.db.commit()
+
+    def _insert(self, doctype, rows):
+        if not rows:
+            return
+        fields = [field for field in rows[0] if self._has_column(doctype, field)]
+        frappe.db.bulk_insert(doctype, fields, [[row[field] for field in fields] for row in rows], ignore_duplicates=True)
+
+    def _has_column(self, doctype, field):
+        # Fields of other versions and apps, like the HSN code of India Compliance, are left out
+        key = (doctype, field)
+        if key not in self.columns:
+            self.columns[key] = (
+                field in default_fields or field in child_table_fields or frappe.get_meta(doctype).has_field(field)
+            )
+        return self.columns[key]
+
+    def _unit(self, unit):
+        return "UOM", {'name': unit.name, 'uom_name': unit.name, 'enabled': 1}, []
+
+    def _stock_group(self, group):
+        return "Item Group", {
+            'name': group.name,
+            'item_group_name': group.name,
+            'parent_item_group': _item_group(group.parent),
+            'is_group': 1,
+            'lft': 0,
+            'rgt': 0,
+        }, []
+
+    def _stock_item(self, item):
+        stock_uom = item.base_units or "Nos"
+        self.stock_uoms[item.name] = stock_uom
+        return "Item", {
+            'name': item.name,
+            'item_code': item.name,
+            'item_name': item.name,
+            'description': item.name,
+            'item_group': _item_group(item.parent),
+            'stock_uom': stock_uom,
+            'is_stock_item': 1,
+            'gst_hsn_code': item.hsn_code,
+        }, [("UOM Conversion Detail", "uoms", [{'uom': stock_uom, 'conversion_factor': 1}])]
+
+    def _group(self, group):
+        root_type = ROOT_TYPES.get(group.name) or self._root_type(group.parent)
+        self.root_types[group.name] = root_type
+        return "Account", self._account(group.name, group.parent, root_type, is_group=1), []
+
+    def _ledger(self, ledger):
+        party_type = PARTY_GROUPS.get(ledger.parent)
+        if not party_type:
+            account = self._account(ledger.name, ledger.parent, self._root_type(ledger.parent), is_group=0)
+            account['account_type'] = ACCOUNT_TYPES.get(ledger.parent, "")
+            return "Account", account, []
+
+        self.party_types[ledger.name] = party_type
+        party = {
+            'name': ledger.name,
+            'email_id': ledger.email,
+            'website': ledger.website,
+            'pan': ledger.pan,
+            'country': ledger.country,
+            'mobile_no': ledger.mobile,
+        }
+        if party_type == "Customer":
+            party.update(
+                customer_name=ledger.name,
+                customer_type="Company",
+                customer_group=self.customer_group,
+                territory=self.territory,
+            )
+        else:
+            party.update(supplier_name=ledger.name, supplier_type="Company", supplier_group=self.supplier_group)
+        return party_type, party, []
+
+    def _voucher(self, voucher):
+        if not voucher.name or not voucher.date:
+            return None
+        if voucher.voucher_type in ("Sales Order", "Purchase Order"):
+            return self._order(voucher)
+        if voucher.voucher_type == "Journal":
+            return self._journal_entry(voucher)
+        if voucher.voucher_type == "Payment":
+            return self._payment_entry(voucher)
+        return None
+
+    def _order(self, voucher):
+        sales = voucher.voucher_type == "Sales Order"
+        due_date_field = "delivery_date" if sales else "schedule_date"
+        due_date = min((item.due_date for item in voucher.items if item.due_date), default=voucher.date)
+        total = sum(item.amount for item in voucher.items)
+        items = []
+        for item in voucher.items:
+            uom = self._stock_uom(item.item)
+            items.append({
+                'item_code': item.item,
+                'item_name': item.item,
+                'qty': item.qty,
+                'stock_qty': item.qty,
+                'uom': uom,
+                'stock_uom': uom,
+                'conversion_factor': 1,
+                'rate': item.rate,
+                'base_rate': item.rate,
+                'net_rate': item.rate,
+                'amount': item.amount,
+                'base_amount': item.amount,
+                'net_amount': item.amount,
+                due_date_field: item.due_date or due_date,
+            })
+        order = {
+            'name': voucher.name,
+            'company': self.company,
+            'transaction_date': voucher.date,
+            due_date_field: due_date,
+            'currency': self.defaults.default_currency,
+            'conversion_rate': 1,
+            'plc_conversion_rate': 1,
+            'total_qty': sum(item.qty for item in voucher.items),
+            'total': total,
+            'base_total': total,
+            'net_total': total,
+            'base_net_total': total,
+            'grand_total': total,
+            'base_grand_total': total,
+            'status': "Draft",
+        }
+        if sales:
+            order.update(customer=voucher.party, customer_name=voucher.party_ledger or voucher.party, order_type="Sales")
+            return "Sales Order", order, [("Sales Order Item", "items", items)]
+        # The supplier's id, its name is the party ledger
+        order.update(supplier=voucher.party, supplier_name=voucher.party_ledger or voucher.party)
+        return "Purchase Order", order, [("Purchase Order Item", "items", items)]
+
+    def _journal_entry(self, voucher):
+        accounts = []
+        for entry in voucher.entries:
+            account, party_type, party = self._ledger_account(entry.ledger)
+            # Tally's debits are negative
+            debit, credit = max(0, -entry.amount), max(0, entry.amount)
+            accounts.append({
+                'account': account,
+                'party_type': party_type,
+                'party': party,
+                'debit_in_account_currency': debit,
+                'credit_in_account_currency': credit,
+                'debit': debit,
+                'credit': credit,
+            })
+        return "Journal Entry", {
+            'name': voucher.name,
+            'company': self.company,
+            'voucher_type': "Journal Entry",
+            'posting_date': voucher.date,
+            'total_debit': sum(row['debit'] for row in accounts),
+            'total_credit': sum(row['credit'] for row in accounts),
+        }, [("Journal Entry Account", "accounts", accounts)]
+
+    def _payment_entry(self, voucher):
+        entries = [(entry, *self._ledger_account(entry.ledger)) for entry in voucher.entries]
+        party_entry = next((entry for entry in entries if entry[2]), None)
+        if party_entry:
+            entry, party_account, party_type, party = party_entry
+            other = next((other for other in entries if other is not party_entry), None)
+            if not other:
+                return None
+            # The party debited is paid, credited it is receiving
+            payment_type = "Pay" if entry.amount < 0 else "Receive"
+            paid_from, paid_to = (other[1], party_account) if payment_type == "Pay" else (party_account, other[1])
+        else:
+            debited = [entry for entry in entries if entry[0].amount < 0]
+            credited = [entry for entry in entries if entry[0].amount > 0]
+            if not debited or not credited:
+                return None
+            entry, payment_type, party_type, party = debited[0][0], "Internal Transfer", "", ""
+            paid_from, paid_to = credited[0][1], debited[0][1]
+
+        amount = abs(entry.amount)
+        return "Payment Entry", {
+            'name': voucher.name,
+            'company': self.company,
+            'payment_type': payment_type,
+            'posting_date': voucher.date,
+            'party_type': party_type,
+            'party': party,
+            'party_name': party,
+            'paid_from': paid_from,
+            'paid_to': paid_to,
+            'paid_from_account_currency': self.defaults.default_currency,
+            'paid_to_account_currency': self.defaults.default_currency,
+            'paid_amount': amount,
+            'base_paid_amount': amount,
+            'received_amount': amount,
+            'base_received_amount': amount,
+            'source_exchange_rate': 1,
+            'target_exchange_rate': 1,
+            'reference_no': voucher.voucher_number,
+            'reference_date': voucher.date,
+        }, []
+
+    def _account(self, name, parent, root_type, is_group):
+        root = parent in ("", PRIMARY_GROUP)
+        return {
+            'name': self._account_name(name),
+            'account_name': name,
+            'parent_account': "" if root else self._account_name(parent),
+            'company': self.company,
+            'is_group': is_group,
+            'root_type': root_type,
+            'report_type': REPORT_TYPES.get(root_type, ""),
+            'account_currency': self.defaults.default_currency,
+            'lft': 0,
+            'rgt': 0,
+        }
+
+    def _account_name(self, name):
+        return f"{name} - {self.defaults.abbr}"
+
+    def _root_type(self, parent):
+        if parent not in self.root_types:
+            self.root_types[parent] = ROOT_TYPES.get(parent) or frappe.db.get_value(
+                "Account", self._account_name(parent), "root_type"
+            ) or ""
+        return self.root_types[parent]
+
+    def _ledger_account(self, ledger):
+        # The account of a ledger in an entry, a party's being the company's receivable or payable
+        party_type = self._party_type(ledger)
+        if party_type == "Customer":
+            return self.defaults.default_receivable_account, party_type, ledger
+        if party_type == "Supplier":
+            return self.defaults.default_payable_account, party_type, ledger
+        return self._account_name(ledger), "", ""
+
+    def _party_type(self, ledger):
+        if ledger not in self.party_types:
+            self.party_types[ledger] = next(
+                (party_type for party_type in PARTY_GROUPS.values() if frappe.db.exists(party_type, ledger)), None
+            )
+        return self.party_types[ledger]
+
+    def _stock_uom(self, item):
+        if item not in self.stock_uoms:
+            self.stock_uoms[item] = frappe.db.get_value("Item", item, "stock_uom") or "Nos"
+        return self.stock_uoms[item]
+
+
+def _with_standard_fields(values, timestamp, parenttype=None, parent=None, parentfield=None, idx=0):
+    row = {
+        'name': values.get('name') or frappe.generate_hash(length=10),
+        'owner': frappe.session.user,
+        'creation': timestamp,
+        'modified': timestamp,
+        'modified_by': frappe.session.user,
+        'docstatus': 0,
+        'idx': idx,
+        **values,
+    }
+    if parenttype:
+        row.update(parent=parent, parenttype=parenttype, parentfield=parentfield)
+    return row
+
+
+def _item_group(parent):
+    return ROOT_ITEM_GROUP if parent in ("", PRIMARY_GROUP) else parent
+
+
+def _read_unit(element):
+    return Unit(_unescape(element.get("NAME") or child_text(element, "NAME")))
+
+
+def _read_stock_group(element):
+    return StockGroup(_unescape(element.get("NAME", "")), _name(element, "PARENT"))
+
+
+def _read_stock_item(element):
+    hsn_code = _blank(next((_text(child) for child in element.iter() if local_name(child.tag) == "HSNCODE"), ""))
+    return StockItem(
+        _unescape(element.get("NAME", "")), _name(element, "PARENT"), _name(element, "BASEUNITS"), hsn_code
+    )
+
+
+def _read_group(element):
+    return Group(_unescape(element.get("NAME", "")), _name(element, "PARENT"))
+
+
+def _read_ledger(element):
+    return Ledger(
+        _unescape(element.get("NAME", "")),
+        _name(element, "PARENT"),
+        _blank(child_text(element, "EMAIL")),
+        _blank(child_text(element, "WEBSITE")),
+        _blank(child_text(element, "INCOMETAXNUMBER")),
+        _blank(child_text(element, "COUNTRYOFRESIDENCE")),
+        _blank(child_text(element, "LEDGERMOBILE")),
+    )
+
+
+def _read_voucher(element):
+    items = []
+    entries = []
+    for child in element.iter():
+        tag = local_name(child.tag)
+        if tag in ("INVENTORYENTRIES.LIST", "ALLINVENTORYENTRIES.LIST") and child_text(child, "STOCKITEMNAME"):
+            due_date = next((_text(date) for date in child.iter() if local_name(date.tag) == "ORDERDUEDATE"), "")
+            items.append(InventoryEntry(
+                _name(child, "STOCKITEMNAME"),
+                _number(child_text(child, "BILLEDQTY") or child_text(child, "ACTUALQTY")),
+                _number(child_text(child, "RATE")),
+                abs(_number(child_text(child, "AMOUNT"))),
+                _date(due_date, "%d-%b-%Y"),
+            ))
+        elif tag in ("ALLLEDGERENTRIES.LIST", "LEDGERENTRIES.LIST") and child_text(child, "LEDGERNAME"):
+            entries.append(LedgerEntry(_name(child, "LEDGERNAME"), _number(child_text(child, "AMOUNT"))))
+    return Voucher(
+        element.get("VCHTYPE") or child_text(element, "VOUCHERTYPENAME"),
+        # Orders by their ERPNext name, the rest by the ID the converter gave them
+        _name(element, "REFERENCE") or child_text(element, "GUID") or element.get("REMOTEID"),
+        _date(child_text(element, "DATE"), "%Y%m%d"),
+        _name(element, "PARTYNAME") or _name(element, "PARTYLEDGERNAME"),
+        _name(element, "PARTYLEDGERNAME"),
+        _blank(child_text(element, "VOUCHERNUMBER")),
+        items,
+        entries,
+    )
+
+
+# How each Tally object is read, objects without one have nothing to import into
+READERS = {
+    "UNIT": _read_unit,
+    "STOCKGROUP": _read_stock_group,
+    "STOCKITEM": _read_stock_item,
+    "GROUP": _read_group,
+    "LEDGER": _read_ledger,
+    "VOUCHER": _read_voucher,
+}
+
+
+def _text(element):
+    return (element.text or "").strip()
+
+
+def _name(element, tag):
+    return _unescape(child_text(element, tag))
+
+
+def _unescape(value):
+    # Some converters escape names before the XML writer does, what Tally keeps of them
+    # is escaped once, as ERPNext's names are not
+    return unescape(value, {"&quot;": '"', "&apos;": "'"})
+
+
+def _blank(value):
+    # The converters write the "nan" of a missing pandas value as it is
+    return "" if value.lower() == "nan" else value
+
+
+def _number(value):
+    match = NUMBER_PATTERN.match(value.replace(",", "")) if value else None
+    return flt(match.group()) if match else 0
+
+
+def _date(value, date_format):
+    try:
+        return datetime.strptime(value, date_format).strftime("%Y-%m-%d")
+    except ValueError:
+        return None
@@ -0,0 +1,18 @@
+# Copyright (c) 2026, Satyam and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.query_builder import Interval
+from frappe.query_builder.functions import Now
+
+
+class TallyConversionLog(Document):
+	@staticmethod
+	def clear_old_logs(days=90):
+		"""Delete the logs older than ``days``, for Log Settings."""
+		log = frappe.qb.DocType("Tally Conversion Log")
+		stage = frappe.qb.DocType("Tally Conversion Stage")
+		old_logs = frappe.qb.from_(log).select(log.name).where(log.creation < (Now() - Interval(days=days)))
+		frappe.db.delete(stage, filters=(stage.parenttype == "Tally Conversion Log") & stage.parent.isin(old_logs))
+		frappe.db.delete(log, filters=log.creation < (Now() - Interval(days=days)))
@@ -1,8 +1,9 @@
 frappe.ui.form.on('Tally ERP9 Import Settings', {
     convert_and_download_xml: function(frm) {
         const csv_file = frm.doc.attach_csv;
+        const fromDatabase = frm.doc.source === 'ERPNext Database';
 
-        if (!csv_file) {
+        if (!fromDatabase && !csv_file) {
             frappe.msgprint({
                 title: __('Error'),
                 message: __('Please upload a CSV file first.'),
@@ -45,58 +46,251 @@ frappe.ui.form.on('Tally ERP9 Import Settings', {
             });
             return;
         }
-        frappe.call({
-            method: method,
-            args: {
-                doctype: frm.doctype,
-                docname: frm.doc.name,
-                csv_file: csv_file
+
+        const args = {
+            doctype: frm.doctype,
+            docname: frm.doc.name,
+            deterministic_ids: frm.doc.deterministic_ids,
+            workers: frm.doc.parallel_workers,
+            batching: {
+                max_messages: frm.doc.batch_max_messages,
+                max_size_mb: frm.doc.batch_max_size_mb,
+                zip: frm.doc.zip_batches
             },
-            callback: function(r) {
-                frappe.hide_progress();
-
-                if (r.message) {
-                    if (r.message.file_url) {
-                        // Construct full URL
-                        const full_url = window.location.origin + r.message.file_url;
-                        
-                        // Create a link to download the XML file
-                        const link = document.createElement('a');
-                        link.href = full_url;
-                        link.download = r.message.file_name || defaultFilename;
-                        document.body.appendChild(link);
-                        link.click();
-                        document.body.removeChild(link);
-
-                        frappe.msgprint({
-                            title: __('Success'),
-                            message: __(`XML file for ${selectedType} generated successfully`),
-                            indicator: 'green'
-                        });
-                    } else {
-                        frappe.msgprint({
-                            title: __('Error'),
-                            message: __('Invalid file response'),
-                            indicator: 'red'
-                        });
-                    }
-                } else {
+            compression: frm.doc.compression
+        };
+        if (frm.doc.push_to_tally) {
+            // The XML goes to the saved Tally URL, not to what the form has
+            if (frm.is_dirty()) {
+                frappe.msgprint({
+                    title: __('Error'),
+                    message: __('Please save the settings before pushing to Tally.'),
+                    indicator: 'red'
+                });
+                return;
+            }
+            args.push = {
+                enabled: 1,
+                in_flight: frm.doc.push_in_flight
+            };
+        }
+        if (fromDatabase) {
+            // Read the records straight from the database instead of the attachment
+            args.filters = {
+                from_date: frm.doc.from_date,
+                to_date: frm.doc.to_date,
+                company: frm.doc.company,
+                docstatus: frm.doc.document_status,
+                delta: frm.doc.delta_export
+            };
+        } else {
+            args.csv_file = csv_file;
+        }
+
+        // Pushing to Tally only happens in the background job
+        if (frm.doc.run_in_background || frm.doc.push_to_tally) {
+            // The job checks the references itself, before converting
+            args.validate_references = frm.doc.validate_references;
+            convert_in_background(selectedType, args, defaultFilename);
+            return;
+        }
+
+        const convert = function() {
+            frappe.call({
+                method: method,
+                args: args,
+                callback: function(r) {
+                    frappe.hide_progress();
+                    download_xml(r.message, selectedType, defaultFilename);
+                },
+                error: function(err) {
+                    frappe.hide_progress();
+                    console.error('XML Generation Error:', err);
                     frappe.msgprint({
                         title: __('Error'),
-                        message: __('Error in generating XML file'),
+                        message: __('An error occurred while generating the XML file. Please check the console for details.'),
                         indicator: 'red'
                     });
                 }
-            },
-            error: function(err) {
-                frappe.hide_progress();
-                console.error('XML Generation Error:', err);
-                frappe.msgprint({
-                    title: __('Error'),
-                    message: __('An error occurred while generating the XML file. Please check the console for details.'),
-                    indicator: 'red'
-                });
+            });
+        };
+        if (!frm.doc.validate_references) {
+            convert();
+            return;
+        }
+
+        frappe.call({
+            method: 'tallyerp9_import.reference_index.check_references',
+            args: {select_type: selectedType, csv_file: args.csv_file, filters: args.filters},
+            freeze: true,
+            freeze_message: __('Checking references...'),
+            callback: function(r) {
+                if (show_dangling(r.message)) return;
+                convert();
             }
         });
+    },
+
+    export_company: function(frm) {
+        if (frm.doc.source !== 'ERPNext Database') {
+            frappe.msgprint({
+                title: __('Error'),
+                message: __('Exporting a whole company reads it from the ERPNext Database source.'),
+                indicator: 'red'
+            });
+            return;
+        }
+
+        // Every converter in one job, bundled in the order Tally imports them
+        convert_in_background(__('Company'), {
+            deterministic_ids: frm.doc.deterministic_ids,
+            validate_references: frm.doc.validate_references,
+            filters: {
+                from_date: frm.doc.from_date,
+                to_date: frm.doc.to_date,
+                company: frm.doc.company,
+                docstatus: frm.doc.document_status,
+                delta: frm.doc.delta_export
+            }
+        }, 'Company_Output.zip', 'tallyerp9_import.company_export.enqueue_company_export');
+    }
+});
+
+function convert_in_background(selectedType, args, defaultFilename, method) {
+    const progressTitle = __('Converting {0}', [selectedType]);
+    let jobId = null;
+
+    // Events can arrive before the job id has come back, hold them until it has
+    const pending = [];
+
+    const onProgress = function(data) {
+        if (!jobId) {
+            pending.push(['progress', data]);
+            return;
+        }
+        if (data.job_id !== jobId) return;
+        frappe.show_progress(progressTitle, data.done, data.total, data.label || __('{0} of {1} rows', [data.done, data.total]));
+    };
+
+    const onDone = function(data) {
+        if (!jobId) {
+            pending.push(['done', data]);
+            return;
+        }
+        if (data.job_id !== jobId) return;
+        frappe.realtime.off('tally_conversion_progress', onProgress);
+        frappe.realtime.off('tally_conversion_done', onDone);
+        frappe.hide_progress();
+
+        if (data.error) {
+            frappe.msgprint({
+                title: __('Error'),
+                message: __('Error in generating XML file: {0}', [data.error]),
+                indicator: 'red'
+            });
+            return;
+        }
+        if (data.push) {
+            show_push_result(data.push, selectedType);
+            return;
+        }
+        download_xml(data, selectedType, defaultFilename);
+    };
+
+    frappe.realtime.on('tally_conversion_progress', onProgress);
+    frappe.realtime.on('tally_conversion_done', onDone);
+
+    frappe.call({
+        method: method || 'tallyerp9_import.jobs.enqueue_conversion',
+        args: Object.assign({select_type: selectedType}, args),
+        callback: function(r) {
+            jobId = r.message.job_id;
+            frappe.show_progress(progressTitle, 0, 1, __('Queued'));
+            pending.splice(0).forEach(([event, data]) => {
+                event === 'progress' ? onProgress(data) : onDone(data);
+            });
+        },
+        error: function(err) {
+            frappe.realtime.off('tally_conversion_progress', onProgress);
+            frappe.realtime.off('tally_conversion_done', onDone);
+            console.error('XML Generation Error:', err);
+            frappe.msgprint({
+                title: __('Error'),
+                message: __('Could not start the XML conversion. Please check the console for details.'),
+                indicator: 'red'
+            });
+        }
+    });
+}
+
+function show_dangling(dangling) {
+    // Every unknown name by kind of master, with the rows that name it
+    const kinds = Object.keys(dangling || {});
+    if (!kinds.length) return false;
+
+    const message = kinds.map(kind => {
+        const names = Object.keys(dangling[kind]).sort();
+        return `<b>${__(kind)}</b><br>` + names.map(name =>
+            __('{0} ({1} rows)', [frappe.utils.escape_html(name), dangling[kind][name]])
+        ).join('<br>');
+    }).join('<br><br>');
+    frappe.msgprint({
+        title: __('Unknown References'),
+        message: message,
+        indicator: 'red'
+    });
+    return true;
+}
+
+function show_push_result(push, selectedType) {
+    const errors = push.errors + push.exceptions;
+    let message = __('{0} pushed to Tally in {1} requests: {2} created, {3} altered, {4} errors', [
+        selectedType, push.requests, push.created, push.altered, errors
+    ]);
+    if (push.line_errors.length) {
+        message += '<br><br>' + push.line_errors.map(frappe.utils.escape_html).join('<br>');
+    }
+    frappe.msgprint({
+        title: errors ? __('Pushed with Errors') : __('Success'),
+        message: message,
+        indicator: errors ? 'orange' : 'green'
+    });
+}
+
+function download_xml(file, selectedType, defaultFilename) {
+    if (file) {
+        if (file.file_url) {
+            // Output cut into batches comes as several files, download every one
+            (file.files || [file]).forEach(function(batch) {
+                // Construct full URL
+                const full_url = window.location.origin + batch.file_url;
+
+                // Create a link to download the XML file
+                const link = document.createElement('a');
+                link.href = full_url;
+                link.download = batch.file_name || defaultFilename;
+                document.body.appendChild(link);
+                link.click();
+                document.body.removeChild(link);
+            });
+
+            frappe.msgprint({
+                title: __('Success'),
+                message: __(`XML file for ${selectedType} generated successfully`),
+                indicator: 'green'
+            });
+        } else {
+            frappe.msgprint({
+                title: __('Error'),
+                message: __('Invalid file response'),
+                indicator: 'red'
+            });
+        }
+    } else {
+        frappe.msgprint({
+            title: __('Error'),
+            message: __('Error in generating XML file'),
+            indicator: 'red'
+        });
     }
-});
\ No newline at end of file
+}
@@ -0,0 +1,130 @@
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+import psutil
+from frappe.tests.utils import FrappeTestCase
+
+from tallyerp9_import.csv_reader import (
+    TEMPLATE_METADATA_ROWS,
+    TEMPLATE_PREAMBLE_ROWS,
+    TEMPLATE_SKIPROWS,
+    read_csv_chunks,
+    read_template_chunks,
+    unique_values,
+)
+
+HEADER = 'customer_name, customer_group ,gstin,pincode,territory'
+
+RECORDS = [
+    'Sharma & Sons,Commercial,07AAACS1234A1Z5,011001,India',
+    '"Patel, Traders",Retail,,380001,',
+    '"Multi\nLine ""Quoted"" Ltd",Commercial,24AAACP9876B1Z2,0,India',
+    ',,,,',
+    'Café Déjà Vu,Retail,27AAACC5555C1Z9,400001,India',
+]
+
+
+def template(records, header=HEADER):
+    """An ERPNext data import template CSV with ``records`` under ``header``."""
+    preamble = [f'"Instruction {number}",,,,' for number in range(TEMPLATE_PREAMBLE_ROWS)]
+    metadata = ['Mandatory:,Yes,No,No,No', 'Type:,Data,Link,Data,Data', 'Info:,,,,', 'Column Name:,,,,']
+    assert len(metadata) == TEMPLATE_METADATA_ROWS
+    return "\n".join([*preamble, header, *metadata, *records]) + "\n"
+
+
+class TestReadTemplateChunks(FrappeTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def csv_file(self, records=RECORDS, header=HEADER):
+        file_path = os.path.join(self.directory, "customers.csv")
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write(template(records, header))
+        return file_path
+
+    def read_whole(self, file_path):
+        # What the converters used to read the template into, all at once
+        df = pd.read_csv(file_path, skiprows=TEMPLATE_SKIPROWS, dtype=str)
+        df.columns = df.columns.str.strip()
+        return df
+
+    def test_chunks_add_up_to_the_whole_file(self):
+        file_path = self.csv_file()
+        for chunk_size in (1, 2, len(RECORDS), 1000):
+            chunks = list(read_template_chunks(file_path, chunk_size=chunk_size, strip_columns=True, memory_map=False))
+            self.assertEqual(len(chunks), -(-len(RECORDS) // chunk_size))
+            self.assertTrue(all(len(chunk) <= chunk_size for chunk in chunks))
+            pd.testing.assert_frame_equal(pd.concat(chunks), self.read_whole(file_path))
+
+    def test_cells_are_read_as_written(self):
+        df = pd.concat(read_template_chunks(self.csv_file(), chunk_size=2, strip_columns=True, memory_map=False))
+        self.assertEqual(list(df['pincode'].fillna("")), ["011001", "380001", "0", "", "400001"])
+        self.assertEqual(df['customer_name'].iloc[2], 'Multi\nLine "Quoted" Ltd')
+
+    def test_count_rows(self):
+        chunks = read_template_chunks(self.csv_file(), memory_map=False)
+        # The header was read, the file is open until the chunks are
+        self.addCleanup(chunks.reader.close)
+        # The embedded newline counts as a record
+        self.assertEqual(chunks.count_rows(), len(RECORDS) + 1)
+
+    def test_unique_values(self):
+        chunks = read_template_chunks(self.csv_file(), chunk_size=2, strip_columns=True, memory_map=False)
+        self.assertEqual(unique_values(chunks, 'customer_group'), ["Commercial", "Retail"])
+
+    def test_plain_csv(self):
+        file_path = os.path.join(self.directory, "plain.csv")
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write("\n".join([HEADER, *RECORDS]) + "\n")
+
+        df = pd.concat(read_csv_chunks(file_path, chunk_size=2, strip_columns=True))
+        whole = pd.read_csv(file_path, dtype=str)
+        whole.columns = whole.columns.str.strip()
+        pd.testing.assert_frame_equal(df, whole)
+
+    def test_memory_map_reads_the_same_chunks(self):
+        file_path = self.csv_file()
+        for chunk_size in (1, 2, 1000):
+            plain = read_template_chunks(file_path, chunk_size=chunk_size, strip_columns=True, memory_map=False)
+            mapped = read_template_chunks(file_path, chunk_size=chunk_size, strip_columns=True, memory_map=True)
+            self.assertEqual(mapped.count_rows(), plain.count_rows())
+            for mapped_chunk, plain_chunk in zip(mapped, plain, strict=True):
+                pd.testing.assert_frame_equal(mapped_chunk, plain_chunk)
+
+    def test_memory_map_of_a_template_without_records(self):
+        file_path = self.csv_file(records=[])
+        usecols = lambda name: name.strip() == 'gstin'
+        for kwargs in ({}, {'usecols': usecols}):
+            [plain] = read_template_chunks(file_path, memory_map=False, **kwargs)
+            [mapped] = read_template_chunks(file_path, memory_map=True, **kwargs)
+            self.assertEqual(list(mapped.columns), list(plain.columns))
+            self.assertTrue(mapped.empty)
+
+    def test_memory_map_column_names(self):
+        # Blank and repeated names are made unique the way pandas makes them
+        file_path = self.csv_file(header='customer_name,,gstin,gstin,territory')
+        usecols = lambda name: name != 'territory'
+        plain = pd.concat(read_template_chunks(file_path, memory_map=False, usecols=usecols))
+        mapped = pd.concat(read_template_chunks(file_path, memory_map=True, usecols=usecols))
+        self.assertEqual(list(mapped.columns), ["customer_name", "Unnamed: 1", "gstin", "gstin.1"])
+        pd.testing.assert_frame_equal(mapped, plain)
+
+    def test_memory_map_is_only_open_while_read(self):
+        file_path = self.csv_file()
+
+        def open_files():
+            return [f.path for f in psutil.Process().open_files() if f.path == file_path]
+
+        chunks = read_template_chunks(file_path, chunk_size=2, memory_map=True)
+        self.assertEqual(open_files(), [])
+        chunks.count_rows()
+        self.assertEqual(open_files(), [])
+
+        reading = iter(chunks)
+        next(reading)
+        self.assertTrue(open_files())
+        reading.close()
+        self.assertEqual(open_files(), [])
@@ -0,0 +1,117 @@
+from datetime import timedelta
+
+import frappe
+import pandas as pd
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import now_datetime
+
+from tallyerp9_import.db_source import (
+    ACTION_COLUMN,
+    WATERMARK_DOCTYPE,
+    DBSource,
+    applied_filters,
+    get_watermark,
+    save_watermark,
+    watermark_sink,
+)
+
+# ToDo is in every site, its records stand in for a converter's
+SOURCE = DBSource("ToDo", fields=["description"], date_field="date")
+
+DELTA = {'delta': 1}
+
+
+def applied(filters):
+    """The ``filters`` a read of ``SOURCE`` keeps its watermark under."""
+    return applied_filters(frappe.get_meta("ToDo"), SOURCE, filters)
+
+
+class TestDeltaExport(FrappeTestCase):
+    def setUp(self):
+        frappe.db.delete(WATERMARK_DOCTYPE, {'reference_doctype': "ToDo"})
+        self.now = now_datetime()
+        # Everything already in the site was exported, the ToDos below are modified after that
+        save_watermark("ToDo", self.now, 0)
+        self.names = []
+        for day in (1, 2, 3):
+            todo = frappe.get_doc({'doctype': "ToDo", 'description': f"Delta export {day}"}).insert()
+            self.modify(todo.name, day)
+            self.names.append(todo.name)
+        # Modified days ahead, they would be read again by every test after this one
+        self.addCleanup(frappe.db.delete, "ToDo", {'name': ("in", self.names)})
+
+    def modify(self, name, days):
+        frappe.db.set_value("ToDo", name, "modified", self.now + timedelta(days=days), update_modified=False)
+
+    def read(self, filters=DELTA, **kwargs):
+        chunks = list(SOURCE.read_chunks(filters, chunk_size=2, **kwargs))
+        return pd.concat(chunks) if chunks else pd.DataFrame(columns=["name", ACTION_COLUMN])
+
+    def test_changed_records_move_the_watermark(self):
+        rows = self.read()
+        self.assertEqual(sorted(rows['name']), sorted(self.names))
+        self.assertEqual(set(rows[ACTION_COLUMN]), {"Create"})
+        self.assertEqual(get_watermark("ToDo"), self.now + timedelta(days=3))
+        self.assertEqual(frappe.db.get_value(WATERMARK_DOCTYPE, "ToDo", "records"), 3)
+
+        # Only what changed since is read again, as an alteration of what Tally has
+        self.modify(self.names[0], 4)
+        rows = self.read()
+        self.assertEqual(list(rows['name']), [self.names[0]])
+        self.assertEqual(list(rows[ACTION_COLUMN]), ["Alter"])
+        self.assertEqual(get_watermark("ToDo"), self.now + timedelta(days=4))
+
+        # Nothing changed, nothing read and the watermark stays
+        self.assertTrue(self.read().empty)
+        self.assertEqual(get_watermark("ToDo"), self.now + timedelta(days=4))
+
+    def test_watermark_moves_only_once_every_chunk_is_read(self):
+        chunks = iter(SOURCE.read_chunks(DELTA, chunk_size=1))
+        next(chunks)
+        chunks.close()
+        self.assertEqual(get_watermark("ToDo"), self.now)
+
+    def test_reading_without_moving_the_watermark(self):
+        rows = self.read(move_watermark=False)
+        self.assertEqual(sorted(rows['name']), sorted(self.names))
+        self.assertEqual(get_watermark("ToDo"), self.now)
+        # So the same records are read again
+        self.assertEqual(sorted(self.read()['name']), sorted(self.names))
+
+    def test_watermark_handed_to_the_sink(self):
+        # As an export made of several conversions has it, to save once they all worked
+        watermarks = []
+        token = watermark_sink.set(watermarks.append)
+        try:
+            self.read()
+        finally:
+            watermark_sink.reset(token)
+        self.assertEqual(watermarks, [("ToDo", self.now + timedelta(days=3), 3, {})])
+        self.assertEqual(get_watermark("ToDo"), self.now)
+
+    def test_filtered_exports_have_watermarks_of_their_own(self):
+        # The newest ToDo is dated in January, the others in February
+        for name, date in zip(self.names, ("2024-02-10", "2024-02-20", "2024-01-15")):
+            frappe.db.set_value("ToDo", name, "date", date, update_modified=False)
+        january = {**DELTA, 'from_date': "2024-01-01", 'to_date': "2024-01-31"}
+        february = {**DELTA, 'from_date': "2024-02-01", 'to_date': "2024-02-29"}
+
+        rows = self.read(january)
+        self.assertEqual(list(rows['name']), [self.names[2]])
+        self.assertEqual(get_watermark("ToDo", applied(january)), self.now + timedelta(days=3))
+        # February's records were never sent, however new January's watermark is
+        rows = self.read(february)
+        self.assertEqual(sorted(rows['name']), sorted(self.names[:2]))
+        self.assertEqual(set(rows[ACTION_COLUMN]), {"Create"})
+        self.assertEqual(get_watermark("ToDo", applied(february)), self.now + timedelta(days=2))
+        # Nor does either move the watermark of the unfiltered exports
+        self.assertEqual(get_watermark("ToDo"), self.now)
+
+        # Interleaved, each export reads what changed since its own last one
+        self.modify(self.names[0], 4)
+        self.assertTrue(self.read(january).empty)
+        rows = self.read(february)
+        self.assertEqual(list(rows['name']), [self.names[0]])
+        self.assertEqual(list(rows[ACTION_COLUMN]), ["Alter"])
+        self.assertTrue(self.read(january).empty)
+        self.assertEqual(sorted(self.read()['name']), sorted(self.names))
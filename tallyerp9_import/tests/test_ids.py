@@ -0,0 +1,44 @@
+import uuid
+
+from frappe.tests.utils import FrappeTestCase
+
+from tallyerp9_import.ids import TALLY_NAMESPACE, TallyIds
+
+NAME = "ACC-JV-2024-00001"
+
+
+class TestTallyIds(FrappeTestCase):
+    def setUp(self):
+        self.ids = TallyIds("Techsolvo Pvt Ltd", deterministic=True)
+
+    def test_same_record_same_guid(self):
+        guid = self.ids.guid("Journal Entry", NAME)
+        # Whichever conversion asks
+        self.assertEqual(TallyIds("Techsolvo Pvt Ltd", deterministic=True).guid("Journal Entry", NAME), guid)
+        self.assertEqual(guid, str(uuid.uuid5(TALLY_NAMESPACE, f"Techsolvo Pvt Ltd:Journal Entry:{NAME}")))
+        self.assertEqual(uuid.UUID(guid).version, 5)
+
+    def test_different_record_different_guid(self):
+        guid = self.ids.guid("Journal Entry", NAME)
+        self.assertNotEqual(self.ids.guid("Journal Entry", "ACC-JV-2024-00002"), guid)
+        self.assertNotEqual(self.ids.guid("Payment Entry", NAME), guid)
+        self.assertNotEqual(TallyIds("Sharma Traders", deterministic=True).guid("Journal Entry", NAME), guid)
+
+    def test_purpose(self):
+        guid = self.ids.guid("Journal Entry", NAME)
+        vch_key = self.ids.guid("Journal Entry", NAME, "VCHKEY")
+        self.assertNotEqual(vch_key, guid)
+        self.assertNotEqual(self.ids.guid("Journal Entry", NAME, "VOUCHERKEY"), vch_key)
+        self.assertEqual(self.ids.guid("Journal Entry", NAME, "VCHKEY"), vch_key)
+
+    def test_random(self):
+        ids = TallyIds("Techsolvo Pvt Ltd")
+        guid = ids.guid("Journal Entry", NAME)
+        self.assertEqual(uuid.UUID(guid).version, 4)
+        self.assertNotEqual(ids.guid("Journal Entry", NAME), guid)
+        self.assertEqual(ids.guid("Journal Entry", NAME, default="1"), "1")
+
+    def test_record_without_a_name(self):
+        # Nothing to derive an ID from, so a random one even when deterministic
+        for name in (None, "", "  ", float("nan")):
+            self.assertEqual(uuid.UUID(self.ids.guid("Journal Entry", name)).version, 4)
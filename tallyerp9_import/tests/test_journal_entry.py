@@ -0,0 +1,112 @@
+import os
+import shutil
+import tempfile
+import xml.etree.ElementTree as ET
+
+import pandas as pd
+from frappe.tests.utils import FrappeTestCase
+
+from tallyerp9_import.ids import TallyIds
+from tallyerp9_import.journal_entry import group_entries, write_tally_messages
+from tallyerp9_import.utils import tally_amount
+from tallyerp9_import.xml_writer import TallyXMLWriter
+
+COLUMNS = ["name", "posting_date", "party_type", "party", "debit_in_account_currency", "credit_in_account_currency"]
+
+
+def chunk(rows, start=0):
+    """A chunk of journal rows as the CSV reader gives them, blanks as NaN."""
+    rows = [[float("nan") if value == "" else value for value in row] for row in rows]
+    return pd.DataFrame(rows, columns=COLUMNS, index=range(start, start + len(rows)), dtype=object)
+
+
+class TestTallyAmount(FrappeTestCase):
+    def test_format(self):
+        self.assertEqual(tally_amount("74706.00", True), "-74706")
+        self.assertEqual(tally_amount("1234.50", False), "1234.5")
+        self.assertEqual(tally_amount("-12", False), "12")
+        self.assertEqual(tally_amount(100.0, True), "-100")
+
+    def test_zero_is_never_negative(self):
+        self.assertEqual(tally_amount("0", True), "0")
+        self.assertEqual(tally_amount("0.00", False), "0")
+
+    def test_blank_is_zero(self):
+        self.assertEqual(tally_amount("", True), "0")
+        self.assertEqual(tally_amount(" ", False), "0")
+
+
+class TestGroupEntries(FrappeTestCase):
+    def grouped(self, chunks):
+        """Each entry of ``chunks`` as its name and the parties of its rows."""
+        return [
+            (entry.name, [row.party for row in [entry.main_entry, *entry.related_entries]])
+            for entry in group_entries(chunks)
+        ]
+
+    def test_entries_across_chunks(self):
+        chunks = [
+            chunk([
+                # Account rows ahead of the first entry belong to none
+                ["", "", "", "Orphan", "1", "0"],
+                ["ACC-JV-2024-00001", "31-05-2024", "Customer", "Sharma Traders", "100", "0"],
+                ["", "", "", "Sales", "0", "100"],
+            ]),
+            # The first entry runs on into the next chunk, and on over a chunk of nothing but its rows
+            chunk([["", "", "", "Round Off", "0", "0"]], start=3),
+            chunk([
+                ["", "", "", "Cash", "0", "0"],
+                ["ACC-JV-2024-00002", "01-06-2024", "Supplier", "Gupta Steel", "0", "50"],
+            ], start=4),
+            chunk([], start=6),
+            chunk([["ACC-JV-2024-00003", "02-06-2024", "Customer", "Patel & Sons", "10", "0"]], start=6),
+        ]
+        self.assertEqual(self.grouped(chunks), [
+            ("ACC-JV-2024-00001", ["Sharma Traders", "Sales", "Round Off", "Cash"]),
+            ("ACC-JV-2024-00002", ["Gupta Steel"]),
+            ("ACC-JV-2024-00003", ["Patel & Sons"]),
+        ])
+
+    def test_streamed(self):
+        # Each entry is handed on once the next starts, before the chunks after that are read
+        read = []
+
+        def chunks():
+            for number in range(1, 4):
+                read.append(number)
+                yield chunk([[f"ACC-JV-2024-0000{number}", "31-05-2024", "Customer", "Sharma Traders", "1", "0"],
+                             ["", "", "", "Sales", "0", "1"]], start=2 * number)
+
+        entries = group_entries(chunks())
+        self.assertEqual(next(entries).name, "ACC-JV-2024-00001")
+        self.assertEqual(read, [1, 2])
+
+    def test_no_entries(self):
+        self.assertEqual(self.grouped([]), [])
+        self.assertEqual(self.grouped([chunk([["", "", "", "Orphan", "1", "0"]])]), [])
+
+
+class TestJournalVouchers(FrappeTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def amounts(self, chunks):
+        """The LEDGERNAME and AMOUNT of every ledger entry written for ``chunks``, by voucher."""
+        xml_file_path = os.path.join(self.directory, "journal.xml")
+        with TallyXMLWriter(xml_file_path, "Vouchers") as writer:
+            write_tally_messages(writer, chunks, TallyIds("Test Company", deterministic=True))
+        return [
+            [(entry.findtext("LEDGERNAME"), entry.findtext("AMOUNT")) for entry in voucher.iter("ALLLEDGERENTRIES.LIST")]
+            for voucher in ET.parse(xml_file_path).iter("VOUCHER")
+        ]
+
+    def test_account_row_without_debit_or_credit(self):
+        chunks = [chunk([
+            ["ACC-JV-2024-00001", "31-05-2024", "Customer", "Sharma Traders", "74706.00", "0"],
+            ["", "", "Supplier", "Patel Bros.", "0", "74706.00"],
+            ["", "", "", "Round Off", "", ""],
+        ])]
+        self.assertEqual(self.amounts(chunks), [
+            [("Sharma Traders", "-74706"), ("Patel Bros.", "74706"), ("Round Off", "0")],
+        ])
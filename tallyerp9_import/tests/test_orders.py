@@ -0,0 +1,48 @@
+import pandas as pd
+from frappe.tests.utils import FrappeTestCase
+
+from tallyerp9_import import purchase_order, sales_order
+
+COLUMNS = ["name", "transaction_date", "customer_name", "supplier_name", "item_name", "qty", "rate", "amount"]
+
+
+def chunk(rows, start=0):
+    """A chunk of order rows as the CSV reader gives them, blanks as NaN."""
+    rows = [[float("nan") if value == "" else value for value in row] for row in rows]
+    return pd.DataFrame(rows, columns=COLUMNS, index=range(start, start + len(rows)), dtype=object)
+
+
+def item(name, item_name):
+    """A row of ``item_name`` for the order ``name``, blank for a continuation row."""
+    party = "Sharma Traders" if name else ""
+    date = "31-05-2024" if name else ""
+    return [name, date, party, party, item_name, "2", "50", "100"]
+
+
+class TestGroupOrders(FrappeTestCase):
+    def grouped(self, chunks):
+        """The item names of each order, as both converters group ``chunks``."""
+        orders = []
+        for converter in (sales_order, purchase_order):
+            orders.append([[line.item_name for line in lines] for lines in converter.group_orders(chunks)])
+        self.assertEqual(orders[0], orders[1])
+        return orders[0]
+
+    def test_single_row_orders(self):
+        chunks = [chunk([item("SO-0001", "Bolt"), item("SO-0002", "Nut"), item("SO-0003", "Washer")])]
+        self.assertEqual(self.grouped(chunks), [["Bolt"], ["Nut"], ["Washer"]])
+
+    def test_template_continuation_rows(self):
+        chunks = [
+            chunk([item("SO-0001", "Bolt"), item("", "Nut"), item("SO-0002", "Washer")]),
+            # An order running on into the next chunk
+            chunk([item("", "Screw"), item("", "Rivet"), item("SO-0003", "Nail")], start=3),
+        ]
+        self.assertEqual(self.grouped(chunks), [["Bolt", "Nut"], ["Washer", "Screw", "Rivet"], ["Nail"]])
+
+    def test_name_repeated_on_every_row(self):
+        chunks = [
+            chunk([item("SO-0001", "Bolt"), item("SO-0001", "Nut"), item("SO-0002", "Washer")]),
+            chunk([item("SO-0002", "Screw"), item("SO-0003", "Nail")], start=3),
+        ]
+        self.assertEqual(self.grouped(chunks), [["Bolt", "Nut"], ["Washer", "Screw"], ["Nail"]])
@@ -0,0 +1,116 @@
+import os
+import shutil
+import tempfile
+import uuid
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_to_date, now_datetime
+
+from tallyerp9_import.output_cache import (
+    CACHE_DOCTYPE,
+    MAX_CACHE_AGE_DAYS,
+    OUTPUT_FOLDER,
+    cache_output,
+    conversion_cache_key,
+    evict_cache,
+    get_cached_output,
+)
+
+CONVERTER = "tallyerp9_import.customer"
+
+
+class TestOutputCache(FrappeTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def csv_file(self, content):
+        file_path = os.path.join(self.directory, f"{uuid.uuid4().hex[:8]}.csv")
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return file_path
+
+    def cached(self, last_used=None, file_size=None):
+        """Cache an XML as a conversion would and return its key and File."""
+        file_name = f"customer_output_{uuid.uuid4().hex[:8]}.xml"
+        xml_file_path = frappe.get_site_path('public', 'files', file_name)
+        with open(xml_file_path, "w", encoding="utf-8") as f:
+            f.write("<ENVELOPE/>\n")
+        self.addCleanup(lambda: os.path.exists(xml_file_path) and os.remove(xml_file_path))
+        file_doc = frappe.get_doc({
+            'doctype': 'File',
+            'file_name': file_name,
+            'file_url': f'/files/{file_name}',
+            'is_private': 0,
+            'folder': OUTPUT_FOLDER,
+        }).insert(ignore_permissions=True)
+
+        cache_key = uuid.uuid4().hex
+        cache_output(cache_key, CONVERTER, file_doc, xml_file_path)
+        values = {}
+        if last_used:
+            values['last_used'] = last_used
+        if file_size:
+            values['file_size'] = file_size
+        if values:
+            frappe.db.set_value(CACHE_DOCTYPE, cache_key, values, update_modified=False)
+        return cache_key, file_doc
+
+    def test_key_changes_with_input_and_settings(self):
+        file_path = self.csv_file("customer_name\nSharma & Sons\n")
+        key = conversion_cache_key(CONVERTER, file_path, deterministic_ids=False)
+
+        self.assertEqual(conversion_cache_key(CONVERTER, self.csv_file("customer_name\nSharma & Sons\n"),
+                                             deterministic_ids=False), key)
+        self.assertNotEqual(conversion_cache_key(CONVERTER, self.csv_file("customer_name\nPatel Traders\n"),
+                                                deterministic_ids=False), key)
+        self.assertNotEqual(conversion_cache_key(CONVERTER, file_path, deterministic_ids=True), key)
+        self.assertNotEqual(conversion_cache_key("tallyerp9_import.supplier", file_path, deterministic_ids=False), key)
+
+    def test_hit(self):
+        cache_key, file_doc = self.cached()
+
+        for hits in (1, 2):
+            result = get_cached_output(cache_key)
+            self.assertEqual(result['file_url'], file_doc.file_url)
+            self.assertEqual(result['file_name'], file_doc.file_name)
+            self.assertTrue(os.path.exists(result['file_path']))
+            self.assertEqual(frappe.db.get_value(CACHE_DOCTYPE, cache_key, "hits"), hits)
+
+    def test_miss(self):
+        self.assertIsNone(get_cached_output(uuid.uuid4().hex))
+
+    def test_deleted_xml_is_a_miss(self):
+        cache_key, file_doc = self.cached()
+        os.remove(frappe.get_site_path('public', 'files', file_doc.file_name))
+
+        self.assertIsNone(get_cached_output(cache_key))
+        self.assertFalse(frappe.db.exists(CACHE_DOCTYPE, cache_key))
+
+    def test_unused_xml_is_evicted(self):
+        stale_key, stale_file = self.cached(last_used=add_to_date(now_datetime(), days=-MAX_CACHE_AGE_DAYS - 1))
+        fresh_key, fresh_file = self.cached()
+
+        evict_cache()
+
+        self.assertFalse(frappe.db.exists(CACHE_DOCTYPE, stale_key))
+        self.assertFalse(frappe.db.exists("File", stale_file.name))
+        self.assertTrue(frappe.db.exists(CACHE_DOCTYPE, fresh_key))
+        self.assertTrue(frappe.db.exists("File", fresh_file.name))
+
+    def test_least_recently_used_xml_is_evicted_over_the_size_limit(self):
+        # Ahead of whatever else the site has cached, most recently used first
+        now = now_datetime()
+        entries = [
+            self.cached(last_used=add_to_date(now, minutes=minutes), file_size=600 * 1024)
+            for minutes in (3, 2, 1)
+        ]
+
+        with patch.dict(frappe.conf, {'tally_cache_max_size_mb': 1}):
+            evict_cache()
+
+        for (cache_key, file_doc), kept in zip(entries, (True, False, False)):
+            self.assertEqual(bool(frappe.db.exists(CACHE_DOCTYPE, cache_key)), kept)
+            self.assertEqual(bool(frappe.db.exists("File", file_doc.name)), kept)
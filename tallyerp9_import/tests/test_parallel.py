@@ -0,0 +1,55 @@
+import importlib
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from frappe.tests.utils import FrappeTestCase
+
+from tallyerp9_import import journal_entry
+from tallyerp9_import.benchmarks.generators import write_template_csv
+from tallyerp9_import.csv_reader import read_csv_chunks, read_template_chunks
+from tallyerp9_import.ids import TallyIds
+from tallyerp9_import.jobs import CONVERTERS
+from tallyerp9_import.xml_writer import TallyXMLWriter
+
+RECORDS = 300
+
+# Small enough that records are cut into many chunks and batches, and those of
+# an order or a journal entry across them
+CHUNK_SIZE = 97
+BATCH_SIZE = 7
+
+
+class TestParallelConversion(FrappeTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def converted(self, converter, csv_path, workers):
+        if converter.template:
+            chunks = read_template_chunks(csv_path, chunk_size=CHUNK_SIZE, strip_columns=True)
+        else:
+            chunks = read_csv_chunks(csv_path, chunk_size=CHUNK_SIZE, strip_columns=True)
+        # Deterministic IDs, random ones differ from one conversion to the next
+        ids = TallyIds("Test Company", deterministic=True)
+        xml_file_path = os.path.join(self.directory, f"output_{workers}.xml")
+        with TallyXMLWriter(xml_file_path, converter.report_name) as writer:
+            converter.write(writer, chunks, ids, workers, file_path=csv_path)
+        with open(xml_file_path, "rb") as f:
+            return f.read()
+
+    def test_workers_write_the_same_xml(self):
+        for select_type, method in CONVERTERS.items():
+            with self.subTest(select_type):
+                converter = importlib.import_module(method.rsplit(".", 1)[0]).CONVERTER
+                csv_path = os.path.join(self.directory, "records.csv")
+                write_template_csv(csv_path, select_type, RECORDS, seed=1)
+
+                with patch.object(converter, "batch_size", BATCH_SIZE), \
+                        patch.object(journal_entry, "VOUCHERS_PER_BATCH", BATCH_SIZE):
+                    sequential = self.converted(converter, csv_path, workers=0)
+                    parallel = self.converted(converter, csv_path, workers=3)
+
+                self.assertIn(b"<TALLYMESSAGE", sequential)
+                self.assertEqual(parallel, sequential)
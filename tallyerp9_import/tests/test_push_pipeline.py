@@ -0,0 +1,96 @@
+import os
+import shutil
+import tempfile
+import threading
+import xml.etree.ElementTree as ET
+from unittest.mock import patch
+
+import frappe
+import requests
+from frappe.tests.utils import FrappeTestCase
+
+from tallyerp9_import import push_pipeline
+from tallyerp9_import.benchmarks.fake_tally import FakeTally
+from tallyerp9_import.push_pipeline import SEND_RETRIES, convert_and_push
+from tallyerp9_import.tally_client import TallyClient
+from tallyerp9_import.xml_writer import TallyXMLWriter
+
+LEDGERS = 50
+LEDGERS_PER_BATCH = 5
+
+
+def write_ledgers(directory, count=LEDGERS):
+    """A conversion of ``count`` ledgers in batches of ``LEDGERS_PER_BATCH``, with the result
+    a converter hands back for them."""
+    with TallyXMLWriter(os.path.join(directory, "ledger_output.xml"), "All Masters",
+                        max_messages=LEDGERS_PER_BATCH) as writer:
+        for number in range(count):
+            message = ET.Element("TALLYMESSAGE", {"xmlns:UDF": "TallyUDF"})
+            ET.SubElement(message, "LEDGER", {"NAME": f"Ledger {number}", "ACTION": "Create"})
+            writer.write(message)
+    files = [{'file_path': file_path} for file_path in writer.file_paths]
+    return {**files[0], 'files': files}
+
+
+class TestPushPipeline(FrappeTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.tally = FakeTally(port=0, delay=0.05)
+        threading.Thread(target=self.tally.serve_forever, daemon=True).start()
+        self.addCleanup(self.tally.server_close)
+        self.addCleanup(self.tally.shutdown)
+        self.url = f"http://127.0.0.1:{self.tally.server_address[1]}"
+        # Retry at once rather than after seconds
+        patcher = patch.object(push_pipeline, "RETRY_DELAY", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_every_record_is_created(self):
+        result = convert_and_push({'url': self.url, 'in_flight': 2}, write_ledgers, self.directory)
+
+        self.assertEqual(len(result['files']), LEDGERS // LEDGERS_PER_BATCH)
+        self.assertEqual(result['push']['created'], LEDGERS)
+        self.assertEqual(result['push']['requests'], LEDGERS // LEDGERS_PER_BATCH)
+        self.assertEqual(result['push']['errors'], 0)
+        self.assertEqual(self.tally.created, LEDGERS)
+        self.assertEqual(self.tally.altered, 0)
+
+    def test_in_flight_caps_concurrent_requests(self):
+        for in_flight in (1, 3):
+            self.tally.max_in_flight = 0
+            convert_and_push({'url': self.url, 'in_flight': in_flight}, write_ledgers, self.directory)
+            self.assertEqual(self.tally.max_in_flight, in_flight)
+
+    def test_connection_errors_are_retried(self):
+        post = TallyClient.post
+        calls = []
+
+        def drop_first_connections(client, body):
+            calls.append(body)
+            if len(calls) <= SEND_RETRIES:
+                raise requests.ConnectionError("Connection refused")
+            return post(client, body)
+
+        with patch.object(TallyClient, "post", autospec=True, side_effect=drop_first_connections):
+            result = convert_and_push({'url': self.url, 'in_flight': 1}, write_ledgers, self.directory)
+
+        # The first batch was sent SEND_RETRIES more times, then the rest once each
+        self.assertEqual(len(calls), SEND_RETRIES + LEDGERS // LEDGERS_PER_BATCH)
+        self.assertEqual(result['push']['created'], LEDGERS)
+
+    def test_batches_are_removed_when_tally_stays_unreachable(self):
+        calls = []
+
+        def refuse(client, body):
+            calls.append(body)
+            raise requests.ConnectionError("Connection refused")
+
+        with patch.object(TallyClient, "post", autospec=True, side_effect=refuse):
+            with self.assertRaises(frappe.ValidationError):
+                convert_and_push({'url': self.url, 'in_flight': 1}, write_ledgers, self.directory)
+
+        # The first batch was tried SEND_RETRIES more times and nothing after it
+        self.assertEqual(len(calls), SEND_RETRIES + 1)
+        self.assertEqual(self.tally.requests, 0)
+        self.assertEqual(os.listdir(self.directory), [])
@@ -0,0 +1,149 @@
+import csv
+import gzip
+import os
+import shutil
+import tempfile
+
+from frappe.tests.utils import FrappeTestCase
+
+from tallyerp9_import.reconciliation import REPORT_COLUMNS, reconcile, response_results, sent_records
+
+GUIDS = [f"{number:08x}-1111-4222-8333-444444444444" for number in range(1, 6)]
+
+MASTERS = f"""<?xml version="1.0" ?>
+<ENVELOPE>
+  <BODY>
+    <IMPORTDATA>
+      <REQUESTDATA>
+        <TALLYMESSAGE xmlns:UDF="TallyUDF">
+          <LEDGER NAME="Sharma &amp; Sons" ACTION="Create">
+            <GUID>{GUIDS[0]}</GUID>
+            <LANGUAGENAME.LIST>
+              <NAME.LIST TYPE="String">
+                <NAME>Sharma &amp; Sons</NAME>
+              </NAME.LIST>
+            </LANGUAGENAME.LIST>
+          </LEDGER>
+        </TALLYMESSAGE>
+        <TALLYMESSAGE xmlns="TallyUDF">
+          <STOCKITEM NAME="Steel Rod" ACTION="Create">
+            <GUID>{GUIDS[1]}</GUID>
+          </STOCKITEM>
+        </TALLYMESSAGE>
+      </REQUESTDATA>
+    </IMPORTDATA>
+  </BODY>
+</ENVELOPE>
+"""
+
+# Journal entries, every voucher in one TALLYMESSAGE
+VOUCHERS = f"""<?xml version="1.0" ?>
+<ENVELOPE>
+  <BODY>
+    <IMPORTDATA>
+      <REQUESTDATA>
+        <TALLYMESSAGE xmlns:UDF="TallyUDF">
+          <VOUCHER REMOTEID="{GUIDS[2]}" VCHTYPE="Journal" ACTION="Create">
+            <GUID>{GUIDS[2]}</GUID>
+            <REFERENCE>ACC-JV-2024-00001</REFERENCE>
+          </VOUCHER>
+          <VOUCHER REMOTEID="{GUIDS[3]}" VCHTYPE="Journal" ACTION="Create">
+            <GUID>{GUIDS[3]}</GUID>
+            <REFERENCE>ACC-JV-2024-00002</REFERENCE>
+          </VOUCHER>
+          <VOUCHER REMOTEID="{GUIDS[4]}" VCHTYPE="Journal" ACTION="Create">
+            <GUID>{GUIDS[4]}</GUID>
+            <REFERENCE>ACC-JV-2024-00003</REFERENCE>
+          </VOUCHER>
+        </TALLYMESSAGE>
+      </REQUESTDATA>
+    </IMPORTDATA>
+  </BODY>
+</ENVELOPE>
+"""
+
+# Tally's answer: the ledger and the item by their GUIDs, a voucher by its REMOTEID
+# with an error in it, one quoted in a LINEERROR, and the last not at all
+RESPONSE = f"""<ENVELOPE>
+  <BODY>
+    <DATA>
+      <IMPORTRESULT>
+        <TALLYMESSAGE>
+          <LEDGER NAME="Sharma &amp; Sons">
+            <GUID>{GUIDS[0]}</GUID>
+            <CREATED>1</CREATED>
+          </LEDGER>
+        </TALLYMESSAGE>
+        <TALLYMESSAGE>
+          <STOCKITEM NAME="Steel Rod">
+            <GUID>{GUIDS[1]}</GUID>
+            <ALTERED>1</ALTERED>
+          </STOCKITEM>
+        </TALLYMESSAGE>
+        <TALLYMESSAGE>
+          <VOUCHER REMOTEID="{GUIDS[2]}">
+            <LINEERROR>Ledger 'Cash' does not exist!</LINEERROR>
+          </VOUCHER>
+        </TALLYMESSAGE>
+        <LINEERROR>Voucher totals do not match! Id: {GUIDS[3]}</LINEERROR>
+        <LINEERROR>Could not set the company</LINEERROR>
+        <CREATED>1</CREATED>
+        <ALTERED>1</ALTERED>
+        <ERRORS>2</ERRORS>
+      </IMPORTRESULT>
+    </DATA>
+  </BODY>
+</ENVELOPE>
+"""
+
+
+class TestReconciliation(FrappeTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.masters = self.write("masters.xml", MASTERS)
+        # Read the same gzipped
+        self.vouchers = self.write("vouchers.xml.gz", VOUCHERS)
+        self.response = self.write("response.xml", RESPONSE)
+
+    def write(self, file_name, content):
+        path = os.path.join(self.directory, file_name)
+        with (gzip.open if file_name.endswith(".gz") else open)(path, "wb") as f:
+            f.write(content.encode("utf-8"))
+        return path
+
+    def test_sent_records(self):
+        records = list(sent_records([self.masters, self.vouchers]))
+        self.assertEqual([record.position for record in records], [1, 2, 3, 4, 5])
+        self.assertEqual([record.object for record in records], ["LEDGER", "STOCKITEM", "VOUCHER", "VOUCHER", "VOUCHER"])
+        self.assertEqual([record.name for record in records],
+                         ["Sharma & Sons", "Steel Rod", "ACC-JV-2024-00001", "ACC-JV-2024-00002", "ACC-JV-2024-00003"])
+        self.assertEqual([record.guid for record in records], GUIDS)
+        self.assertEqual(records[2].voucher_type, "Journal")
+        self.assertEqual(records[2].remote_id, GUIDS[2])
+
+    def test_response_results(self):
+        results, response = response_results([self.response])
+        self.assertEqual(results[GUIDS[0]].status, "Created")
+        self.assertEqual(results[GUIDS[2]], ("Error", "Ledger 'Cash' does not exist!"))
+        self.assertEqual(results[GUIDS[3]].status, "Error")
+        self.assertNotIn(GUIDS[4], results)
+        self.assertEqual((response['created'], response['altered'], response['errors']), (1, 1, 2))
+        self.assertEqual(response['unmatched_errors'], ["Could not set the company"])
+
+    def test_reconcile(self):
+        report_path = os.path.join(self.directory, "report.csv")
+        summary = reconcile([self.masters, self.vouchers], [self.response], report_path)
+
+        with open(report_path, newline="", encoding="utf-8") as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0], REPORT_COLUMNS)
+        # In the order the records were sent
+        self.assertEqual([row[REPORT_COLUMNS.index("GUID")] for row in rows[1:]], GUIDS)
+        self.assertEqual([row[REPORT_COLUMNS.index("Status")] for row in rows[1:]],
+                         ["Created", "Altered", "Error", "Error", "Not Reported"])
+        self.assertEqual(rows[3][REPORT_COLUMNS.index("Message")], "Ledger 'Cash' does not exist!")
+        self.assertEqual(summary['statuses'], {"Created": 1, "Altered": 1, "Error": 2, "Not Reported": 1})
+        self.assertEqual(summary['response']['errors'], 2)
+        self.assertEqual(summary['unmatched_errors'], ["Could not set the company"])
+        self.assertEqual(summary['unmatched_count'], 1)
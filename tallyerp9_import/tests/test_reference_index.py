@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from tallyerp9_import.csv_reader import TEMPLATE_PREAMBLE_ROWS
+from tallyerp9_import.reference_index import LEDGER, ReferenceIndex, throw_dangling
+
+INDEX = ReferenceIndex({
+    'Account': {"Cash", "Sales"},
+    'Customer': {"Sharma Traders", "Patel & Sons"},
+    'Supplier': {"Gupta Steel"},
+    'Item': {"Bolt M8", "Washer"},
+})
+
+
+def template(header, records):
+    """An ERPNext data import template CSV with ``records`` under ``header``."""
+    blank = "," * header.count(",")
+    preamble = [f'"Instruction {number}"{blank}' for number in range(TEMPLATE_PREAMBLE_ROWS)]
+    metadata = [f"Mandatory:{blank}", f"Type:{blank}", f"Info:{blank}", f"Column Name:{blank}"]
+    return "\n".join([*preamble, header, *metadata, *records]) + "\n"
+
+
+class TestDangling(FrappeTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def dangling(self, voucher_type, header, records):
+        path = os.path.join(self.directory, "vouchers.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(template(header, records))
+        with patch("tallyerp9_import.reference_index.attached_file_path", return_value=path):
+            return INDEX.dangling(voucher_type, csv_file="/private/files/vouchers.csv")
+
+    def test_sales_orders(self):
+        dangling = self.dangling("Sales Order", "name, customer_name ,item_name,qty", [
+            "SO-0001,Sharma Traders,Bolt M8,2",
+            # Continuation rows have no customer
+            ",,Washer,4",
+            ",,Nut M8,4",
+            "SO-0002,  Patel & Sons ,Nut M8,1",
+            "SO-0003,Verma Bros,Rivet,1",
+        ])
+        # Names are compared without surrounding whitespace, each counted by the rows it is on
+        self.assertEqual(dangling, {'Item': {"Nut M8": 2, "Rivet": 1}, 'Customer': {"Verma Bros": 1}})
+
+    def test_parties_are_any_ledger(self):
+        dangling = self.dangling("Journal Entry", "name,party,debit_in_account_currency", [
+            "ACC-JV-2024-00001,Sharma Traders,100",
+            ",Gupta Steel,0",
+            ",Cash,0",
+            ",Suspense,0",
+        ])
+        self.assertEqual(dangling, {LEDGER: {"Suspense": 1}})
+
+    def test_nothing_dangling(self):
+        dangling = self.dangling("Purchase Order", "name,supplier_name,item_name", ["PO-0001,Gupta Steel,Washer"])
+        self.assertEqual(dangling, {})
+        # Nothing to throw about
+        throw_dangling({"Purchase Order": dangling})
+
+    def test_throw_dangling(self):
+        with self.assertRaises(frappe.ValidationError) as raised:
+            throw_dangling({"Sales Order": {'Customer': {"Verma <Bros>": 1}}})
+        self.assertIn("Sales Order, Customer", str(raised.exception))
+        self.assertIn("Verma &lt;Bros&gt;", str(raised.exception))
@@ -0,0 +1,84 @@
+import xml.etree.ElementTree as ET
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from tallyerp9_import.tally_client import SETTINGS, add_response, empty_response, parse_push, parse_response
+
+# Tally ERP9 answers an import with a bare RESPONSE
+ERP9_RESPONSE = b"""<RESPONSE>
+ <CREATED>2</CREATED>
+ <ALTERED>1</ALTERED>
+ <DELETED>0</DELETED>
+ <LASTVCHID>0</LASTVCHID>
+ <LASTMID>0</LASTMID>
+ <COMBINED>0</COMBINED>
+ <IGNORED>0</IGNORED>
+ <ERRORS>1</ERRORS>
+ <CANCELLED>0</CANCELLED>
+ <LINEERROR>Ledger &apos;Cash&apos; does not exist!</LINEERROR>
+</RESPONSE>"""
+
+# TallyPrime wraps the counters in an ENVELOPE, its errors in lowercase tags
+PRIME_RESPONSE = b"""<ENVELOPE>
+ <HEADER><VERSION>1</VERSION><STATUS>1</STATUS></HEADER>
+ <BODY>
+  <DATA>
+   <IMPORTRESULT>
+    <CREATED>0</CREATED>
+    <ALTERED>3</ALTERED>
+    <ERRORS>2</ERRORS>
+    <EXCEPTIONS>1</EXCEPTIONS>
+    <LineError>  Voucher totals do not match!  </LineError>
+    <LINEERROR></LINEERROR>
+   </IMPORTRESULT>
+  </DATA>
+ </BODY>
+</ENVELOPE>"""
+
+
+class TestParsePush(FrappeTestCase):
+    def setUp(self):
+        url = frappe.db.get_single_value(SETTINGS, "tally_url")
+        self.addCleanup(frappe.db.set_single_value, SETTINGS, "tally_url", url)
+        frappe.db.set_single_value(SETTINGS, "tally_url", " http://tally-pc:9000 ")
+
+    def test_saved_url(self):
+        # Whatever URL the request comes with
+        push = parse_push({'enabled': 1, 'url': "http://169.254.169.254/latest/meta-data", 'in_flight': 3})
+        self.assertEqual(push, {'url': "http://tally-pc:9000", 'in_flight': 3})
+
+    def test_not_pushed(self):
+        self.assertIsNone(parse_push(None))
+        self.assertIsNone(parse_push('{"enabled": 0, "url": "http://tally-pc:9000"}'))
+
+
+class TestParseResponse(FrappeTestCase):
+    def test_tally_erp9(self):
+        response = parse_response(ERP9_RESPONSE)
+        self.assertEqual(response, {
+            **empty_response(),
+            'created': 2,
+            'altered': 1,
+            'errors': 1,
+            'line_errors': ["Ledger 'Cash' does not exist!"],
+        })
+
+    def test_tally_prime(self):
+        response = parse_response(PRIME_RESPONSE)
+        self.assertEqual((response['created'], response['altered'], response['errors'], response['exceptions']),
+                         (0, 3, 2, 1))
+        # Stripped, and the empty one left out
+        self.assertEqual(response['line_errors'], ["Voucher totals do not match!"])
+
+    def test_totals(self):
+        totals = {**empty_response(), 'requests': 0}
+        for content in (ERP9_RESPONSE, PRIME_RESPONSE):
+            add_response(totals, parse_response(content))
+        self.assertEqual((totals['requests'], totals['created'], totals['altered'], totals['errors']), (2, 2, 4, 3))
+        self.assertEqual(len(totals['line_errors']), 2)
+
+    def test_malformed(self):
+        for content in (b"", b"<RESPONSE><CREATED>1</CREATED>", b"Tally is not running"):
+            with self.assertRaises(ET.ParseError):
+                parse_response(content)
@@ -0,0 +1,125 @@
+import importlib
+import os
+import shutil
+import tempfile
+import xml.etree.ElementTree as ET
+from unittest.mock import patch
+
+import frappe
+import pandas as pd
+from frappe.tests.utils import FrappeTestCase
+
+from tallyerp9_import import tally_import
+from tallyerp9_import.benchmarks.generators import write_template_csv
+from tallyerp9_import.csv_reader import read_template_chunks
+from tallyerp9_import.ids import TallyIds
+from tallyerp9_import.jobs import CONVERTERS
+from tallyerp9_import.tally_import import enqueue_tally_import, read_ahead
+from tallyerp9_import.xml_writer import TallyXMLWriter
+
+RECORDS = 40
+
+
+class TestReadTallyXML(FrappeTestCase):
+    """Reads back what the converters write, as importing a Tally export does."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def convert(self, select_type, **writer_options):
+        """The records of a generated CSV for ``select_type`` and the XML files they convert to."""
+        converter = importlib.import_module(CONVERTERS[select_type].rsplit(".", 1)[0]).CONVERTER
+        csv_path = os.path.join(self.directory, "records.csv")
+        write_template_csv(csv_path, select_type, RECORDS, seed=3)
+        xml_file_path = os.path.join(self.directory, "output.xml")
+        with TallyXMLWriter(xml_file_path, converter.report_name, **writer_options) as writer:
+            chunks = read_template_chunks(csv_path, strip_columns=True)
+            converter.write(writer, chunks, TallyIds("Test Company", deterministic=True), file_path=csv_path)
+        records = pd.concat(read_template_chunks(csv_path, strip_columns=True)).fillna("")
+        return records, writer.file_paths
+
+    def read(self, paths):
+        return [tally_object for batch in read_ahead(paths) for tally_object in batch]
+
+    def test_customers(self):
+        records, paths = self.convert("Customer")
+        ledgers = [ledger for tag, ledger in self.read(paths) if tag == "LEDGER"]
+
+        self.assertEqual([ledger.name for ledger in ledgers], list(records['customer_name']))
+        self.assertEqual({ledger.parent for ledger in ledgers}, {"Sundry Debtors"})
+        self.assertEqual([ledger.email for ledger in ledgers], list(records['email_id']))
+        self.assertEqual([ledger.website for ledger in ledgers], list(records['website']))
+        self.assertEqual([ledger.mobile for ledger in ledgers], list(records['mobile_no']))
+
+    def test_items(self):
+        records, paths = self.convert("Item Master")
+        tally_objects = self.read(paths)
+        units = [unit.name for tag, unit in tally_objects if tag == "UNIT"]
+        items = [item for tag, item in tally_objects if tag == "STOCKITEM"]
+
+        self.assertEqual(units, list(dict.fromkeys(records['stock_uom'])))
+        self.assertEqual([item.name for item in items], list(records['item_name']))
+        self.assertEqual([item.base_units for item in items], list(records['stock_uom']))
+        self.assertEqual([item.hsn_code for item in items], list(records['gst_hsn_code']))
+
+    def test_sales_orders(self):
+        records, paths = self.convert("Sales Order")
+        orders = records[records['name'] != ""]
+        vouchers = [voucher for tag, voucher in self.read(paths) if tag == "VOUCHER"]
+
+        self.assertEqual([voucher.name for voucher in vouchers], list(orders['name']))
+        self.assertEqual({voucher.voucher_type for voucher in vouchers}, {"Sales Order"})
+        self.assertEqual([voucher.party for voucher in vouchers], list(orders['customer_name']))
+        self.assertEqual([len(voucher.items) for voucher in vouchers],
+                         list(records.groupby((records['name'] != "").cumsum()).size()))
+        for voucher, total in zip(vouchers, orders['total']):
+            self.assertAlmostEqual(sum(item.amount for item in voucher.items), float(total), places=2)
+
+    def test_journal_entries(self):
+        records, paths = self.convert("Journal Entry")
+        entries = records[records['name'] != ""]
+        vouchers = [voucher for tag, voucher in self.read(paths) if tag == "VOUCHER"]
+
+        self.assertEqual(len(vouchers), len(entries))
+        self.assertEqual({voucher.voucher_type for voucher in vouchers}, {"Journal"})
+        self.assertEqual([voucher.date for voucher in vouchers],
+                         [pd.to_datetime(date, format="%d-%m-%Y").strftime("%Y-%m-%d") for date in entries['posting_date']])
+        self.assertEqual([len(voucher.entries) for voucher in vouchers],
+                         list(records.groupby((records['name'] != "").cumsum()).size()))
+
+    def test_batches_compressed_and_in_order(self):
+        records, paths = self.convert("Customer")
+        plain = self.read(paths)
+
+        for compression in ("gzip", "zip"):
+            with patch.object(tally_import, "IMPORT_BATCH_SIZE", 3):
+                records, paths = self.convert("Customer", compression=compression, max_messages=7)
+                batches = list(read_ahead(paths))
+            self.assertTrue(all(len(batch) == 3 for batch in batches[:-1]))
+            self.assertEqual([tally_object for batch in batches for tally_object in batch], plain)
+
+    def test_objects_with_nothing_to_import_into(self):
+        path = os.path.join(self.directory, "cost_centres.xml")
+        with TallyXMLWriter(path, "All Masters") as writer:
+            message = ET.Element("TALLYMESSAGE", {"xmlns:UDF": "TallyUDF"})
+            ET.SubElement(message, "COSTCENTRE", NAME="Head Office")
+            writer.write(message)
+
+        self.assertEqual(self.read([path]), [("COSTCENTRE", None)])
+
+    def test_malformed_xml(self):
+        path = os.path.join(self.directory, "truncated.xml")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("<ENVELOPE><BODY><TALLYMESSAGE><LEDGER NAME=\"Cash\">")
+
+        with self.assertRaises(ET.ParseError):
+            self.read([path])
+
+
+class TestEnqueueTallyImport(FrappeTestCase):
+    def test_needs_create_permission(self):
+        with patch("frappe.has_permission", side_effect=frappe.PermissionError), patch("frappe.enqueue") as enqueue:
+            with self.assertRaises(frappe.PermissionError):
+                enqueue_tally_import("/private/files/tally_export.xml")
+        enqueue.assert_not_called()
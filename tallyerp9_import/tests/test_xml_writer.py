@@ -0,0 +1,254 @@
+import gzip
+import itertools
+import os
+import shutil
+import tempfile
+import xml.etree.ElementTree as ET
+import zipfile
+from xml.dom import minidom
+
+from frappe.tests.utils import FrappeTestCase
+
+from tallyerp9_import.xml_writer import Fragment, TallyXMLWriter, batch_sink
+
+
+def envelope(messages, report_name="All Masters"):
+    """The ENVELOPE the converters used to build in memory around ``messages``."""
+    envelope = ET.Element("ENVELOPE")
+    header = ET.SubElement(envelope, "HEADER")
+    ET.SubElement(header, "TALLYREQUEST").text = "Import Data"
+    import_data = ET.SubElement(ET.SubElement(envelope, "BODY"), "IMPORTDATA")
+    request_desc = ET.SubElement(import_data, "REQUESTDESC")
+    ET.SubElement(request_desc, "REPORTNAME").text = report_name
+    static_variables = ET.SubElement(request_desc, "STATICVARIABLES")
+    ET.SubElement(static_variables, "SVCURRENTCOMPANY").text = "Techsolvo"
+    request_data = ET.SubElement(import_data, "REQUESTDATA")
+    request_data.extend(messages)
+    return envelope
+
+
+def pretty_printed(messages, report_name="All Masters"):
+    """``messages`` in an ENVELOPE as the converters used to write them, through minidom."""
+    xml_str = ET.tostring(envelope(messages, report_name), encoding='utf-8')
+    return minidom.parseString(xml_str).toprettyxml(indent="  ").encode("utf-8")
+
+
+def ledger_message(name, address):
+    message = ET.Element("TALLYMESSAGE", {"xmlns:UDF": "TallyUDF"})
+    ledger = ET.SubElement(message, "LEDGER", {"NAME": name, "ACTION": "Create"})
+    ET.SubElement(ledger, "ADDRESS").text = address
+    ET.SubElement(ledger, "EMAIL").text = ""
+    ET.SubElement(ledger, "LEDGERFAX")
+    name_list = ET.SubElement(ET.SubElement(ledger, "LANGUAGENAME.LIST"), "NAME.LIST", TYPE="String")
+    ET.SubElement(name_list, "NAME").text = name
+    return message
+
+
+def item_message(name):
+    # Item master messages declare a default namespace
+    message = ET.Element("TALLYMESSAGE", xmlns="TallyUDF")
+    # minidom puts namespace declarations ahead of the other attributes
+    item = ET.SubElement(message, "STOCKITEM", {"NAME": name, "xmlns:UDF": "TallyUDF", "RESERVEDNAME": ""})
+    ET.SubElement(item, "BASEUNITS").text = "Nos"
+    ET.SubElement(item, "OPENINGBALANCE").text = "0"
+    return message
+
+
+MESSAGES = [
+    ledger_message('Sharma & Sons <Traders> "Delhi"', "12, Main Road\r\nNew Delhi > 110001"),
+    ledger_message("Café Déjà Vu", "Shop 4,\rMumbai"),
+    item_message("Bolt M8 x 40"),
+    item_message("Washer 'A' & <B>"),
+]
+
+
+class TestTallyXMLWriter(FrappeTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.file_path = os.path.join(self.directory, "output.xml")
+
+    def written(self, write, report_name="All Masters"):
+        with TallyXMLWriter(self.file_path, report_name) as writer:
+            write(writer)
+        with open(self.file_path, "rb") as f:
+            return f.read()
+
+    def test_messages_match_minidom(self):
+        def write(writer):
+            for message in MESSAGES:
+                writer.write(message)
+
+        self.assertEqual(self.written(write), pretty_printed(MESSAGES))
+
+    def test_no_messages_match_minidom(self):
+        self.assertEqual(self.written(lambda writer: None, "Vouchers"), pretty_printed([], "Vouchers"))
+
+    def test_started_message_matches_minidom(self):
+        # Journal entries write every voucher into one TALLYMESSAGE opened with start()
+        message = ET.Element("TALLYMESSAGE", {"xmlns:UDF": "TallyUDF"})
+        for number in range(3):
+            voucher = ET.SubElement(message, "VOUCHER", VCHTYPE="Journal", ACTION="Create")
+            ET.SubElement(voucher, "NARRATION").text = f"Entry {number} <adjusted> & settled"
+            ET.SubElement(voucher, "OLDAUDITENTRYIDS.LIST", TYPE="Number")
+
+        def write(writer):
+            writer.start("TALLYMESSAGE", {"xmlns:UDF": "TallyUDF"})
+            for voucher in message:
+                writer.write(voucher)
+            writer.end()
+
+        self.assertEqual(self.written(write, "Vouchers"), pretty_printed([message], "Vouchers"))
+
+    def test_fragment_matches_its_elements(self):
+        flags = Fragment()
+        ET.SubElement(flags, "ISBILLWISEON").text = "Yes"
+        ET.SubElement(flags, "AFFECTSSTOCK").text = "No"
+        ET.SubElement(flags, "EMPTY")
+
+        messages, expected = [], []
+        for name in ("First", "Second"):
+            message = ledger_message(name, "Pune")
+            ledger = message[0]
+            messages.append(message)
+            ledger.append(flags)
+            copy = ledger_message(name, "Pune")
+            copy[0].extend(flags)
+            expected.append(copy)
+
+        def write(writer):
+            for message in messages:
+                writer.write(message)
+
+        self.assertEqual(self.written(write), pretty_printed(expected))
+
+
+class TestBatches(FrappeTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.file_path = os.path.join(self.directory, "output.xml")
+        self.messages = [ledger_message(f"Ledger {number} & Co", "Pune") for number in range(23)]
+
+    def batches(self, **limits):
+        finished = []
+        token = batch_sink.set(finished.append)
+        try:
+            with TallyXMLWriter(self.file_path, "All Masters", **limits) as writer:
+                for message in self.messages:
+                    writer.write(message)
+        finally:
+            batch_sink.reset(token)
+        # Every batch is handed on as it is finished, in order
+        self.assertEqual(finished, writer.file_paths)
+        self.assertEqual(writer.message_count, len(self.messages))
+        contents = []
+        for file_path in writer.file_paths:
+            with open(file_path, "rb") as f:
+                contents.append(f.read())
+        return writer.file_paths, contents
+
+    def assert_split(self, contents, sizes):
+        # Every batch is an ENVELOPE of its own with the records in order
+        start = 0
+        for content, size in zip(contents, sizes, strict=True):
+            self.assertEqual(content, pretty_printed(self.messages[start:start + size]))
+            start += size
+
+    def test_max_messages(self):
+        file_paths, contents = self.batches(max_messages=5)
+        self.assertEqual([os.path.basename(file_path) for file_path in file_paths],
+                         [f"output_{number:03d}.xml" for number in range(1, 6)])
+        self.assert_split(contents, [5, 5, 5, 5, 3])
+
+    def test_max_bytes(self):
+        whole = pretty_printed(self.messages)
+        max_bytes = len(whole) // 4
+        file_paths, contents = self.batches(max_bytes=max_bytes)
+
+        self.assertGreater(len(contents), 4)
+        self.assertTrue(all(len(content) <= max_bytes for content in contents))
+        sizes = [content.count(b"<TALLYMESSAGE") for content in contents]
+        self.assert_split(contents, sizes)
+        # Each batch was cut only where the next record would not fit
+        empty = len(pretty_printed([]))
+        for content, next_record in zip(contents, itertools.accumulate(sizes)):
+            if next_record < len(self.messages):
+                record = len(pretty_printed(self.messages[next_record:next_record + 1])) - empty
+                self.assertGreater(len(content) + record, max_bytes)
+
+    def test_record_larger_than_max_bytes(self):
+        # Goes in a file of its own rather than being cut
+        file_paths, contents = self.batches(max_bytes=100)
+        self.assert_split(contents, [1] * len(self.messages))
+
+    def test_within_limits_is_one_file(self):
+        file_paths, contents = self.batches(max_messages=len(self.messages), max_bytes=10 * 1024 * 1024)
+        self.assertEqual(file_paths, [self.file_path])
+        self.assertEqual(contents, [pretty_printed(self.messages)])
+
+    def test_started_message_is_opened_again(self):
+        message = ET.Element("TALLYMESSAGE", {"xmlns:UDF": "TallyUDF"})
+        for number in range(7):
+            ET.SubElement(message, "VOUCHER", VCHTYPE="Journal").text = f"Entry {number}"
+
+        with TallyXMLWriter(self.file_path, "Vouchers", max_messages=3) as writer:
+            writer.start("TALLYMESSAGE", {"xmlns:UDF": "TallyUDF"})
+            for voucher in message:
+                writer.write(voucher)
+            writer.end()
+
+        for number, file_path in enumerate(writer.file_paths):
+            batch = ET.Element("TALLYMESSAGE", {"xmlns:UDF": "TallyUDF"})
+            batch.extend(message[number * 3:number * 3 + 3])
+            with open(file_path, "rb") as f:
+                self.assertEqual(f.read(), pretty_printed([batch], "Vouchers"))
+
+
+class TestCompression(FrappeTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.file_path = os.path.join(self.directory, "output.xml")
+
+    def compressed(self, compression, **limits):
+        with TallyXMLWriter(self.file_path, "All Masters", compression=compression, **limits) as writer:
+            for message in MESSAGES:
+                writer.write(message)
+        return [os.path.basename(file_path) for file_path in writer.file_paths]
+
+    def path(self, file_name):
+        return os.path.join(self.directory, file_name)
+
+    def test_gzip(self):
+        self.assertEqual(self.compressed("gzip"), ["output.xml.gz"])
+        with gzip.open(self.path("output.xml.gz"), "rb") as f:
+            self.assertEqual(f.read(), pretty_printed(MESSAGES))
+
+    def test_gzip_batches(self):
+        self.assertEqual(self.compressed("gzip", max_messages=3), ["output_001.xml.gz", "output_002.xml.gz"])
+        for file_name, messages in zip(["output_001.xml.gz", "output_002.xml.gz"], [MESSAGES[:3], MESSAGES[3:]]):
+            with gzip.open(self.path(file_name), "rb") as f:
+                self.assertEqual(f.read(), pretty_printed(messages))
+
+    def test_zip(self):
+        self.assertEqual(self.compressed("zip"), ["output.zip"])
+        with zipfile.ZipFile(self.path("output.zip")) as archive:
+            self.assertEqual(archive.namelist(), ["output.xml"])
+            self.assertEqual(archive.read("output.xml"), pretty_printed(MESSAGES))
+
+    def test_zip_batches(self):
+        self.assertEqual(self.compressed("zip", max_messages=3), ["output.zip"])
+        with zipfile.ZipFile(self.path("output.zip")) as archive:
+            self.assertEqual(archive.namelist(), ["output_001.xml", "output_002.xml"])
+            self.assertEqual(archive.read("output_001.xml"), pretty_printed(MESSAGES[:3]))
+            self.assertEqual(archive.read("output_002.xml"), pretty_printed(MESSAGES[3:]))
+
+    def test_failure_leaves_nothing_behind(self):
+        for compression in (None, "gzip", "zip"):
+            with self.assertRaises(ValueError):
+                with TallyXMLWriter(self.file_path, "All Masters", compression=compression, max_messages=1) as writer:
+                    for message in MESSAGES:
+                        writer.write(message)
+                    raise ValueError("Conversion failed")
+            self.assertEqual(os.listdir(self.directory), [])
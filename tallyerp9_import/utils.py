@@ -0,0 +1,188 @@
+import os
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from datetime import datetime
+from decimal import Decimal
+from itertools import repeat
+
+import frappe
+import pandas as pd
+
+from tallyerp9_import.xml_writer import Fragment
+
+
+def attached_file_path(file_url):
+    """Where on disk the File of ``file_url`` is."""
+    file_doc = frappe.get_doc('File', {'file_url': file_url})
+    folder = 'private' if file_doc.is_private else 'public'
+    path = frappe.get_site_path(folder, 'files', file_doc.file_name)
+    if not os.path.exists(path):
+        frappe.throw(f"File {path} not found")
+    return path
+
+
+def column(df, name, default="", escape=False, strip=False):
+    """Return a column as a list of strings, prepared for the whole column at once.
+
+    Gives the same values the converters used to get from
+    ``saxutils.escape(str(row.get(name, default)))`` inside ``df.iterrows()``:
+    missing values become ``"nan"`` and a missing column yields ``default`` for every row.
+    """
+    if name in df.columns:
+        values = df[name].astype(str)
+    else:
+        values = pd.Series(str(default), index=df.index)
+
+    if strip:
+        values = values.str.strip()
+    if escape:
+        values = escape_column(values)
+    return values.tolist()
+
+
+def escape_column(values):
+    # Vectorized saxutils.escape; & has to go first
+    return (
+        values.str.replace("&", "&amp;", regex=False)
+        .str.replace(">", "&gt;", regex=False)
+        .str.replace("<", "&lt;", regex=False)
+    )
+
+
+def raw_column(df, name, default=None):
+    """Return a column's values untouched, or ``default`` for every row if it is missing."""
+    if name in df.columns:
+        return df[name].tolist()
+    return [default] * len(df)
+
+
+def map_unique(values, func):
+    """Apply ``func`` once per distinct value in a column; dates repeat a lot."""
+    cache = {}
+    result = []
+    for value in values:
+        try:
+            result.append(cache[value])
+        except KeyError:
+            result.append(cache.setdefault(value, func(value)))
+        except TypeError:
+            # Unhashable, don't cache
+            result.append(func(value))
+    return result
+
+
+def tally_date(value):
+    """Convert an ERPNext ``dd-mm-yyyy`` date to Tally's ``yyyymmdd``."""
+    if _blank(value):
+        return ""
+    day, month, year = value.split("-")
+    return f"{year}{month}{day}"
+
+
+def decimal_amount(value):
+    """An amount from a CSV or the database as a ``Decimal``, 0 if it is blank."""
+    if _blank(value):
+        return Decimal(0)
+    return Decimal(str(value).strip())
+
+
+def tally_amount(amount, negative=False):
+    """``amount`` as the text of an AMOUNT, negated for deemed positive entries: its digits
+    without trailing zeros, "74706" for 74706.00 and "0" for 0.00 or a blank, however the
+    CSV or the database wrote it.
+    """
+    text = f"{abs(decimal_amount(amount)):f}"
+    if "." in text:
+        text = text.rstrip("0").rstrip(".")
+    return f"-{text}" if negative and text != "0" else text
+
+
+def tally_order_due_date(value):
+    """Convert an ERPNext ``dd-mm-yyyy`` date to the ``d-Mon-yyyy`` used by ORDERDUEDATE."""
+    if _blank(value):
+        return ""
+    return datetime.strptime(value, "%d-%m-%Y").strftime("%d-%b-%Y").lstrip("0")
+
+
+def prepared_rows(row_type=None, **columns):
+    """Zip prepared columns into lightweight rows with attribute access.
+
+        for row in prepared_rows(name=column(df, 'name'), rate=column(df, 'rate')):
+            row.name, row.rate
+
+    The rows are namedtuples made up for the columns, or ``row_type`` ones: a
+    module-level type with a field for each column, for rows sent to worker processes.
+    """
+    if row_type is None:
+        row_type = namedtuple("Row", columns)
+    return map(row_type._make, zip(*(columns[field] for field in row_type._fields)))
+
+
+def template_records(rows, field="name"):
+    """Group rows read from an ERPNext data import template into the records they make up.
+
+    A record starts at a row with a ``name``, or whatever ``field`` tells records apart,
+    and the rows of its child table follow with it blank, or with the same name again as
+    some exports write it on every row. Each record is yielded as the list of its rows as
+    soon as the next one starts, so only the record being read is held, however large the
+    file. Rows ahead of the first record are left out.
+    """
+    record = None
+    for row in rows:
+        value = getattr(row, field)
+        if not _blank(value) and (record is None or value != getattr(record[0], field)):
+            if record:
+                yield record
+            record = [row]
+        elif record:
+            record.append(row)
+    if record:
+        yield record
+
+
+class ColumnFields:
+    """Elements whose text comes from a CSV column if there is one, else from a default.
+
+    CSVs seldom have any of the columns, so for a chunk without them every row gets the
+    same ``Fragment`` of the defaults, rendered once, instead of elements of its own.
+
+        VOUCHER_FLAGS = ColumnFields([("ISOPTIONAL", 'is_optional', 'No'), ...])
+
+        for row, flags in zip(rows, VOUCHER_FLAGS.rows(df)):
+            voucher.extend(flags)
+    """
+
+    def __init__(self, fields):
+        # (tag, column, default) of each element, in order
+        self.fields = fields
+        self.defaults = Fragment()
+        for tag, _, default in fields:
+            ET.SubElement(self.defaults, tag).text = default
+
+    def rows(self, df):
+        """The elements of each row of ``df``, as a list per row."""
+        return map(self.elements, self.values(df))
+
+    def values(self, df):
+        """The text of each element for each row of ``df``, or None for a row of just the
+        defaults; plain values, unlike elements, can be sent to worker processes."""
+        if not any(name in df.columns for _, name, _ in self.fields):
+            return repeat(None, len(df))
+        return zip(*(column(df, name, default=default) for _, name, default in self.fields))
+
+    def elements(self, texts):
+        """The elements of a row from its ``values``."""
+        if texts is None:
+            return [self.defaults]
+        return [_element(tag, text) for (tag, _, _), text in zip(self.fields, texts)]
+
+
+def _element(tag, text):
+    element = ET.Element(tag)
+    element.text = text
+    return element
+
+
+def _blank(value):
+    # NaN is the only value that isn't equal to itself
+    return value is None or value != value or str(value).strip() == ""
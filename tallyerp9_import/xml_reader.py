@@ -0,0 +1,75 @@
+import gzip
+import xml.etree.ElementTree as ET
+import zipfile
+
+import frappe
+
+# The objects a TALLYMESSAGE carries; they are never inside one another, what a
+# record has in it is in .LIST elements
+TALLY_OBJECTS = {
+    "VOUCHER", "LEDGER", "GROUP", "STOCKITEM", "STOCKGROUP", "STOCKCATEGORY", "UNIT", "GODOWN", "COSTCENTRE",
+    "CURRENCY", "VOUCHERTYPE",
+}
+
+
+def xml_sources(path):
+    """Binary file objects of the XML in ``path``: the file itself, gunzipped, or every XML
+    of a zip, each closed once the next is asked for."""
+    if path.endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            for member in sorted(archive.namelist()):
+                with archive.open(member) as source:
+                    # A zip of gzipped batches
+                    yield gzip.GzipFile(fileobj=source) if member.endswith(".gz") else source
+    elif path.endswith(".gz"):
+        with gzip.open(path, "rb") as source:
+            yield source
+    else:
+        with open(path, "rb") as source:
+            yield source
+
+
+def tally_objects(source):
+    """The Tally objects of the XML in ``source``, each taken out of the tree, with the
+    TALLYMESSAGE it was in, once the next is asked for.
+
+    A TALLYMESSAGE can have just one object, as most converters write them, or all of
+    them, as journal entries are. Only the object being read is held however big the
+    XML is, not even the empty shell of those before it.
+    """
+    # Open elements, the last one is the parent of the one that ends
+    parents = []
+    for event, element in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            parents.append(element)
+            continue
+
+        parents.pop()
+        tag = local_name(element.tag)
+        if tag in TALLY_OBJECTS:
+            yield element
+        elif tag != "TALLYMESSAGE":
+            continue
+        if parents:
+            parents[-1].remove(element)
+
+
+def child_text(element, tag):
+    """The stripped text of the first child of ``element`` tagged ``tag``, "" without one."""
+    for child in element:
+        if local_name(child.tag) == tag:
+            return (child.text or "").strip()
+    return ""
+
+
+def local_name(tag):
+    # Item master messages declare a default namespace, their tags come with it
+    return tag.rpartition("}")[2] if tag[0] == "{" else tag
+
+
+def file_urls(files):
+    """The file URLs of ``files``: a single URL, a list of them or the list as JSON."""
+    files = frappe.parse_json(files) if isinstance(files, str) and files.lstrip().startswith("[") else files
+    if isinstance(files, str):
+        files = [files]
+    return [file_url for file_url in files or [] if file_url]
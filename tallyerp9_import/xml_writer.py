@@ -0,0 +1,377 @@
+import gzip
+import os
+import xml.etree.ElementTree as ET
+import zipfile
+from contextvars import ContextVar
+
+# What TallyXMLWriter can compress its output with
+COMPRESSIONS = ("gzip", "zip")
+
+# Compression level of the output, faster than the default of gzip for a slightly larger file
+COMPRESS_LEVEL = 6
+
+# Called with the path of every file a TallyXMLWriter finishes, while it goes on with the
+# next one; the Tally push pipeline sets it to send batches as soon as they are written
+batch_sink = ContextVar("batch_sink", default=None)
+
+
+def _escape_text(text):
+    # ET used to write text content as-is apart from &, < and >, and expat turned
+    # every CR / CRLF back into LF when minidom re-parsed it
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return _escape(text)
+
+
+def _escape(text):
+    # Same replacements as minidom's _write_data
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if '"' in text:
+        text = text.replace('"', "&quot;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    return text
+
+
+def _attributes(attrib):
+    # minidom's namespace-aware parser lists xmlns declarations before other attributes
+    items = [(str(key), str(value)) for key, value in attrib.items()]
+    if len(items) > 1:
+        items.sort(key=lambda item: not (item[0] == "xmlns" or item[0].startswith("xmlns:")))
+    return "".join(f' {key}="{_escape(value)}"' for key, value in items)
+
+
+def serialize(parts, element, indent, addindent, newl):
+    """Append the pretty-printed markup of an ElementTree element to ``parts``."""
+    if isinstance(element, Fragment):
+        parts.append(element.render(indent, addindent, newl))
+        return
+
+    tag = element.tag
+    text = element.text
+    if text is not None:
+        text = str(text)
+    children = list(element)
+
+    parts.append(f"{indent}<{tag}{_attributes(element.attrib)}")
+
+    if not children:
+        if text:
+            parts.append(f">{_escape_text(text)}</{tag}>{newl}")
+        else:
+            parts.append(f"/>{newl}")
+        return
+
+    parts.append(">" + newl)
+    child_indent = indent + addindent
+    if text:
+        parts.append(_escape_text(f"{child_indent}{text}{newl}"))
+    for child in children:
+        serialize(parts, child, child_indent, addindent, newl)
+        if child.tail:
+            parts.append(_escape_text(f"{child_indent}{child.tail}{newl}"))
+    parts.append(f"{indent}</{tag}>{newl}")
+
+
+class Fragment(ET.Element):
+    """Constant elements that are rendered once and then written as they are.
+
+    Build it once, at import time, with the usual ``ET.SubElement`` calls, and append
+    it to every record where its children belong. The children are written in its
+    place, the fragment itself has no tag in the output. Their markup is rendered the
+    first time it is needed at each indentation and reused after that, so a record
+    only costs the elements that actually change from one record to the next.
+
+        LEDGER_FLAGS = Fragment()
+        ET.SubElement(LEDGER_FLAGS, "ISBILLWISEON").text = "Yes"
+        ET.SubElement(LEDGER_FLAGS, "ISCOSTCENTRESON").text = "No"
+
+        ledger_element.append(LEDGER_FLAGS)
+
+    Changes to a fragment after it has been written don't show up in the output.
+    """
+
+    def __init__(self):
+        super().__init__("FRAGMENT")
+        self._rendered = {}
+
+    def render(self, indent, addindent, newl):
+        key = (indent, addindent, newl)
+        rendered = self._rendered.get(key)
+        if rendered is None:
+            parts = []
+            for child in self:
+                serialize(parts, child, indent, addindent, newl)
+            rendered = self._rendered[key] = "".join(parts)
+        return rendered
+
+
+class RenderedElements:
+    """Elements serialized to strings in memory, to be written by ``TallyXMLWriter.write_rendered``.
+
+    It has the ``write``, ``write_rendered`` and ``layout`` of a ``TallyXMLWriter``, so
+    the code that writes records to a file can render them elsewhere, in a worker process
+    say. It is made with what the writer's ``layout()`` returns where the elements will
+    end up.
+    """
+
+    def __init__(self, indent, addindent, newl):
+        self.indent = indent
+        self.addindent = addindent
+        self.newl = newl
+        # The markup of every element on its own, a batch can end after any of them
+        self.elements = []
+
+    def write(self, element):
+        parts = []
+        serialize(parts, element, self.indent, self.addindent, self.newl)
+        self.elements.append("".join(parts))
+
+    def write_rendered(self, elements):
+        self.elements.extend(elements)
+
+    def layout(self):
+        return self.indent, self.addindent, self.newl
+
+
+class TallyXMLWriter:
+    """Writes a Tally import ENVELOPE to disk one TALLYMESSAGE at a time.
+
+    The output is byte-for-byte what building the whole ENVELOPE with ElementTree and
+    pretty-printing it with ``minidom.toprettyxml(indent="  ")`` used to produce, but only
+    the element currently being written is ever held in memory.
+
+        with TallyXMLWriter(xml_file_path, "All Masters") as writer:
+            for row in rows:
+                writer.write(build_tally_message(row))
+
+    With ``max_messages`` or ``max_bytes`` the output is cut into batches, every one a
+    complete ENVELOPE of its own: once the next record would take a file past either
+    limit, the ENVELOPE is closed and carries on in a new file. Records are the elements
+    written into REQUESTDATA, or into an element opened in it with ``start()``, which is
+    opened again at the top of the new file. The first file is renamed to end in
+    ``_001`` when there is a second one, ``file_paths`` has them all in order. Each
+    file is handed to ``batch_sink``, when set, as soon as it is complete.
+
+    ``compression`` streams the XML through a compressor as it is written, nothing more
+    than the current element is held uncompressed: "gzip" writes ``file_path`` + ".gz",
+    "zip" a zip named like ``file_path`` with the XML, or each batch, as a member.
+    ``max_bytes`` still counts the uncompressed XML, what Tally has to read.
+    """
+
+    def __init__(
+        self,
+        file_path,
+        report_name,
+        company="Techsolvo",
+        indent="  ",
+        newl="\n",
+        max_messages=0,
+        max_bytes=0,
+        compression=None,
+    ):
+        if compression and compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression {compression}, it is one of {', '.join(COMPRESSIONS)}")
+        self.file_path = file_path
+        self.report_name = report_name
+        self.company = company
+        self.indent = indent
+        self.newl = newl
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.compression = compression
+        self.message_count = 0
+        self.file_paths = []
+        self._file = None
+        self._archive = None
+        self._batch_count = 0
+        # Open elements as [tag, start_tag_still_pending, attributes]
+        self._stack = []
+        self._message_depth = None
+        # Bytes and records written to the current file
+        self._bytes = 0
+        self._records = 0
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def open(self):
+        if self.compression == "zip":
+            archive_path = f"{os.path.splitext(self.file_path)[0]}.zip"
+            self._archive = zipfile.ZipFile(archive_path, "w", zipfile.ZIP_DEFLATED, compresslevel=COMPRESS_LEVEL)
+            self.file_paths.append(archive_path)
+            # Members can't be renamed, batches are numbered from the first one on
+            first = self._batch_path(1) if self.max_messages or self.max_bytes else self.file_path
+        else:
+            first = self.file_path
+        self._open_file(first)
+
+    def close(self):
+        self._close_file()
+        if self._archive:
+            self._archive.close()
+            self._archive = None
+        self._finished(self.file_paths[-1])
+
+    def abort(self):
+        # Don't leave truncated documents behind
+        if self._file:
+            self._file.close()
+            self._file = None
+        if self._archive:
+            self._archive.close()
+            self._archive = None
+        for file_path in self.file_paths:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+    def start(self, tag, attrib=None):
+        """Open an element whose children will be written with further calls."""
+        self._open_parent()
+        self._count_message()
+        self._write(f"{self._current_indent()}<{tag}{_attributes(attrib or {})}")
+        self._stack.append([tag, True, attrib])
+
+    def end(self):
+        tag, pending, attrib = self._stack.pop()
+        if pending:
+            self._write(f"/>{self.newl}")
+        else:
+            self._write(f"{self._current_indent()}</{tag}>{self.newl}")
+
+    def write(self, element):
+        """Serialize a complete element at the current position and forget about it."""
+        parts = []
+        serialize(parts, element, self._current_indent(), self.indent, self.newl)
+        self._write_record("".join(parts))
+
+    def write_rendered(self, elements):
+        """Write the markup of elements that ``RenderedElements`` rendered for the current position."""
+        for markup in elements:
+            self._write_record(markup)
+
+    def layout(self):
+        """The indentation at the current position, the indentation step and the newline."""
+        return self._current_indent(), self.indent, self.newl
+
+    def _open_file(self, file_path):
+        if self.compression == "zip":
+            self._file = self._archive.open(os.path.basename(file_path), "w", force_zip64=True)
+        elif self.compression == "gzip":
+            self._file = gzip.open(f"{file_path}.gz", "wb", compresslevel=COMPRESS_LEVEL)
+            self.file_paths.append(f"{file_path}.gz")
+        else:
+            self._file = open(file_path, "wb")
+            self.file_paths.append(file_path)
+        self._batch_count += 1
+        self._bytes = 0
+        self._records = 0
+        self._write(f'<?xml version="1.0" ?>{self.newl}')
+
+        self.start("ENVELOPE")
+
+        # Create HEADER
+        header = ET.Element("HEADER")
+        ET.SubElement(header, "TALLYREQUEST").text = "Import Data"
+        self.write(header)
+
+        # Create BODY
+        self.start("BODY")
+        self.start("IMPORTDATA")
+
+        # Create REQUESTDESC
+        request_desc = ET.Element("REQUESTDESC")
+        ET.SubElement(request_desc, "REPORTNAME").text = self.report_name
+        static_variables = ET.SubElement(request_desc, "STATICVARIABLES")
+        ET.SubElement(static_variables, "SVCURRENTCOMPANY").text = self.company
+        self.write(request_desc)
+
+        # Create REQUESTDATA, TALLYMESSAGEs are written into it as they are produced
+        self.start("REQUESTDATA")
+        self._message_depth = len(self._stack)
+
+    def _write_record(self, markup):
+        data = markup.encode("utf-8")
+        if self._is_record() and self._records and self._is_full(len(data)):
+            self._next_file()
+        self._open_parent()
+        if self._is_record():
+            self._records += 1
+        self._count_message()
+        self._file.write(data)
+        self._bytes += len(data)
+
+    def _is_record(self):
+        return self._message_depth is not None and len(self._stack) >= self._message_depth
+
+    def _is_full(self, size):
+        if self.max_messages and self._records >= self.max_messages:
+            return True
+        return bool(self.max_bytes) and self._bytes + size + self._closing_size() > self.max_bytes
+
+    def _closing_size(self):
+        # What closing the elements still open adds to the file after one more record
+        size = 0
+        for depth, (tag, pending, attrib) in enumerate(self._stack):
+            if pending:
+                size += len(f">{self.newl}")
+            size += len(f"{self.indent * depth}</{tag}>{self.newl}".encode("utf-8"))
+        return size
+
+    def _close_file(self):
+        while self._stack:
+            self.end()
+        self._file.close()
+        self._file = None
+
+    def _next_file(self):
+        reopen = [(tag, attrib) for tag, pending, attrib in self._stack[self._message_depth:]]
+        self._close_file()
+        if self._batch_count == 1 and not self._archive:
+            first = self._batch_path(1)
+            if self.compression == "gzip":
+                first = f"{first}.gz"
+            os.replace(self.file_paths[0], first)
+            self.file_paths[0] = first
+        if not self._archive:
+            # The members of a zip can only be read once it is closed
+            self._finished(self.file_paths[-1])
+        self._open_file(self._batch_path(self._batch_count + 1))
+        for tag, attrib in reopen:
+            self.start(tag, attrib)
+
+    def _finished(self, file_path):
+        sink = batch_sink.get()
+        if sink:
+            sink(file_path)
+
+    def _batch_path(self, number):
+        stem, extension = os.path.splitext(self.file_path)
+        return f"{stem}_{number:03d}{extension}"
+
+    def _write(self, text):
+        data = text.encode("utf-8")
+        self._file.write(data)
+        self._bytes += len(data)
+
+    def _open_parent(self):
+        if self._stack and self._stack[-1][1]:
+            self._write(">" + self.newl)
+            self._stack[-1][1] = False
+
+    def _count_message(self):
+        if len(self._stack) == self._message_depth:
+            self.message_count += 1
+
+    def _current_indent(self):
+        return self.indent * len(self._stack)